@@ -1,26 +1,29 @@
 import logging
 import re
 from collections import namedtuple
+from django.contrib.gis.db.models import Union
 from django.db import connection
+from councils.helpers import council_locator
 from councils.models import Council
+from data_collection.loaders import bulk_load
+from data_collection.staging import all_councils
 from pollingstations.models import (PollingDistrict, ResidentialAddress,
                                     PollingStation)
+from pollingstations.sorting import address_sort_key
 from addressbase.models import Address
 
 
 def centre_from_points_qs(qs):
-    if not qs:
+    """
+    Return the centroid of the distinct points in qs
+
+    The points are unioned in a single aggregate query, so we don't
+    need to pull every row back and union them one at a time.
+    """
+    points = qs.aggregate(points=Union('location'))['points']
+    if points is None:
         return None
-
-    if len(qs) == 1:
-        return qs[0].location
-
-    base_point = qs[0].location
-    poly = base_point.union(qs[1].location)
-    for m in qs:
-        poly = poly.union(m.location)
-
-    return poly.centroid
+    return points.centroid
 
 
 AddressTuple = namedtuple('Address', [
@@ -34,20 +37,23 @@ AddressTuple = namedtuple('Address', [
 class AddressSet(set):
 
     def save(self, batch_size):
-
-        addresses_db = []
-        for address in self:
-            record = ResidentialAddress(
-                address=address.address,
-                postcode=re.sub('[^A-Z0-9]', '', address.postcode),
-                polling_station_id=address.polling_station_id,
-                council_id=address.council_id,
-                slug=address.slug,
-            )
-            addresses_db.append(record)
-
-        ResidentialAddress.objects.bulk_create(
-            addresses_db, batch_size=batch_size)
+        bulk_load(ResidentialAddress, [
+            'address',
+            'postcode',
+            'polling_station_id',
+            'council_id',
+            'slug',
+            'sort_key',
+        ], (
+            (
+                address.address,
+                re.sub('[^A-Z0-9]', '', address.postcode),
+                address.polling_station_id,
+                address.council_id,
+                address.slug,
+                address_sort_key(address.address),
+            ) for address in self
+        ), batch_size=batch_size)
 
 
 class EdgeCaseFixer:
@@ -72,10 +78,7 @@ class EdgeCaseFixer:
 
     def get_station_id(self, address):
         if not address.council_id:
-            c = Council.objects\
-                .defer("area", "location")\
-                .get(area__covers=address.location)
-            council_id = c.council_id
+            council_id = council_locator.get_council_id(address.location)
         else:
             council_id = address.council_id
 
@@ -103,6 +106,13 @@ class EdgeCaseFixer:
         return polling_station
 
     def make_addresses_for_postcode(self, postcode):
+        self.make_addresses_for_postcodes([postcode])
+
+    def make_addresses_for_postcodes(self, postcodes):
+        # look for districts and stations in every council (not just
+        # the one we're importing) so we can spot overlaps across borders
+        districts = all_councils(PollingDistrict)
+        stations = all_councils(PollingStation)
         cursor = connection.cursor()
         cursor.execute(
             """
@@ -117,13 +127,13 @@ class EdgeCaseFixer:
                 ab.location
             FROM addressbase_address ab
 
-            LEFT JOIN pollingstations_pollingdistrict pd
+            LEFT JOIN {districts} pd
             ON ST_CONTAINS(pd.area, ab.location)
 
             LEFT JOIN addressbase_onsad os
             ON os.uprn=ab.uprn
 
-            LEFT JOIN pollingstations_pollingstation ps
+            LEFT JOIN {stations} ps
             ON (
                 (pd.polling_station_id=ps.internal_council_id
                     AND pd.council_id=ps.council_id)
@@ -137,15 +147,21 @@ class EdgeCaseFixer:
                     ab.uprn,
                     COUNT(*) AS count
                 FROM addressbase_address ab
-                LEFT JOIN pollingstations_pollingdistrict pd
+                LEFT JOIN {districts} pd
                 ON ST_CONTAINS(pd.area, ab.location)
-                WHERE ab.postcode=%s
+                WHERE ab.postcode = ANY(%s)
                 GROUP BY ab.uprn
             ) ct
             ON ab.uprn=ct.uprn
 
-            WHERE ab.postcode=%s
-            """, [postcode, postcode]
+            WHERE ab.postcode = ANY(%s)
+            """.format(districts=districts, stations=stations), [
+                self.target_council_id,
+                self.target_council_id,
+                self.target_council_id,
+                list(postcodes),
+                list(postcodes),
+            ]
         )
         addresses = cursor.fetchall()
 
@@ -181,7 +197,7 @@ class EdgeCaseFixer:
 
             self.address_set.add(AddressTuple(
                 address.address,
-                postcode,
+                address.postcode,
                 self.target_council_id,
                 station_id,
                 address.uprn,
@@ -209,23 +225,65 @@ def postcodes_not_contained_by_district(district):
     return data
 
 
-def create_address_records_for_council(council, batch_size, logger):
+def postcodes_not_contained_by_districts(council):
+    """
+    Set-based equivalent of calling postcodes_not_contained_by_district()
+    on every district in this council, in a single query.
+
+    For each (district, postcode) pair where at least one address in
+    the postcode is within the district, check whether the district
+    contains every address in the postcode.
+
+    Returns the number of pairs where it does and
+    the set of postcodes where it doesn't
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        WITH district_postcodes AS (
+            SELECT DISTINCT pd.id AS district_id, ab.postcode
+            FROM pollingstations_pollingdistrict pd
+            JOIN addressbase_address ab
+            ON ST_Within(ab.location, pd.area)
+            WHERE pd.council_id = %s
+        )
+        SELECT
+            dp.postcode,
+            bool_and(ST_Contains(pd.area, ab.location))
+        FROM district_postcodes dp
+        JOIN pollingstations_pollingdistrict pd
+        ON pd.id = dp.district_id
+        JOIN addressbase_address ab
+        ON ab.postcode = dp.postcode
+        GROUP BY dp.district_id, dp.postcode;
+    """, [council.pk])
+
+    contained = 0
+    not_contained = set()
+    for postcode, all_contained in cursor.fetchall():
+        if all_contained:
+            contained += 1
+        else:
+            not_contained.add(postcode)
+    return contained, not_contained
+
+
+def create_address_records_for_council(
+        council, batch_size, logger, postcode_batch_size=500):
     postcode_report = {
         'no_attention_needed': 0,
         'addresses_created': 0,
         'postcodes_needing_address_lookup': set(),
     }
 
-    fixer = EdgeCaseFixer(council.pk, logger)
-    for district in PollingDistrict.objects.filter(council=council):
-        data = postcodes_not_contained_by_district(district)
+    contained, not_contained = postcodes_not_contained_by_districts(council)
+    postcode_report['no_attention_needed'] = contained
+    postcode_report['postcodes_needing_address_lookup'] = not_contained
 
-        postcode_report['no_attention_needed'] += \
-            data['total'] - len(data['not_contained'])
-        postcode_report['postcodes_needing_address_lookup'].update(data['not_contained'])
-
-        for postcode in data['not_contained']:
-            fixer.make_addresses_for_postcode(postcode)
+    fixer = EdgeCaseFixer(council.pk, logger)
+    postcodes = sorted(not_contained)
+    for i in range(0, len(postcodes), postcode_batch_size):
+        fixer.make_addresses_for_postcodes(
+            postcodes[i:i + postcode_batch_size])
 
     address_set = fixer.get_address_set()
     address_set.save(batch_size)
@@ -0,0 +1,93 @@
+import random
+import time
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from addressbase.helpers import centre_from_points_qs
+from addressbase.management.base_command import BaseAddressBaseCommand
+from addressbase.models import Address
+
+
+def union_centroid(qs):
+    # the original implementation of centre_from_points_qs()
+    # kept here so we can compare against it
+    if not qs:
+        return None
+
+    if len(qs) == 1:
+        return qs[0].location
+
+    base_point = qs[0].location
+    poly = base_point.union(qs[1].location)
+    for m in qs:
+        poly = poly.union(m.location)
+
+    return poly.centroid
+
+
+def make_postcode(postcode, size, seed=0):
+    # build a postcode with 'size' UPRNs, some of which share a location
+    rand = random.Random(seed)
+    points = []
+    for i in range(size):
+        if points and rand.random() < 0.2:
+            points.append(points[-1])
+        else:
+            points.append((
+                -2.0 + rand.uniform(-0.01, 0.01),
+                52.0 + rand.uniform(-0.01, 0.01),
+            ))
+
+    Address.objects.bulk_create([
+        Address(
+            uprn='%s-%i' % (postcode.replace(' ', ''), i),
+            address='%i Test Street' % (i),
+            postcode=postcode,
+            location=Point(*point, srid=4326),
+        ) for i, point in enumerate(points)
+    ])
+    return Address.objects.filter(postcode=postcode)
+
+
+"""
+Compare the time taken to find the centre of a postcode
+using centre_from_points_qs() and the old union-in-a-loop approach
+
+Test data is inserted inside a transaction which is rolled back
+"""
+class Command(BaseAddressBaseCommand):
+
+    sizes = [1, 2, 10, 50, 100, 250, 500]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r',
+            '--repeat',
+            help='<Optional> Number of times to repeat each lookup',
+            type=int,
+            required=False,
+            default=10
+        )
+
+    def time_func(self, func, qs, repeat):
+        start = time.perf_counter()
+        for i in range(repeat):
+            # clone the queryset so every run hits the DB
+            centre = func(qs.all())
+        return (time.perf_counter() - start) / repeat, centre
+
+    def handle(self, *args, **kwargs):
+        self.perform_checks()
+
+        print("UPRNs    union (ms)    aggregate (ms)    same point")
+        with transaction.atomic():
+            for size in self.sizes:
+                qs = make_postcode('ZZ9 %iZZ' % (size), size)
+                old_time, old_centre = self.time_func(
+                    union_centroid, qs, kwargs['repeat'])
+                new_time, new_centre = self.time_func(
+                    centre_from_points_qs, qs, kwargs['repeat'])
+                same = old_centre.equals_exact(new_centre, 1e-9)
+                print("%5i    %10.2f    %14.2f    %s" % (
+                    size, old_time * 1000, new_time * 1000, same))
+
+            transaction.set_rollback(True)
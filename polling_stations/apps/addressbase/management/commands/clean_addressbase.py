@@ -1,9 +1,106 @@
 import csv
 import os
 import glob
+import shutil
+import tempfile
+import time
+from multiprocessing import cpu_count, Pool
 from addressbase.management.base_command import BaseAddressBaseCommand
 
 
+FIELDNAMES = [
+    'UPRN',
+    'OS_ADDRESS_TOID',
+    'UDPRN',
+    'ORGANISATION_NAME',
+    'DEPARTMENT_NAME',
+    'PO_BOX_NUMBER',
+    'SUB_BUILDING_NAME',
+    'BUILDING_NAME',
+    'BUILDING_NUMBER',
+    'DEPENDENT_THOROUGHFARE',
+    'THOROUGHFARE',
+    'POST_TOWN',
+    'DOUBLE_DEPENDENT_LOCALITY',
+    'DEPENDENT_LOCALITY',
+    'POSTCODE',
+    'POSTCODE_TYPE',
+    'X_COORDINATE',
+    'Y_COORDINATE',
+    'LATITUDE',
+    'LONGITUDE',
+    'RPC',
+    'COUNTRY',
+    'CHANGE_TYPE',
+    'LA_START_DATE',
+    'RM_START_DATE',
+    'LAST_UPDATE_DATE',
+    'CLASS',
+]
+
+# columns (in order) which make up the address
+ADDRESS_FIELDS = [
+    'ORGANISATION_NAME',
+    'DEPARTMENT_NAME',
+    'PO_BOX_NUMBER',
+    'SUB_BUILDING_NAME',
+    'BUILDING_NAME',
+    'BUILDING_NUMBER',
+    'DEPENDENT_THOROUGHFARE',
+    'THOROUGHFARE',
+    'DOUBLE_DEPENDENT_LOCALITY',
+    'DEPENDENT_LOCALITY',
+    'POST_TOWN',
+]
+
+# we work with plain lists instead of dicts, so look up column indexes once
+UPRN = FIELDNAMES.index('UPRN')
+POSTCODE = FIELDNAMES.index('POSTCODE')
+LATITUDE = FIELDNAMES.index('LATITUDE')
+LONGITUDE = FIELDNAMES.index('LONGITUDE')
+ADDRESS_COLUMNS = [FIELDNAMES.index(f) for f in ADDRESS_FIELDS]
+
+
+def clean_address(row):
+    return ", ".join([row[i] for i in ADDRESS_COLUMNS if row[i]])
+
+
+def clean_row(row):
+    if len(row) < len(FIELDNAMES):
+        # short rows are padded with None, like csv.DictReader does
+        row = row + [None] * (len(FIELDNAMES) - len(row))
+    return [
+        row[UPRN],
+        clean_address(row),
+        row[POSTCODE],
+        "SRID=4326;POINT({} {})".format(row[LONGITUDE], row[LATITUDE]),
+    ]
+
+
+def clean_csv(paths):
+    """
+    Clean one AddressBase CSV, writing the output to out_path.
+    Returns the number of rows written
+    """
+    csv_path, out_path = paths
+    count = 0
+    with open(csv_path) as csv_file, open(out_path, 'w') as out_file:
+        out_csv = csv.writer(out_file)
+        # csv.DictReader skips blank lines, so we do too
+        rows = (row for row in csv.reader(csv_file) if row)
+        for row in rows:
+            out_csv.writerow(clean_row(row))
+            count += 1
+    return count
+
+
+"""
+Build addressbase_cleaned.csv from the AddressBase CSVs in ab_path
+
+Input files are cleaned in parallel (one process per file) and the
+results are joined together in the same order as glob() lists the input
+files, so the output is the same however many jobs we use.
+"""
 class Command(BaseAddressBaseCommand):
 
     def add_arguments(self, parser):
@@ -12,89 +109,48 @@ class Command(BaseAddressBaseCommand):
             help='The path to the folder containing the AddressBase CSVs'
         )
 
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            help='<Optional> Number of files to clean at the same time (default: one per CPU)',
+            type=int,
+            required=False,
+            default=None
+        )
 
     def handle(self, *args, **kwargs):
         self.perform_checks()
 
-        self.fieldnames = [
-            'UPRN',
-            'OS_ADDRESS_TOID',
-            'UDPRN',
-            'ORGANISATION_NAME',
-            'DEPARTMENT_NAME',
-            'PO_BOX_NUMBER',
-            'SUB_BUILDING_NAME',
-            'BUILDING_NAME',
-            'BUILDING_NUMBER',
-            'DEPENDENT_THOROUGHFARE',
-            'THOROUGHFARE',
-            'POST_TOWN',
-            'DOUBLE_DEPENDENT_LOCALITY',
-            'DEPENDENT_LOCALITY',
-            'POSTCODE',
-            'POSTCODE_TYPE',
-            'X_COORDINATE',
-            'Y_COORDINATE',
-            'LATITUDE',
-            'LONGITUDE',
-            'RPC',
-            'COUNTRY',
-            'CHANGE_TYPE',
-            'LA_START_DATE',
-            'RM_START_DATE',
-            'LAST_UPDATE_DATE',
-            'CLASS',
-        ]
         self.base_path = os.path.abspath(kwargs['ab_path'])
         out_path = os.path.join(self.base_path, 'addressbase_cleaned.csv')
+        jobs = kwargs.get('jobs') or cpu_count()
 
-        with open(out_path, 'w') as out_file:
-            for csv_path in glob.glob(os.path.join(self.base_path, '*.csv')):
-                if csv_path.endswith('cleaned.csv'):
-                    continue
-                self.out_csv = csv.DictWriter(out_file, fieldnames=[
-                    'UPRN',
-                    'address',
-                    'postcode',
-                    'location',
-                ])
-                print(csv_path)
-                self.clean_csv(csv_path)
-                out_file.flush()
-
-    def line_filer(self, csv_path):
-        with open(csv_path) as csv_file:
-            for line in csv.DictReader(csv_file, fieldnames=self.fieldnames):
-                # Do any filtering we might need to do here
-                yield line
-
-    def clean_csv(self, csv_path):
-        for line in self.line_filer(csv_path):
-            self.out_csv.writerow(self.clean_output_line(line))
-
-    def clean_address(self, line):
-        address_fields = [
-            line['ORGANISATION_NAME'],
-            line['DEPARTMENT_NAME'],
-            line['PO_BOX_NUMBER'],
-            line['SUB_BUILDING_NAME'],
-            line['BUILDING_NAME'],
-            line['BUILDING_NUMBER'],
-            line['DEPENDENT_THOROUGHFARE'],
-            line['THOROUGHFARE'],
-            line['DOUBLE_DEPENDENT_LOCALITY'],
-            line['DEPENDENT_LOCALITY'],
-            line['POST_TOWN'],
+        csv_paths = [
+            csv_path
+            for csv_path in glob.glob(os.path.join(self.base_path, '*.csv'))
+            if not csv_path.endswith('cleaned.csv')
         ]
-        return ", ".join([f for f in address_fields if f])
-
-    def clean_output_line(self, line):
-        data = {}
-        data['UPRN'] = line['UPRN']
-        data['address'] = self.clean_address(line)
-        data['postcode'] = line['POSTCODE']
-        data['location'] = "SRID=4326;POINT({} {})".format(
-            line['LONGITUDE'],
-            line['LATITUDE'],
-        )
-        return data
+
+        start = time.time()
+        tmp_dir = tempfile.mkdtemp(dir=self.base_path)
+        try:
+            tasks = [
+                (csv_path, os.path.join(tmp_dir, '%i.part' % (i)))
+                for i, csv_path in enumerate(csv_paths)
+            ]
+            with Pool(processes=jobs) as pool:
+                counts = pool.map(clean_csv, tasks)
+
+            # copy bytes so line endings are left alone
+            with open(out_path, 'wb') as out_file:
+                for (csv_path, part_path), count in zip(tasks, counts):
+                    print("%s: %i rows" % (csv_path, count))
+                    with open(part_path, 'rb') as part_file:
+                        shutil.copyfileobj(part_file, out_file)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        seconds = time.time() - start
+        total = sum(counts)
+        print("cleaned %i rows in %.1fs (%i rows/sec)" % (
+            total, seconds, total / seconds if seconds else 0))
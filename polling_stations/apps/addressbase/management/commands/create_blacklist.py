@@ -1,57 +1,52 @@
-from django.db import connection
+import time
 from addressbase.management.base_command import BaseAddressBaseCommand
-from addressbase.models import Blacklist
+from addressbase.shadow import ShadowTable
 
 
 """
 Use AddressBase and ONSAD to create a list of
 postcodes which contain UPRNs in >1 local authorities
+
+The list is built in a shadow table with a single query
+and then swapped in, so lookups never see a partial list
 """
 class Command(BaseAddressBaseCommand):
 
-    def get_bad_postcodes(self):
-        # get a list of postcodes containing UPRNs in >1 local authorities
-        self.cursor.execute("""
-            SELECT DISTINCT(postcode)
-            FROM addressbase_address as AB
-            JOIN addressbase_onsad ONSAD
-            ON AB.uprn = ONSAD.uprn
-            GROUP BY postcode
-            HAVING COUNT(DISTINCT(LAD))>1;
-        """)
-        postcodes = self.cursor.fetchall()
-        return [postcode[0] for postcode in postcodes]
-
-    def get_councils(self, postcode):
-        # get a list of local auths containing 1 or more UPRNs in postcode
-        self.cursor.execute("""
-            SELECT DISTINCT(LAD)
-            FROM addressbase_address as AB
+    def build_blacklist(self, cursor, table):
+        # for each postcode containing UPRNs in >1 local authorities,
+        # insert a row for each local auth containing 1 or more UPRNs
+        cursor.execute("""
+            INSERT INTO "{table}" (postcode, lad)
+            SELECT DISTINCT REPLACE(AB.postcode, ' ', ''), ONSAD.lad
+            FROM addressbase_address AB
             JOIN addressbase_onsad ONSAD
             ON AB.uprn = ONSAD.uprn
-            WHERE AB.postcode=%s;
-        """, [postcode])
-        councils = self.cursor.fetchall()
-        return [council[0] for council in councils]
+            WHERE AB.postcode IN (
+                SELECT AB.postcode
+                FROM addressbase_address AB
+                JOIN addressbase_onsad ONSAD
+                ON AB.uprn = ONSAD.uprn
+                GROUP BY AB.postcode
+                HAVING COUNT(DISTINCT(ONSAD.lad))>1
+            );
+        """.format(table=table))
+        return cursor.rowcount
 
     def handle(self, *args, **kwargs):
         self.perform_checks()
 
-        self.cursor = connection.cursor()
-        print("clearing existing data..")
-        self.cursor.execute("TRUNCATE TABLE addressbase_blacklist;")
-
-        print("blacklisting postcodes..")
-        postcodes = self.get_bad_postcodes()
-
-        for postcode in postcodes:
-            councils = self.get_councils(postcode)
-            for council in councils:
-                Blacklist.objects.create(postcode=postcode, lad=council)
-
-        self.cursor.execute("""
-            UPDATE addressbase_blacklist
-            SET postcode=REPLACE(postcode, ' ', '')
-        """)
-
-        print("...done")
+        start = time.time()
+        shadow = ShadowTable('addressbase_blacklist')
+        shadow.create()
+        try:
+            print("blacklisting postcodes..")
+            count = self.build_blacklist(shadow.cursor, shadow.shadow)
+            print("building indexes..")
+            shadow.build_indexes()
+            print("swapping tables..")
+            shadow.swap()
+        except:
+            shadow.drop()
+            raise
+
+        print("...done: %i rows in %.1fs" % (count, time.time() - start))
@@ -0,0 +1,62 @@
+from django.db import connection, transaction
+from addressbase.management.base_command import BaseAddressBaseCommand
+
+
+"""
+Use AddressBase and ONSAD to build a table of
+postcode -> (centroid, council, gss codes)
+
+This should be run after import_cleaned_addresses and import_onsad
+AddressBaseGeocoder reads from this table instead of
+querying AddressBase and ONSAD on every lookup
+"""
+class Command(BaseAddressBaseCommand):
+
+    def build_lookup(self):
+        # ST_Union de-duplicates the points in each postcode
+        # so the centroid matches the one we would get from
+        # unioning the points for each postcode one-by-one
+        self.cursor.execute("""
+            INSERT INTO addressbase_postcodelookup
+                (postcode, location, council_gss, gss_codes, multiple_councils)
+            SELECT
+                AB.postcode,
+                ST_Centroid(ST_Union(AB.location)),
+                CASE WHEN COUNT(DISTINCT(ONSAD.lad))=1
+                    THEN MAX(ONSAD.lad) ELSE '' END,
+                COALESCE(CODES.gss_codes, '{}'),
+                COUNT(DISTINCT(ONSAD.lad))>1
+            FROM addressbase_address AB
+            LEFT JOIN addressbase_onsad ONSAD
+            ON AB.uprn = ONSAD.uprn
+            LEFT JOIN (
+                SELECT
+                    AB.postcode,
+                    ARRAY_AGG(DISTINCT(CODE.code)) AS gss_codes
+                FROM addressbase_address AB
+                JOIN addressbase_onsad ONSAD
+                ON AB.uprn = ONSAD.uprn
+                CROSS JOIN LATERAL UNNEST(ARRAY[
+                    ONSAD.cty, ONSAD.lad, ONSAD.ctry, ONSAD.rgn, ONSAD.eer
+                ]) AS CODE(code)
+                GROUP BY AB.postcode
+            ) CODES
+            ON AB.postcode = CODES.postcode
+            GROUP BY AB.postcode, CODES.gss_codes;
+        """)
+
+    def handle(self, *args, **kwargs):
+        self.perform_checks()
+
+        self.cursor = connection.cursor()
+
+        # rebuild the table in a single transaction so
+        # lookups never see a partially populated table
+        with transaction.atomic():
+            print("clearing existing data..")
+            self.cursor.execute("TRUNCATE TABLE addressbase_postcodelookup;")
+
+            print("building postcode lookup..")
+            self.build_lookup()
+
+        print("...done")
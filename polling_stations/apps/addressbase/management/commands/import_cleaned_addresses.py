@@ -1,35 +1,98 @@
 import os
-import glob
-from django.db import connection
+import time
+from django.core.management.base import CommandError
+from django.db import connection, transaction
 from addressbase.management.base_command import BaseAddressBaseCommand
+from addressbase.shadow import create_indexes, drop_indexes, ShadowTable
 
 
+"""
+Load addressbase_cleaned.csv (see clean_addressbase) into addressbase_address
+
+The file is streamed to the DB over COPY ... FROM STDIN, so it doesn't
+need to be on the DB server. By default, we load into a shadow table,
+build its indexes, ANALYZE it and then rename it into place, so postcode
+lookups keep working while the new data is loaded.
+"""
 class Command(BaseAddressBaseCommand):
 
+    table = 'addressbase_address'
+
     def add_arguments(self, parser):
         parser.add_argument(
             'cleaned_ab_path',
             help='The path to the folder containing the cleaned AddressBase CSVs'
         )
 
+        parser.add_argument(
+            '--in-place',
+            help='<Optional> Truncate and load addressbase_address directly instead of using a shadow table',
+            action='store_true',
+            required=False,
+            default=False
+        )
 
-    def handle(self, *args, **kwargs):
-        self.perform_checks()
+        parser.add_argument(
+            '--drop-indexes',
+            help='<Optional> Drop the indexes before loading and rebuild them afterwards (only with --in-place)',
+            action='store_true',
+            required=False,
+            default=False
+        )
+
+    def copy(self, cursor, table, cleaned_file_path):
+        with open(cleaned_file_path) as f:
+            cursor.copy_expert("""
+                COPY "{}" (UPRN,address,postcode,location)
+                FROM STDIN (FORMAT CSV, DELIMITER ',', quote '"');
+            """.format(table), f, size=1024 * 1024)
 
+    def import_shadow(self, cleaned_file_path):
+        shadow = ShadowTable(self.table)
+        shadow.create()
+        try:
+            print("importing from %s.." % (cleaned_file_path))
+            self.copy(shadow.cursor, shadow.shadow, cleaned_file_path)
+            print("building indexes..")
+            shadow.build_indexes()
+            print("swapping tables..")
+            shadow.swap()
+        except:
+            shadow.drop()
+            raise
+
+    def import_in_place(self, cleaned_file_path, rebuild_indexes):
         cursor = connection.cursor()
-        print("clearing existing data..")
-        cursor.execute("TRUNCATE TABLE addressbase_address;")
+        with transaction.atomic():
+            print("clearing existing data..")
+            cursor.execute('TRUNCATE TABLE "{}";'.format(self.table))
+            if rebuild_indexes:
+                indexes = drop_indexes(cursor, self.table)
+
+            print("importing from %s.." % (cleaned_file_path))
+            self.copy(cursor, self.table, cleaned_file_path)
+
+            if rebuild_indexes:
+                print("building indexes..")
+                create_indexes(cursor, self.table, indexes)
+        cursor.execute('ANALYZE "{}";'.format(self.table))
+
+    def handle(self, *args, **kwargs):
+        if kwargs.get('drop_indexes') and not kwargs.get('in_place'):
+            # the shadow table is always indexed after loading anyway
+            raise CommandError("--drop-indexes can only be used with --in-place")
+
+        self.perform_checks()
 
         cleaned_file_path = os.path.abspath(os.path.join(
             kwargs['cleaned_ab_path'],
             "addressbase_cleaned.csv"
         ))
 
-        print("importing from %s.." % (cleaned_file_path))
-
-        cursor.execute("""
-            COPY addressbase_address (UPRN,address,postcode,location)
-            FROM '{}' (FORMAT CSV, DELIMITER ',', quote '"');
-        """.format(cleaned_file_path))
+        start = time.time()
+        if kwargs.get('in_place'):
+            self.import_in_place(cleaned_file_path, kwargs.get('drop_indexes'))
+        else:
+            self.import_shadow(cleaned_file_path)
 
-        print("...done")
+        print("...done in %.1fs" % (time.time() - start))
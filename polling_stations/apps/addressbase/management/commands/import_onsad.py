@@ -1,7 +1,20 @@
+import csv
 import os
 import glob
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import CommandError
 from django.db import connection
 from addressbase.management.base_command import BaseAddressBaseCommand
+from addressbase.shadow import ShadowTable
+from data_collection.loaders import IteratorFile
+
+
+COLUMNS = [
+    'uprn', 'cty', 'lad', 'ward', 'hlthau', 'ctry', 'rgn', 'pcon', 'eer',
+    'ttwa', 'nuts', 'park', 'oa11', 'lsoa11', 'msoa11', 'parish', 'wz11',
+    'ccg', 'bua11', 'buasd11', 'ruc11', 'oac11', 'lep1', 'lep2', 'pfa', 'imd',
+]
 
 
 """
@@ -9,29 +22,104 @@ To import ONSAD, grab the latest release:
 http://ons.maps.arcgis.com/home/search.html?q=ONS%20Address%20Directory&t=content
 and run
 python manage.py import_onsad /path/to/data
+
+Files are streamed over COPY ... FROM STDIN (several at a time, each on
+its own DB connection) into a shadow table, which is indexed and then
+swapped in, so geocoding keeps working while the new data is loaded.
 """
 class Command(BaseAddressBaseCommand):
 
+    table = 'addressbase_onsad'
+
     def add_arguments(self, parser):
         parser.add_argument(
             'path',
             help='Path to the directory containing the ONSAD CSVs'
         )
 
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            help='<Optional> Number of files to load at the same time',
+            type=int,
+            required=False,
+            default=4
+        )
+
+    def read_rows(self, f, counter):
+        reader = csv.reader(f)
+        next(reader)  # skip the header
+        for row in reader:
+            if len(row) != len(COLUMNS):
+                # stop here and raise once COPY has finished: an exception
+                # inside copy_expert() wouldn't tell us what went wrong
+                counter['error'] = "%s line %i: expected %i columns, found %i" % (
+                    f.name, reader.line_num, len(COLUMNS), len(row))
+                return
+            counter['rows'] += 1
+            yield row
+
+    def load_file(self, path, table):
+        start = time.time()
+        counter = {'rows': 0, 'error': None}
+        column_list = ', '.join(COLUMNS)
+        with open(path) as f:
+            connection.cursor().copy_expert("""
+                COPY "{table}" ({columns}) FROM STDIN
+                (FORMAT CSV, FORCE_NOT_NULL ({columns}));
+            """.format(table=table, columns=column_list),
+                IteratorFile(self.read_rows(f, counter)))
+        if counter['error']:
+            raise CommandError(counter['error'])
+        seconds = time.time() - start
+        print("%s: %i rows in %.1fs (%i rows/sec)" % (
+            path, counter['rows'], seconds,
+            counter['rows'] / seconds if seconds else 0))
+        return counter['rows']
+
+    def load_file_in_thread(self, path, table):
+        # each thread gets its own DB connection
+        try:
+            return self.load_file(path, table)
+        finally:
+            connection.close()
+
+    def load_files(self, files, table, jobs):
+        if jobs == 1:
+            return [self.load_file(f, table) for f in files]
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(
+                lambda f: self.load_file_in_thread(f, table), files))
+
     def handle(self, *args, **kwargs):
         self.perform_checks()
 
-        cursor = connection.cursor()
-        print("clearing existing data..")
-        cursor.execute("TRUNCATE TABLE addressbase_onsad;")
         glob_str = os.path.join(kwargs['path'], "*.csv")
-        print("importing from files..")
-        for f in glob.glob(glob_str):
-            print(f)
-            cursor.execute("""
-                COPY addressbase_onsad (uprn, cty, lad, ward, hlthau, ctry,
-                rgn, pcon, eer, ttwa, nuts, park, oa11, lsoa11, msoa11, parish,
-                wz11, ccg, bua11, buasd11, ruc11, oac11, lep1, lep2, pfa, imd)
-                FROM '{}' (FORMAT CSV, DELIMITER ',', QUOTE '"', HEADER);
-            """.format(f))
-        print("...done")
+        files = sorted(glob.glob(glob_str))
+        if not files:
+            raise CommandError("No CSVs found in %s" % (kwargs['path']))
+
+        start = time.time()
+        shadow = ShadowTable(self.table)
+        shadow.create()
+        try:
+            print("importing from files..")
+            expected = sum(self.load_files(files, shadow.shadow, kwargs['jobs']))
+
+            shadow.cursor.execute('SELECT COUNT(*) FROM "%s";' % (shadow.shadow))
+            loaded = shadow.cursor.fetchone()[0]
+            if loaded != expected:
+                raise CommandError("Read %i rows from files but loaded %i" % (
+                    expected, loaded))
+
+            print("building indexes..")
+            shadow.build_indexes()
+            print("swapping tables..")
+            shadow.swap()
+        except:
+            shadow.drop()
+            raise
+
+        seconds = time.time() - start
+        print("...done: %i rows in %.1fs (%i rows/sec)" % (
+            loaded, seconds, loaded / seconds if seconds else 0))
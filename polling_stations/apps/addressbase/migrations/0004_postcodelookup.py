@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addressbase', '0003_auto_20170406_0954'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostcodeLookup',
+            fields=[
+                ('postcode', models.CharField(serialize=False, primary_key=True, max_length=15)),
+                ('location', django.contrib.gis.db.models.fields.PointField(null=True, srid=4326, blank=True)),
+                ('council_gss', models.CharField(max_length=9, blank=True)),
+                ('gss_codes', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=9), blank=True, default=list, size=None)),
+                ('multiple_councils', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
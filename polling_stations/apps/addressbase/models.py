@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import ArrayField
 
 
 class AddressManager(models.GeoManager):
@@ -74,3 +75,19 @@ class Blacklist(models.Model):
 
     class Meta:
         unique_together = (('postcode', 'lad'))
+
+
+class PostcodeLookup(models.Model):
+    """
+    Model for storing the pre-computed centroid and GSS codes for each
+    postcode in AddressBase. This is built from Address and Onsad
+    by the create_postcode_lookup management command so that geocoding
+    a postcode only requires a single primary key lookup.
+    """
+    postcode = models.CharField(primary_key=True, max_length=15)
+    location = models.PointField(null=True, blank=True)
+    council_gss = models.CharField(blank=True, max_length=9)
+    gss_codes = ArrayField(models.CharField(max_length=9), blank=True, default=list)
+    multiple_councils = models.BooleanField(default=False)
+
+    objects = models.GeoManager()
@@ -0,0 +1,167 @@
+"""
+Helpers for bulk (re)loading the AddressBase tables
+
+ShadowTable lets us build a new copy of a table alongside the live one
+and then rename it into place, so lookups keep working (against the old
+data) while we load the new data. Indexes are built once the data is
+loaded, which is much quicker than updating them row by row.
+Foreign keys and triggers aren't copied: none of the AddressBase
+tables have them.
+
+drop_indexes() and create_indexes() do the same for a table we're
+loading into in place.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+INDEX_RE = re.compile(r'^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (.*)$')
+
+
+class Index:
+
+    def __init__(self, name, definition, constraint=False, unique=False):
+        # definition is the part of the CREATE INDEX statement after the
+        # table name (or the constraint definition, for a constraint)
+        self.name = name
+        self.definition = definition
+        self.constraint = constraint
+        self.unique = unique
+
+    def create(self, cursor, table, name=None):
+        name = name or self.name
+        if self.constraint:
+            cursor.execute('ALTER TABLE "%s" ADD CONSTRAINT "%s" %s;' % (
+                table, name, self.definition))
+        else:
+            cursor.execute('CREATE %sINDEX "%s" ON "%s" %s;' % (
+                'UNIQUE ' if self.unique else '', name, table, self.definition))
+
+    def drop(self, cursor, table):
+        if self.constraint:
+            cursor.execute('ALTER TABLE "{table}" DROP CONSTRAINT "{name}";'.format(
+                table=table, name=self.name))
+        else:
+            cursor.execute('DROP INDEX "{name}";'.format(name=self.name))
+
+    def rename(self, cursor, table, old_name):
+        if self.constraint:
+            cursor.execute('ALTER TABLE "{table}" RENAME CONSTRAINT "{old}" TO "{new}";'.format(
+                table=table, old=old_name, new=self.name))
+        else:
+            cursor.execute('ALTER INDEX "{old}" RENAME TO "{new}";'.format(
+                old=old_name, new=self.name))
+
+
+def get_indexes(cursor, table):
+    """
+    Return the indexes on table (including primary key
+    and unique constraints) as a list of Index objects
+    """
+    cursor.execute("""
+        SELECT con.conname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        WHERE con.conrelid = %s::regclass
+        AND con.contype IN ('p', 'u')
+        ORDER BY con.conname;
+    """, [table])
+    indexes = [Index(name, definition, constraint=True)
+               for name, definition in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT ci.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ci ON ci.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+        AND NOT EXISTS (
+            SELECT 1 FROM pg_constraint con WHERE con.conindid = i.indexrelid
+        )
+        ORDER BY ci.relname;
+    """, [table])
+    for name, definition in cursor.fetchall():
+        match = INDEX_RE.match(definition)
+        indexes.append(Index(
+            name, match.group(2), unique=bool(match.group(1))))
+    return indexes
+
+
+def drop_indexes(cursor, table):
+    indexes = get_indexes(cursor, table)
+    for index in indexes:
+        index.drop(cursor, table)
+    return indexes
+
+
+def create_indexes(cursor, table, indexes):
+    for index in indexes:
+        index.create(cursor, table)
+
+
+class ShadowTable:
+
+    def __init__(self, table):
+        self.table = table
+        self.shadow = '%s_shadow' % (table)
+        self.old = '%s_old' % (table)
+        self.cursor = connection.cursor()
+
+    def get_shadow_index_name(self, index):
+        # index names share a namespace with tables
+        # so the shadow indexes need different names
+        return ('shadow_%s' % (index.name))[:63]
+
+    def create(self):
+        """
+        Create an empty copy of the table with no indexes
+        """
+        self.drop()
+        self.indexes = get_indexes(self.cursor, self.table)
+        self.cursor.execute("""
+            CREATE TABLE "{shadow}"
+            (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+        """.format(shadow=self.shadow, table=self.table))
+
+    def build_indexes(self):
+        for index in self.indexes:
+            index.create(
+                self.cursor, self.shadow, self.get_shadow_index_name(index))
+        self.cursor.execute('ANALYZE "{shadow}";'.format(shadow=self.shadow))
+
+    def move_sequences(self):
+        # serial columns' sequences belong to the live table and would be
+        # dropped with it, so hand them over to the shadow table first
+        self.cursor.execute("""
+            SELECT column_name, pg_get_serial_sequence(%s, column_name)
+            FROM information_schema.columns
+            WHERE table_name = %s AND table_schema = current_schema();
+        """, [self.table, self.table])
+        for column, sequence in self.cursor.fetchall():
+            if sequence:
+                self.cursor.execute(
+                    'ALTER SEQUENCE {sequence} OWNED BY "{shadow}"."{column}";'.format(
+                        sequence=sequence, shadow=self.shadow, column=column))
+
+    def swap(self):
+        """
+        Replace the live table with the shadow table.
+        This only changes the catalog, so it holds
+        the lock on the live table very briefly
+        """
+        with transaction.atomic():
+            self.cursor.execute(
+                'SET LOCAL lock_timeout = %s;', [settings.STAGING_LOCK_TIMEOUT])
+            self.move_sequences()
+            self.cursor.execute('ALTER TABLE "{table}" RENAME TO "{old}";'.format(
+                table=self.table, old=self.old))
+            self.cursor.execute('ALTER TABLE "{shadow}" RENAME TO "{table}";'.format(
+                shadow=self.shadow, table=self.table))
+            self.cursor.execute('DROP TABLE "{old}";'.format(old=self.old))
+            for index in self.indexes:
+                index.rename(
+                    self.cursor, self.table, self.get_shadow_index_name(index))
+
+    def drop(self):
+        self.cursor.execute('DROP TABLE IF EXISTS "{shadow}";'.format(
+            shadow=self.shadow))
@@ -0,0 +1,140 @@
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from addressbase.helpers import (
+    create_address_records_for_council,
+    EdgeCaseFixer,
+    postcodes_not_contained_by_district,
+    postcodes_not_contained_by_districts
+)
+from addressbase.tests.test_addressbase import MockLogger
+from councils.models import Council
+from data_collection.staging import StagingTables
+from pollingstations.models import PollingDistrict, ResidentialAddress
+
+
+def legacy_create_address_records_for_council(council, batch_size, logger):
+    # the original district-by-district, postcode-by-postcode
+    # implementation of create_address_records_for_council()
+    # kept here so we can compare against it
+    postcode_report = {
+        'no_attention_needed': 0,
+        'addresses_created': 0,
+        'postcodes_needing_address_lookup': set(),
+    }
+
+    fixer = EdgeCaseFixer(council.pk, logger)
+    for district in PollingDistrict.objects.filter(council=council):
+        data = postcodes_not_contained_by_district(district)
+
+        postcode_report['no_attention_needed'] += \
+            data['total'] - len(data['not_contained'])
+        postcode_report['postcodes_needing_address_lookup'].update(data['not_contained'])
+
+        for postcode in data['not_contained']:
+            fixer.make_addresses_for_postcode(postcode)
+
+    address_set = fixer.get_address_set()
+    address_set.save(batch_size)
+    postcode_report['addresses_created'] = len(address_set)
+
+    return postcode_report
+
+
+class CreateAddressRecordsTest(TestCase):
+
+    fixtures = ['test_kentwell_data.json']
+
+    def get_addresses(self):
+        return sorted(ResidentialAddress.objects.values_list(
+            'address', 'postcode', 'council_id', 'polling_station_id', 'slug'))
+
+    def run_implementation(self, func, **kwargs):
+        ResidentialAddress.objects.all().delete()
+        council = Council.objects.get(pk='X01000001')
+        with CaptureQueriesContext(connection) as queries:
+            report = func(council, 1000, MockLogger(), **kwargs)
+        return report, self.get_addresses(), len(queries)
+
+    def test_same_output(self):
+        expected_report, expected_addresses, legacy_queries =\
+            self.run_implementation(legacy_create_address_records_for_council)
+        self.assertTrue(expected_addresses)
+
+        # try a few batch sizes so we split the postcodes
+        # into several batches as well as one
+        for postcode_batch_size in [1, 2, 500]:
+            report, addresses, queries = self.run_implementation(
+                create_address_records_for_council,
+                postcode_batch_size=postcode_batch_size)
+            self.assertEqual(expected_report, report)
+            self.assertEqual(expected_addresses, addresses)
+
+        # with all postcodes in one batch we should be doing
+        # a fixed number of queries, however many postcodes there are
+        self.assertLess(queries, legacy_queries)
+
+    def test_postcodes_single_query(self):
+        council = Council.objects.get(pk='X01000001')
+        with self.assertNumQueries(1):
+            contained, not_contained = postcodes_not_contained_by_districts(
+                council)
+        self.assertIn('KW15 88TF', not_contained)
+        self.assertNotIn('KW15 88LM', not_contained)
+
+    def test_fixer_single_query(self):
+        fixer = EdgeCaseFixer('X01000001', MockLogger())
+        with CaptureQueriesContext(connection) as queries:
+            fixer.make_addresses_for_postcodes(
+                ['KW15 88TF', 'KW15 88LX', 'KW15 88LZ'])
+        # there may be other queries to find the council
+        # for addresses which aren't in ONSAD
+        self.assertEqual(1, len([
+            q for q in queries if 'addressbase_address' in q['sql']]))
+        self.assertEqual(
+            set(['KW15 88TF', 'KW15 88LX', 'KW15 88LZ']),
+            set(a.postcode for a in fixer.get_address_set()))
+
+
+class StagedEdgeCaseFixerTest(TestCase):
+
+    fixtures = ['test_kentwell_data.json']
+
+    def setUp(self):
+        # another council's district overlaps 80 Kendell Street
+        Council.objects.create(council_id='X01000002')
+        PollingDistrict.objects.create(
+            council_id='X01000002',
+            internal_council_id='1',
+            polling_station_id='1',
+            area=MultiPolygon(Polygon.from_bbox(
+                (-4.4826, 51.9054, -4.4825, 51.9056)), srid=4326))
+
+    def get_station_ids(self):
+        fixer = EdgeCaseFixer('X01000001', MockLogger())
+        fixer.make_addresses_for_postcode('KW15 88LZ')
+        return {
+            a.address: a.polling_station_id for a in fixer.get_address_set()}
+
+    def test_overlap_across_council_boundary(self):
+        expected = self.get_station_ids()
+        self.assertEqual('', expected['80 Kendell Street'])
+
+        # staging X01000001 hides the other council's district from
+        # pollingstations_pollingdistrict: we should still find it
+        with transaction.atomic():
+            staging = StagingTables('X01000001')
+            staging.create()
+            cursor = connection.cursor()
+            for table in ['pollingstations_pollingdistrict',
+                          'pollingstations_pollingstation']:
+                cursor.execute("""
+                    INSERT INTO pg_temp."{table}"
+                    SELECT * FROM public."{table}" WHERE council_id = %s;
+                """.format(table=table), ['X01000001'])
+            self.assertFalse(PollingDistrict.objects.filter(
+                council_id='X01000002').exists())
+            self.assertEqual(expected, self.get_station_ids())
+            staging.drop()
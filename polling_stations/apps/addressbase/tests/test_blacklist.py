@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from addressbase.models import Blacklist
+
+
+class CreateBlacklistTest(TestCase):
+
+    fixtures = ['test_addressbase.json']
+
+    def setUp(self):
+        Blacklist.objects.create(postcode='ZZ11ZZ', lad='Z01000001')
+        call_command('create_blacklist')
+
+    def test_blacklist(self):
+        # CC1 1CC is the only postcode with UPRNs in >1 local authorities
+        self.assertEqual(
+            [('CC11CC', 'B01000001'), ('CC11CC', 'B01000002')],
+            sorted(Blacklist.objects.values_list('postcode', 'lad')))
+
+    def test_create(self):
+        # the id sequence still works after the swap
+        Blacklist.objects.create(postcode='ZZ11ZZ', lad='Z01000001')
+        self.assertEqual(3, Blacklist.objects.count())
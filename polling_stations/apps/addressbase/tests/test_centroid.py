@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from addressbase.helpers import centre_from_points_qs
+from addressbase.management.commands.benchmark_centroids import (
+    make_postcode,
+    union_centroid
+)
+from addressbase.models import Address
+
+
+class CentreFromPointsTest(TestCase):
+
+    def test_matches_union_centroid(self):
+        # the aggregate query should give us the same point as
+        # unioning the points one at a time for any size of postcode
+        for size in [1, 2, 10, 100, 500]:
+            qs = make_postcode('ZZ9 %iZZ' % (size), size, seed=size)
+            expected = union_centroid(qs.all())
+            centre = centre_from_points_qs(qs.all())
+            self.assertAlmostEqual(expected.x, centre.x, places=10)
+            self.assertAlmostEqual(expected.y, centre.y, places=10)
+
+    def test_single_query(self):
+        qs = make_postcode('ZZ9 9ZZ', 500)
+        with self.assertNumQueries(1):
+            centre_from_points_qs(qs)
+
+    def test_no_points(self):
+        qs = Address.objects.filter(postcode='ZZ9 9ZZ')
+        self.assertIsNone(centre_from_points_qs(qs))
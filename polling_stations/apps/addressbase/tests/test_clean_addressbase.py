@@ -0,0 +1,96 @@
+import csv
+import glob
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from addressbase.management.commands.clean_addressbase import FIELDNAMES
+
+
+def legacy_clean(ab_path, out_path):
+    # the original DictReader/DictWriter implementation
+    address_fields = [
+        'ORGANISATION_NAME', 'DEPARTMENT_NAME', 'PO_BOX_NUMBER',
+        'SUB_BUILDING_NAME', 'BUILDING_NAME', 'BUILDING_NUMBER',
+        'DEPENDENT_THOROUGHFARE', 'THOROUGHFARE',
+        'DOUBLE_DEPENDENT_LOCALITY', 'DEPENDENT_LOCALITY', 'POST_TOWN',
+    ]
+    with open(out_path, 'w') as out_file:
+        for csv_path in csv_paths(ab_path):
+            out_csv = csv.DictWriter(out_file, fieldnames=[
+                'UPRN', 'address', 'postcode', 'location'])
+            with open(csv_path) as csv_file:
+                for line in csv.DictReader(csv_file, fieldnames=FIELDNAMES):
+                    out_csv.writerow({
+                        'UPRN': line['UPRN'],
+                        'address': ", ".join(
+                            [line[f] for f in address_fields if line[f]]),
+                        'postcode': line['POSTCODE'],
+                        'location': "SRID=4326;POINT({} {})".format(
+                            line['LONGITUDE'], line['LATITUDE']),
+                    })
+
+
+def csv_paths(ab_path):
+    return [
+        p for p in glob.glob(os.path.join(ab_path, '*.csv'))
+        if not p.endswith('cleaned.csv')
+    ]
+
+
+class CleanAddressBaseTest(TestCase):
+
+    def setUp(self):
+        self.ab_path = tempfile.mkdtemp()
+
+        def row(uprn, **kwargs):
+            values = dict.fromkeys(FIELDNAMES, '')
+            values.update(kwargs, UPRN=uprn)
+            return [values[f] for f in FIELDNAMES]
+
+        files = {
+            'a.csv': [
+                row('1', BUILDING_NUMBER='1', THOROUGHFARE='Foo Street',
+                    POST_TOWN='Fooville', POSTCODE='AA1 1AA',
+                    LATITUDE='52.1', LONGITUDE='-1.1'),
+                row('2', ORGANISATION_NAME='Bar, "Baz" & Co',
+                    BUILDING_NAME='Bar\nHouse', POST_TOWN='Fooville',
+                    POSTCODE='AA1 1AB', LATITUDE='52.2', LONGITUDE='-1.2'),
+                [],
+                ['3', 'short row'],
+            ],
+            'b.csv': [
+                row(str(i), BUILDING_NUMBER=str(i), THOROUGHFARE='Bar Road',
+                    POSTCODE='BB1 1BB', LATITUDE='53', LONGITUDE='-2')
+                for i in range(100, 200)
+            ],
+            'c.csv': [],
+        }
+        for name, rows in files.items():
+            with open(os.path.join(self.ab_path, name), 'w') as f:
+                csv.writer(f).writerows(rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.ab_path)
+
+    def read_bytes(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_output_matches_legacy_cleaner(self):
+        expected_path = os.path.join(self.ab_path, 'expected.out')
+        legacy_clean(self.ab_path, expected_path)
+        expected = self.read_bytes(expected_path)
+
+        for jobs in [1, 3]:
+            call_command('clean_addressbase', self.ab_path, jobs=jobs)
+            self.assertEqual(expected, self.read_bytes(
+                os.path.join(self.ab_path, 'addressbase_cleaned.csv')))
+
+        # temp files are cleaned up
+        self.assertEqual(
+            ['a.csv', 'addressbase_cleaned.csv', 'b.csv', 'c.csv', 'expected.out'],
+            sorted(os.listdir(self.ab_path)))
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from addressbase.models import Address
+from addressbase.shadow import get_indexes
+
+
+class ImportCleanedAddressesTest(TestCase):
+
+    def setUp(self):
+        Address.objects.create(
+            uprn='999', address='Old address', postcode='ZZ1 1ZZ',
+            location='SRID=4326;POINT(-1 52)')
+
+        self.ab_path = tempfile.mkdtemp()
+        with open(os.path.join(self.ab_path, 'addressbase_cleaned.csv'), 'w') as f:
+            f.write('1,"1 Foo Street, Fooville",AA1 1AA,SRID=4326;POINT(-1.1 52.1)\r\n')
+            f.write('2,"Bar, ""Baz"" & Co",AA1 1AA,SRID=4326;POINT(-1.2 52.2)\r\n')
+            f.write('3,3 Baz Road,BB1 1BB,SRID=4326;POINT(-1.3 52.3)\r\n')
+
+        self.cursor = connection.cursor()
+        self.indexes = self.get_index_names()
+
+    def tearDown(self):
+        shutil.rmtree(self.ab_path)
+
+    def get_index_names(self):
+        return sorted(
+            index.name for index in get_indexes(self.cursor, 'addressbase_address'))
+
+    def run_assertions(self):
+        self.assertEqual(
+            ['1', '2', '3'],
+            sorted(Address.objects.values_list('uprn', flat=True)))
+        self.assertEqual(
+            'Bar, "Baz" & Co', Address.objects.get(uprn='2').address)
+        self.assertEqual(2, Address.objects.filter(postcode='AA1 1AA').count())
+        # indexes are rebuilt with their original names
+        self.assertEqual(self.indexes, self.get_index_names())
+
+    def test_shadow(self):
+        call_command('import_cleaned_addresses', self.ab_path)
+        self.run_assertions()
+        self.cursor.execute(
+            "SELECT to_regclass('addressbase_address_shadow')")
+        self.assertIsNone(self.cursor.fetchone()[0])
+
+    def test_in_place(self):
+        call_command('import_cleaned_addresses', self.ab_path, in_place=True)
+        self.run_assertions()
+
+    def test_in_place_drop_indexes(self):
+        call_command('import_cleaned_addresses', self.ab_path,
+                     in_place=True, drop_indexes=True)
+        self.run_assertions()
+
+    def test_drop_indexes_needs_in_place(self):
+        with self.assertRaises(CommandError):
+            call_command('import_cleaned_addresses', self.ab_path,
+                         drop_indexes=True)
+        self.assertEqual(
+            ['999'], list(Address.objects.values_list('uprn', flat=True)))
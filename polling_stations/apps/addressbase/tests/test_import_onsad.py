@@ -0,0 +1,53 @@
+import csv
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from addressbase.management.commands.import_onsad import COLUMNS
+from addressbase.models import Onsad
+
+
+class ImportOnsadTest(TestCase):
+
+    def setUp(self):
+        Onsad.objects.create(uprn='999', lad='Z01000001')
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_csv(self, name, rows):
+        with open(os.path.join(self.path, name), 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow([c.upper() for c in COLUMNS])
+            writer.writerows(rows)
+
+    def row(self, uprn, lad):
+        values = dict.fromkeys(COLUMNS, '')
+        values.update(uprn=uprn, lad=lad)
+        return [values[c] for c in COLUMNS]
+
+    def test_import(self):
+        self.write_csv('a.csv', [self.row('1', 'A01000001'), self.row('2', '')])
+        self.write_csv('b.csv', [self.row('3', 'B01000001')])
+
+        call_command('import_onsad', self.path, jobs=1)
+
+        self.assertEqual(
+            [('1', 'A01000001'), ('2', ''), ('3', 'B01000001')],
+            sorted(Onsad.objects.values_list('uprn', 'lad')))
+        # empty fields are loaded as empty strings, not NULL
+        self.assertEqual('', Onsad.objects.get(uprn='1').ward)
+
+    def test_bad_row(self):
+        self.write_csv('a.csv', [self.row('1', 'A01000001'), ['2', 'short']])
+
+        with self.assertRaises(CommandError):
+            call_command('import_onsad', self.path, jobs=1)
+
+        # existing data is left alone
+        self.assertEqual(['999'], list(Onsad.objects.values_list('uprn', flat=True)))
@@ -0,0 +1,48 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from addressbase.models import PostcodeLookup
+
+
+class PostcodeLookupTest(TestCase):
+
+    fixtures = ['test_addressbase.json']
+
+    def setUp(self):
+        # throw away the pre-built lookup in the fixture
+        # so we can check the command builds the same thing
+        PostcodeLookup.objects.all().delete()
+        call_command('create_postcode_lookup')
+
+    def test_no_codes(self):
+        lookup = PostcodeLookup.objects.get(pk='AA1 1AA')
+        self.assertEqual('', lookup.council_gss)
+        self.assertEqual([], lookup.gss_codes)
+        self.assertFalse(lookup.multiple_councils)
+
+    def test_multiple_councils(self):
+        lookup = PostcodeLookup.objects.get(pk='CC1 1CC')
+        self.assertEqual('', lookup.council_gss)
+        self.assertTrue(lookup.multiple_councils)
+        self.assertCountEqual(
+            ['A01000001', 'B01000001', 'B01000002',
+             'C01000001', 'D01000001', 'E01000001'],
+            lookup.gss_codes
+        )
+
+    def test_valid(self):
+        lookup = PostcodeLookup.objects.get(pk='BB1 1BB')
+        self.assertEqual('B01000001', lookup.council_gss)
+        self.assertFalse(lookup.multiple_councils)
+        self.assertCountEqual(
+            ['A01000001', 'B01000001', 'C01000001', 'D01000001', 'E01000001'],
+            lookup.gss_codes
+        )
+        self.assertAlmostEqual(-3.8333333333333335, lookup.location.x)
+        self.assertAlmostEqual(51.1333333333333329, lookup.location.y)
+
+    def test_all_postcodes(self):
+        self.assertCountEqual(
+            ['AA1 1AA', 'BB1 1BB', 'CC1 1CC'],
+            PostcodeLookup.objects.values_list('postcode', flat=True)
+        )
@@ -1,6 +1,12 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
 from rest_framework.decorators import list_route
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LargeResultsSetPagination(LimitOffsetPagination):
@@ -8,6 +14,89 @@ class LargeResultsSetPagination(LimitOffsetPagination):
     max_limit = 1000
 
 
+class KeysetPagination(BasePagination):
+    """
+    Page through records in (council_id, internal_council_id) order
+
+    Each page ends with a cursor encoding the last record's key, and the
+    next page is fetched with WHERE (council_id, internal_council_id) > key
+    using the unique index on those columns, so every page costs the same
+    however far through the data we are (unlike OFFSET, which has to
+    read and discard every record before the page).
+    Pass ?cursor= (empty) to get the first page.
+    """
+
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(
+                encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != 2 or\
+                not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, record):
+        position = json.dumps([record.council_id, record.internal_council_id])
+        encoded = base64.urlsafe_b64encode(
+            position.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+
+        # records with no council have no key to page on
+        queryset = queryset.filter(council__isnull=False).order_by(
+            'council_id', 'internal_council_id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            # a row comparison (rather than a = x AND b > y OR a > x)
+            # lets postgres start an index scan at the cursor
+            queryset = queryset.extra(
+                where=['("{table}"."council_id", "{table}"."internal_council_id") > (%s, %s)'.format(
+                    table=queryset.model._meta.db_table)],
+                params=position
+            )
+
+        # fetch one extra record to find out if there is a next page
+        records = list(queryset[:self.limit + 1])
+        self.has_next = len(records) > self.limit
+        self.page = records[:self.limit]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
 class PollingEntityMixin():
 
     pagination_class = LargeResultsSetPagination
@@ -25,6 +114,10 @@ class PollingEntityMixin():
 
         queryset = self.get_queryset()
 
+        if 'cursor' in request.query_params:
+            # opt in to keyset pagination
+            self.pagination_class = KeysetPagination
+
         if 'council_id' not in request.query_params:
             # paginate results if we are not filtering
             page = self.paginate_queryset(queryset)
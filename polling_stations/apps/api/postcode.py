@@ -4,10 +4,9 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 from django.contrib.gis.geos import Point
 from django.core.exceptions import ObjectDoesNotExist
-from councils.models import Council
+from councils.helpers import council_locator
 from data_finder.views import LogLookUpMixin
 from data_finder.helpers import (
-    AddressSorter,
     geocode,
     PostcodeError,
     RateLimitError,
@@ -35,8 +34,8 @@ class PostcodeViewSet(ViewSet, LogLookUpMixin):
 
     def generate_addresses(self, routing_helper):
         if routing_helper.route_type == "multiple_addresses":
-            sorter = AddressSorter(routing_helper.addresses)
-            return sorter.natural_sort()
+            # already in sort_key order
+            return routing_helper.addresses
         return []
 
     def generate_polling_station(self, routing_helper, council, location):
@@ -91,7 +90,7 @@ class PostcodeViewSet(ViewSet, LogLookUpMixin):
             council = None
         else:
             try:
-                council = Council.objects.get(area__covers=location)
+                council = council_locator.get_council(location)
             except ObjectDoesNotExist:
                 return Response({'detail': 'Internal server error'}, 500)
         ret['council'] = council
@@ -86,3 +86,18 @@ class PollingDistrictsTest(TestCase):
         self.assertEqual(response.data, geo_response.data['properties'])
 
         self.assertEqual('AA', response.data['district_id'])
+
+    def test_cursor_pagination(self):
+        factory = APIRequestFactory()
+        request = factory.get('/foo?cursor=&limit=2', format='json')
+        response = PollingDistrictViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ['AA', 'BB'], [d['district_id'] for d in response.data['results']])
+
+        request = factory.get(response.data['next'], format='json')
+        response = PollingDistrictViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ['CC'], [d['district_id'] for d in response.data['results']])
+        self.assertIsNone(response.data['next'])
@@ -73,3 +73,36 @@ class PollingStationsTest(TestCase):
         response = PollingStationViewSet.as_view({'get': 'geo'})(request)
 
         self.assertEqual(None, response.data['geometry'])
+
+    def test_cursor_pagination(self):
+        factory = APIRequestFactory()
+        request = factory.get('/foo?cursor=&limit=2', format='json')
+        response = PollingStationViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ['1', '2'], [s['station_id'] for s in response.data['results']])
+        self.assertIsNotNone(response.data['next'])
+
+        # follow the next link to the last page
+        request = factory.get(response.data['next'], format='json')
+        response = PollingStationViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ['3'], [s['station_id'] for s in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_pagination_geo(self):
+        factory = APIRequestFactory()
+        request = factory.get('/foo?cursor=&limit=2', format='json')
+        response = PollingStationViewSet.as_view({'get': 'geo'})(request)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('FeatureCollection', response.data['results']['type'])
+        self.assertEqual(
+            ['X01000001.1', 'X01000001.2'],
+            [f['id'] for f in response.data['results']['features']])
+
+    def test_invalid_cursor(self):
+        factory = APIRequestFactory()
+        request = factory.get('/foo?cursor=notacursor', format='json')
+        response = PollingStationViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(404, response.status_code)
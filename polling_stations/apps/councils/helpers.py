@@ -0,0 +1,147 @@
+"""
+Find the council whose area covers a point without querying
+Council.area (a geography column) for every lookup
+
+For each council we keep two simplified versions of its boundary in memory:
+- inner: shrunk by COUNCIL_LOCATOR_TOLERANCE, so anything it covers
+  is definitely inside the council area
+- outer: grown by COUNCIL_LOCATOR_TOLERANCE, so anything it doesn't
+  cover is definitely outside the council area
+Only points between the two (i.e: close to a boundary) are checked
+against the exact geometry, which is loaded the first time we need it.
+
+Boundaries are reloaded whenever a Council is saved or deleted.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from councils.models import Council
+
+
+VERSION_KEY = 'council-locator-version'
+
+
+def invalidate_council_locator():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=Council)
+@receiver(post_delete, sender=Council)
+def council_changed(sender, **kwargs):
+    invalidate_council_locator()
+
+
+class CouncilBoundary:
+
+    def __init__(self, council_id, extent, inner, outer):
+        self.council_id = council_id
+        self.extent = extent
+        self.inner = inner.prepared
+        self.outer = outer.prepared
+        self.exact = None
+
+    def get_exact(self):
+        if self.exact is None:
+            area = Council.objects.filter(
+                pk=self.council_id).values_list('area', flat=True)[0]
+            self.exact = area.prepared
+        return self.exact
+
+    def covers(self, location):
+        xmin, ymin, xmax, ymax = self.extent
+        if not (xmin <= location.x <= xmax and ymin <= location.y <= ymax):
+            return False
+        if self.inner.covers(location):
+            return True
+        if not self.outer.covers(location):
+            return False
+        return self.get_exact().covers(location)
+
+
+class CouncilLocator:
+
+    def __init__(self):
+        self.boundaries = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        # let PostGIS do the simplification so we don't have to
+        # pull every council's full boundary into memory
+        tolerance = settings.COUNCIL_LOCATOR_TOLERANCE
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT
+                council_id,
+                ST_XMin(area::geometry), ST_YMin(area::geometry),
+                ST_XMax(area::geometry), ST_YMax(area::geometry),
+                ST_AsEWKB(ST_Buffer(
+                    ST_SimplifyPreserveTopology(area::geometry, %s), %s)),
+                ST_AsEWKB(ST_Buffer(
+                    ST_SimplifyPreserveTopology(area::geometry, %s), %s))
+            FROM councils_council
+            WHERE area IS NOT NULL
+            ORDER BY council_id;
+        """, [tolerance, -tolerance, tolerance, tolerance])
+
+        return [
+            CouncilBoundary(
+                row[0],
+                (row[1], row[2], row[3], row[4]),
+                GEOSGeometry(bytes(row[5])),
+                GEOSGeometry(bytes(row[6])),
+            ) for row in cursor.fetchall()
+        ]
+
+    def get_boundaries(self):
+        version = cache.get(VERSION_KEY)
+        if self.boundaries is None or self.version != version:
+            with self.lock:
+                if self.boundaries is None or self.version != version:
+                    self.boundaries = self.load()
+                    self.version = version
+        return self.boundaries
+
+    def find_council_ids(self, location):
+        if location.srid and location.srid != 4326:
+            location = location.transform(4326, clone=True)
+        return [
+            boundary.council_id for boundary in self.get_boundaries()
+            if boundary.covers(location)
+        ]
+
+    def get_council_id(self, location):
+        """
+        Behaves like Council.objects.get(area__covers=location)
+        but only returns the council_id
+        """
+        council_ids = self.find_council_ids(location)
+        if not council_ids:
+            raise Council.DoesNotExist(
+                'No council area covers %s' % (location.wkt))
+        if len(council_ids) > 1:
+            raise Council.MultipleObjectsReturned(
+                'Location %s is covered by more than one council area: %s' % (
+                    location.wkt, ', '.join(council_ids)))
+        return council_ids[0]
+
+    def get_council(self, location):
+        """
+        Behaves like Council.objects.get(area__covers=location)
+        """
+        return Council.objects.defer("area", "location").get(
+            pk=self.get_council_id(location))
+
+    def clear(self):
+        with self.lock:
+            self.boundaries = None
+
+
+council_locator = CouncilLocator()
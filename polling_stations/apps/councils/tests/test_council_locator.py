@@ -0,0 +1,75 @@
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import cache
+from django.test import TestCase
+
+from councils.helpers import council_locator, invalidate_council_locator
+from councils.models import Council
+
+
+class CouncilLocatorTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        council_locator.clear()
+        # 2 councils next to each other
+        Council.objects.create(
+            council_id='X01000001',
+            area=MultiPolygon(Polygon.from_bbox((0, 0, 1, 1)), srid=4326))
+        Council.objects.create(
+            council_id='X01000002',
+            area=MultiPolygon(Polygon.from_bbox((1, 0, 2, 1)), srid=4326))
+        # and one we don't have a boundary for
+        Council.objects.create(council_id='X01000003')
+
+    def tearDown(self):
+        council_locator.clear()
+
+    def test_inside(self):
+        self.assertEqual(
+            'X01000001', council_locator.get_council_id(Point(0.5, 0.5)))
+        self.assertEqual(
+            'X01000002', council_locator.get_council(Point(1.5, 0.5)).pk)
+
+    def test_near_boundary(self):
+        # these points are within COUNCIL_LOCATOR_TOLERANCE of a boundary
+        # so we need to check them against the real geometry
+        self.assertEqual(
+            'X01000001', council_locator.get_council_id(Point(0.9999, 0.5)))
+        self.assertEqual(
+            'X01000002', council_locator.get_council_id(Point(1.0001, 0.5)))
+        with self.assertRaises(Council.DoesNotExist):
+            council_locator.get_council_id(Point(-0.0001, 0.5))
+
+    def test_matches_db(self):
+        for x in [0.0001, 0.25, 0.9999, 1.0001, 1.75, 1.9999]:
+            point = Point(x, 0.5, srid=4326)
+            self.assertEqual(
+                Council.objects.get(area__covers=point).pk,
+                council_locator.get_council_id(point))
+
+    def test_reload_on_save(self):
+        council_locator.get_council_id(Point(0.5, 0.5))
+        council = Council.objects.get(pk='X01000003')
+        council.area = MultiPolygon(
+            Polygon.from_bbox((0, 2, 1, 3)), srid=4326)
+        council.save()
+        self.assertEqual(
+            'X01000003', council_locator.get_council_id(Point(0.5, 2.5)))
+
+    def test_outside(self):
+        with self.assertRaises(Council.DoesNotExist):
+            council_locator.get_council(Point(3, 3))
+
+    def test_no_queries_away_from_boundaries(self):
+        council_locator.get_council_id(Point(0.5, 0.5))
+        with self.assertNumQueries(0):
+            council_locator.get_council_id(Point(0.25, 0.25))
+            council_locator.get_council_id(Point(1.75, 0.75))
+
+    def test_invalidate(self):
+        council_locator.get_council_id(Point(0.5, 0.5))
+        # QuerySet.update() doesn't send post_save
+        Council.objects.filter(pk='X01000001').update(area=None)
+        invalidate_council_locator()
+        with self.assertRaises(Council.DoesNotExist):
+            council_locator.get_council_id(Point(0.5, 0.5))
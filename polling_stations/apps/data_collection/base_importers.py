@@ -2,6 +2,7 @@
 Defines the base importer classes to implement
 """
 import abc
+import inspect
 import json
 import glob
 import logging
@@ -25,23 +26,24 @@ from data_collection.data_types import (
     DistrictSet,
     StationSet
 )
-from data_collection.data_quality_report import (
-    DataQualityReportBuilder,
-    StationReport,
-    DistrictReport,
-    ResidentialAddressReport
-)
-from data_collection.filehelpers import FileHelperFactory
+from data_collection.data_quality_report import DataQualityReportBuilder
+from data_collection.filehelpers import FileHelperFactory, hash_files
 from data_collection.loghelper import LogHelper
 from data_collection.slugger import Slugger
 from data_collection.s3wrapper import S3Wrapper
+from data_collection.staging import StagingTables
 from pollingstations.models import (
     PollingStation,
     PollingDistrict,
     ResidentialAddress
 )
+from pollingstations.spatial import invalidate_district_index
 from data_collection.models import DataQuality
-from data_finder.helpers import geocode_point_only, PostcodeError
+from data_finder.helpers import (
+    geocode_many,
+    geocode_point_only,
+    PostcodeError
+)
 from addressbase.helpers import create_address_records_for_council
 
 
@@ -78,6 +80,9 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
     base_folder_path = None
     logger = None
     batch_size = None
+    sync_counts = None
+    import_hash = None
+    skipped = False
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -104,6 +109,24 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
             default=3000
         )
 
+        parser.add_argument(
+            '-i',
+            '--incremental',
+            help='<Optional> Only apply the differences between the new data and the data already imported for this council',
+            action='store_true',
+            required=False,
+            default=False
+        )
+
+        parser.add_argument(
+            '-f',
+            '--force',
+            help='<Optional> Import even if the data and import script have not changed since the last import',
+            action='store_true',
+            required=False,
+            default=False
+        )
+
     def teardown(self, council):
         PollingStation.objects.filter(council=council).delete()
         PollingDistrict.objects.filter(council=council).delete()
@@ -112,12 +135,18 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
     def get_council(self, council_id):
         return Council.objects.get(pk=council_id)
 
-    def get_data(self, filetype, filename):
+    def get_data(self, filetype, filename, stream=False):
+        """
+        If stream is True and the file helper supports it, return
+        a generator instead of a list. Only iterate over it once
+        """
         if hasattr(self, 'get_file_options'):
             options = self.get_file_options()
         else:
             options = {}
         helper = FileHelperFactory.create(filetype, filename, options)
+        if stream and hasattr(helper, 'stream_features'):
+            return helper.stream_features()
         return helper.get_features()
 
     def get_srid(self, type=None):
@@ -138,10 +167,10 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
     def report(self):
         # build report
         report = DataQualityReportBuilder(self.council_id)
-        station_report = StationReport(self.council_id)
-        district_report = DistrictReport(self.council_id)
-        address_report = ResidentialAddressReport(self.council_id)
         report.build_report()
+        station_report = report.stations_report
+        district_report = report.districts_report
+        address_report = report.address_report
 
         # save a static copy in the DB that we can serve up on the website
         record = DataQuality.objects.get_or_create(
@@ -200,11 +229,65 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
 
         self.council = self.get_council(self.council_id)
 
-        # Delete old data for this council
-        self.teardown(self.council)
-
         self.base_folder_path = self.get_base_folder_path()
+        self.import_hash = self.get_import_hash()
+        if not kwargs.get('force') and self.is_unchanged():
+            if verbosity > 0:
+                print("%s: data and import script unchanged since last import, skipping" % (
+                    self.council_id))
+            self.skipped = True
+            return
+
+        self.import_staged(**kwargs)
+        if verbosity > 0:
+            self.report_sync_counts()
+
+        # make sure nothing is still using the districts we just replaced
+        invalidate_district_index(self.council.pk)
+
+        # save and output data quality report
+        if verbosity > 0:
+            self.report()
+
+    def get_source_files(self):
+        """
+        Source files for this import script and all of the project's
+        classes it inherits from (e.g: base_importers.py),
+        so a change to any of them means we import again
+        """
+        project_root = os.path.abspath(settings.PROJECT_ROOT)
+        files = []
+        for cls in type(self).__mro__:
+            try:
+                path = os.path.abspath(inspect.getfile(cls))
+            except TypeError:
+                # built-in class (e.g: object)
+                continue
+            if path.startswith(project_root + os.sep) and path not in files:
+                files.append(path)
+        return files
 
+    def get_import_hash(self):
+        """
+        Hash of this import script and its input files.
+        Returns None if we can't tell whether the input has changed
+        (e.g: the data is fetched from an API)
+        """
+        if not getattr(self, 'local_files', True):
+            return None
+        return hash_files(self.get_source_files() + [self.base_folder_path])
+
+    def is_unchanged(self):
+        if self.import_hash is None:
+            return False
+        if not PollingStation.objects.filter(council=self.council).exists() and\
+                not PollingDistrict.objects.filter(council=self.council).exists():
+            # the data has been deleted since it was imported
+            return False
+        return DataQuality.objects.filter(
+            council_id=self.council.pk, import_hash=self.import_hash).exists()
+
+    def run_import(self, **kwargs):
         self.import_data()
 
         # Optional step for post import tasks
@@ -218,14 +301,42 @@ class BaseImporter(BaseCommand, PostProcessingMixin, metaclass=abc.ABCMeta):
         if not kwargs.get('noclean'):
             self.clean_postcodes_overlapping_districts(self.batch_size, self.logger)
 
-        # save and output data quality report
-        if verbosity > 0:
-            self.report()
+    def import_staged(self, **kwargs):
+        """
+        Import into staging tables, then either replace the council's
+        existing data with them or (if incremental) apply only the rows
+        which have been inserted, updated or deleted since the last import.
+        The whole thing happens in one transaction, so if anything
+        goes wrong, the existing data is left alone
+        """
+        staging = StagingTables(self.council.pk)
+        with transaction.atomic():
+            staging.create()
+            self.run_import(**kwargs)
+            if kwargs.get('incremental'):
+                self.sync_counts = staging.sync()
+            else:
+                self.sync_counts = staging.swap()
+            staging.drop()
+            DataQuality.objects.update_or_create(
+                council_id=self.council.pk,
+                defaults={'import_hash': self.import_hash or ''})
+            DataQuality.objects.update_counts(self.council.pk)
+        DataQuality.objects.clear_coverage_cache()
+        return self.sync_counts
+
+    def report_sync_counts(self):
+        for table, counts in sorted(self.sync_counts.items()):
+            print("%s: %i inserted, %i updated, %i deleted" % (
+                table, counts['inserted'], counts['updated'], counts['deleted']))
+        print("%i rows touched" % sum(
+            sum(counts.values()) for counts in self.sync_counts.values()))
 
 
 class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
 
     stations = None
+    geocoded_postcodes = {}
 
     @property
     @abc.abstractmethod
@@ -248,8 +359,44 @@ class BaseStationsImporter(BaseImporter, metaclass=abc.ABCMeta):
     def get_station_hash(self, station):
         raise NotImplementedError
 
+    def get_station_postcode_to_geocode(self, record):
+        """
+        If station_record_to_dict() needs to geocode this station
+        using its postcode, return the postcode here.
+
+        This allows us to geocode all of the stations in one go
+        using geocode_many() before station_record_to_dict() is called
+        """
+        return None
+
+    def geocode_station_postcodes(self, stations):
+        postcodes = set()
+        for station in stations:
+            if self.stations_filetype in ['shp', 'shp.zip']:
+                record = station.record
+            else:
+                record = station
+            postcode = self.get_station_postcode_to_geocode(record)
+            if postcode:
+                postcodes.add(postcode)
+
+        if postcodes:
+            self.geocoded_postcodes = geocode_many(postcodes)
+        else:
+            self.geocoded_postcodes = {}
+
+    def geocode_point_only(self, postcode):
+        # use the result from geocode_station_postcodes() if we have one
+        if postcode in self.geocoded_postcodes:
+            location_data = self.geocoded_postcodes[postcode]
+            if location_data is None:
+                raise PostcodeError('Could not geocode from any source')
+            return location_data
+        return geocode_point_only(postcode)
+
     def import_polling_stations(self):
         stations = self.get_stations()
+        self.geocode_station_postcodes(stations)
         seen = set()
         for station in stations:
             """
@@ -431,8 +578,11 @@ class BaseAddressesImporter(BaseImporter, metaclass=abc.ABCMeta):
         pass
 
     def get_addresses(self):
+        # we only need to look at each address once,
+        # so don't hold the whole file in memory
         addresses_file = os.path.join(self.base_folder_path, self.addresses_name)
-        return self.get_data(self.addresses_filetype, addresses_file)
+        return self.get_data(
+            self.addresses_filetype, addresses_file, stream=True)
 
     def get_slug(self, address_info):
         # if we have a uprn, use that as the slug
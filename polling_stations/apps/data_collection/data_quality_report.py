@@ -1,6 +1,4 @@
 from django.db import connection
-from django.db.models import Q
-from pollingstations.models import PollingStation, PollingDistrict, ResidentialAddress
 
 
 # define some methods we can use to print coloured console output
@@ -27,117 +25,100 @@ class OutputFormatter:
         print(OutputFormatter.OKGREEN + OutputFormatter.BOLD + text + OutputFormatter.ENDC)
 
 
+def fetch_counts(sql, params):
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    columns = [col[0] for col in cursor.description]
+    return dict(zip(columns, cursor.fetchone()))
+
+
 # data quality stats for polling stations
 class StationReport():
 
     def __init__(self, council_id):
         self.council_id = council_id
-        self.counts = {
-            '0': 0,
-            '1': 0,
-            '>1': 0
-        }
         self.generate_counts()
 
+    def generate_counts(self):
+        # all of the stats in one pass over this council's stations.
+        # Polygon lookups count districts from any council
+        self.counts = fetch_counts("""
+            SELECT
+                COUNT(*) AS imported,
+                COUNT(CASE WHEN ps.polling_district_id != ''
+                    THEN 1 END) AS with_district_id,
+                COUNT(CASE WHEN ps.polling_district_id IS NULL
+                    OR ps.polling_district_id = ''
+                    THEN 1 END) AS without_district_id,
+                COUNT(CASE WHEN ps.polling_district_id != ''
+                    AND ps.polling_district_id IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingdistrict
+                        WHERE council_id=%s)
+                    THEN 1 END) AS valid_district_id_ref,
+                COUNT(CASE WHEN ps.polling_district_id != ''
+                    AND ps.polling_district_id NOT IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingdistrict
+                        WHERE council_id=%s)
+                    THEN 1 END) AS invalid_district_id_ref,
+                COUNT(ps.location) AS with_point,
+                COUNT(CASE WHEN ps.location IS NULL
+                    THEN 1 END) AS without_point,
+                COUNT(CASE WHEN ps.address != ''
+                    THEN 1 END) AS with_address,
+                COUNT(CASE WHEN ps.address IS NULL OR ps.address = ''
+                    THEN 1 END) AS without_address,
+                COUNT(CASE WHEN ps.location IS NOT NULL AND pd.count = 0
+                    THEN 1 END) AS in_zero_districts,
+                COUNT(CASE WHEN ps.location IS NOT NULL AND pd.count = 1
+                    THEN 1 END) AS in_one_district,
+                COUNT(CASE WHEN ps.location IS NOT NULL AND pd.count > 1
+                    THEN 1 END) AS in_more_districts
+            FROM pollingstations_pollingstation ps
+            CROSS JOIN LATERAL (
+                SELECT COUNT(*) AS count
+                FROM pollingstations_pollingdistrict
+                WHERE ST_Contains(area, ps.location)
+            ) pd
+            WHERE ps.council_id=%s;
+        """, [self.council_id, self.council_id, self.council_id])
+
     def get_stations_imported(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id
-        ).count()
+        return self.counts['imported']
 
     def get_stations_with_district_id(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id,
-            polling_district_id__isnull=False
-        ).exclude(polling_district_id='').count()
+        return self.counts['with_district_id']
 
     def get_stations_without_district_id(self):
-        return PollingStation.objects.filter(
-            Q(polling_district_id__isnull=True) | Q(polling_district_id=''),
-            council_id=self.council_id
-        ).count()
+        return self.counts['without_district_id']
 
     def get_stations_with_valid_district_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_pollingstation
-            WHERE polling_district_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingdistrict
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_district_id != ''
-            AND polling_district_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
+        return self.counts['valid_district_id_ref']
 
     def get_stations_with_invalid_district_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_pollingstation
-            WHERE polling_district_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingdistrict
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_district_id != ''
-            AND polling_district_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
+        return self.counts['invalid_district_id_ref']
 
     def get_stations_with_point(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id,
-            location__isnull=False
-        ).count()
+        return self.counts['with_point']
 
     def get_stations_without_point(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id,
-            location__isnull=True
-        ).count()
+        return self.counts['without_point']
 
     def get_stations_with_address(self):
-        return PollingStation.objects.filter(
-            council_id=self.council_id,
-            address__isnull=False
-        ).exclude(address='').count()
+        return self.counts['with_address']
 
     def get_stations_without_address(self):
-        return PollingStation.objects.filter(
-            Q(address__isnull=True) | Q(address=''),
-            council_id=self.council_id
-        ).count()
-
-    def generate_counts(self):
-        stations = PollingStation.objects.filter(
-            council_id=self.council_id
-        )
-        counts = []
-        for station in stations:
-            if station.location is not None:
-                counts.append(
-                    PollingDistrict.objects.filter(
-                        area__contains=station.location
-                    ).count()
-                )
-        for count in counts:
-            if count == 0:
-                self.counts['0'] = self.counts['0'] + 1
-            elif count == 1:
-                self.counts['1'] = self.counts['1'] + 1
-            else:
-                self.counts['>1'] = self.counts['>1'] + 1
+        return self.counts['without_address']
 
     def get_stations_in_zero_districts(self):
-        return self.counts['0']
+        return self.counts['in_zero_districts']
 
     def get_stations_in_one_districts(self):
-        return self.counts['1']
+        return self.counts['in_one_district']
 
     def get_stations_in_more_districts(self):
-        return self.counts['>1']
+        return self.counts['in_more_districts']
 
 
 # data quality stats for polling districts
@@ -145,88 +126,69 @@ class DistrictReport():
 
     def __init__(self, council_id):
         self.council_id = council_id
-        self.counts = {
-            '0': 0,
-            '1': 0,
-            '>1': 0
-        }
         self.generate_counts()
 
+    def generate_counts(self):
+        # all of the stats in one pass over this council's districts.
+        # Polygon lookups count stations from any council
+        self.counts = fetch_counts("""
+            SELECT
+                COUNT(*) AS imported,
+                COUNT(CASE WHEN pd.polling_station_id != ''
+                    THEN 1 END) AS with_station_id,
+                COUNT(CASE WHEN pd.polling_station_id IS NULL
+                    OR pd.polling_station_id = ''
+                    THEN 1 END) AS without_station_id,
+                COUNT(CASE WHEN pd.polling_station_id != ''
+                    AND pd.polling_station_id IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingstation
+                        WHERE council_id=%s)
+                    THEN 1 END) AS valid_station_id_ref,
+                COUNT(CASE WHEN pd.polling_station_id != ''
+                    AND pd.polling_station_id NOT IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingstation
+                        WHERE council_id=%s)
+                    THEN 1 END) AS invalid_station_id_ref,
+                COUNT(CASE WHEN pd.area IS NOT NULL AND ps.count = 0
+                    THEN 1 END) AS containing_zero_stations,
+                COUNT(CASE WHEN pd.area IS NOT NULL AND ps.count = 1
+                    THEN 1 END) AS containing_one_station,
+                COUNT(CASE WHEN pd.area IS NOT NULL AND ps.count > 1
+                    THEN 1 END) AS containing_more_stations
+            FROM pollingstations_pollingdistrict pd
+            CROSS JOIN LATERAL (
+                SELECT COUNT(*) AS count
+                FROM pollingstations_pollingstation
+                WHERE ST_Within(location, pd.area)
+            ) ps
+            WHERE pd.council_id=%s;
+        """, [self.council_id, self.council_id, self.council_id])
+
     def get_districts_imported(self):
-        return PollingDistrict.objects.filter(
-            council_id=self.council_id
-        ).count()
+        return self.counts['imported']
 
     def get_districts_with_station_id(self):
-        return PollingDistrict.objects.filter(
-            council_id=self.council_id,
-            polling_station_id__isnull=False
-        ).exclude(polling_station_id='').count()
+        return self.counts['with_station_id']
 
     def get_districts_without_station_id(self):
-        return PollingDistrict.objects.filter(
-            Q(polling_station_id__isnull=True) | Q(polling_station_id=''),
-            council_id=self.council_id
-        ).count()
+        return self.counts['without_station_id']
 
     def get_districts_with_valid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_pollingdistrict
-            WHERE polling_station_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
+        return self.counts['valid_station_id_ref']
 
     def get_districts_with_invalid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_pollingdistrict
-            WHERE polling_station_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
-
-    def generate_counts(self):
-        districts = PollingDistrict.objects.filter(
-            council_id=self.council_id
-        )
-        counts = []
-        for district in districts:
-            if district.area is not None:
-                counts.append(
-                    PollingStation.objects.filter(
-                        location__within=district.area
-                    ).count()
-                )
-        for count in counts:
-            if count == 0:
-                self.counts['0'] = self.counts['0'] + 1
-            elif count == 1:
-                self.counts['1'] = self.counts['1'] + 1
-            else:
-                self.counts['>1'] = self.counts['>1'] + 1
+        return self.counts['invalid_station_id_ref']
 
     def get_districts_containing_zero_stations(self):
-        return self.counts['0']
+        return self.counts['containing_zero_stations']
 
     def get_districts_containing_one_stations(self):
-        return self.counts['1']
+        return self.counts['containing_one_station']
 
     def get_districts_containing_more_stations(self):
-        return self.counts['>1']
+        return self.counts['containing_more_stations']
 
 
 # data quality stats for residential addresses
@@ -234,53 +196,47 @@ class ResidentialAddressReport():
 
     def __init__(self, council_id):
         self.council_id = council_id
+        self.generate_counts()
+
+    def generate_counts(self):
+        self.counts = fetch_counts("""
+            SELECT
+                COUNT(*) AS imported,
+                COUNT(CASE WHEN ra.polling_station_id != ''
+                    THEN 1 END) AS with_station_id,
+                COUNT(CASE WHEN ra.polling_station_id IS NULL
+                    OR ra.polling_station_id = ''
+                    THEN 1 END) AS without_station_id,
+                COUNT(CASE WHEN ra.polling_station_id != ''
+                    AND ra.polling_station_id IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingstation
+                        WHERE council_id=%s)
+                    THEN 1 END) AS valid_station_id_ref,
+                COUNT(CASE WHEN ra.polling_station_id != ''
+                    AND ra.polling_station_id NOT IN (
+                        SELECT internal_council_id
+                        FROM pollingstations_pollingstation
+                        WHERE council_id=%s)
+                    THEN 1 END) AS invalid_station_id_ref
+            FROM pollingstations_residentialaddress ra
+            WHERE ra.council_id=%s;
+        """, [self.council_id, self.council_id, self.council_id])
 
     def get_addresses_imported(self):
-        return ResidentialAddress.objects.filter(
-            council_id=self.council_id
-        ).count()
+        return self.counts['imported']
 
     def get_addresses_with_station_id(self):
-        return ResidentialAddress.objects.filter(
-            council_id=self.council_id,
-            polling_station_id__isnull=False
-        ).exclude(polling_station_id='').count()
+        return self.counts['with_station_id']
 
     def get_addresses_without_station_id(self):
-        return ResidentialAddress.objects.filter(
-            Q(polling_station_id__isnull=True) | Q(polling_station_id=''),
-            council_id=self.council_id
-        ).count()
+        return self.counts['without_station_id']
 
     def get_addresses_with_valid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_residentialaddress
-            WHERE polling_station_id IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
+        return self.counts['valid_station_id_ref']
 
     def get_addresses_with_invalid_station_id_ref(self):
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM pollingstations_residentialaddress
-            WHERE polling_station_id NOT IN
-                (SELECT internal_council_id FROM pollingstations_pollingstation
-                WHERE council_id=%s)
-            AND council_id=%s
-            AND polling_station_id != ''
-            AND polling_station_id IS NOT NULL;
-        """,
-        [self.council_id, self.council_id])
-        results = cursor.fetchall()
-        return results[0][0]
+        return self.counts['invalid_station_id_ref']
 
 
 # generate all the stats
@@ -289,6 +245,9 @@ class DataQualityReportBuilder():
     def __init__(self, council_id):
         self.council_id = council_id
         self.report = []
+        self.stations_report = None
+        self.districts_report = None
+        self.address_report = None
 
     def build_header(self):
         self.report.append({ 'style': None,
@@ -302,7 +261,7 @@ class DataQualityReportBuilder():
         })
 
     def build_station_report(self):
-        stations_report = StationReport(self.council_id)
+        stations_report = self.stations_report
 
         stations_imported = stations_report.get_stations_imported()
         if stations_imported > 0:
@@ -364,7 +323,7 @@ class DataQualityReportBuilder():
             })
 
     def build_district_report(self):
-        districts_report = DistrictReport(self.council_id)
+        districts_report = self.districts_report
 
         districts_imported = districts_report.get_districts_imported()
         if districts_imported > 0:
@@ -414,7 +373,7 @@ class DataQualityReportBuilder():
             })
 
     def build_residential_address_report(self):
-        address_report = ResidentialAddressReport(self.council_id)
+        address_report = self.address_report
 
         addresses_imported = address_report.get_addresses_imported()
         if addresses_imported > 0:
@@ -449,6 +408,12 @@ class DataQualityReportBuilder():
             })
 
     def build_report(self):
+        # each report runs its queries once when it is created
+        # and is kept so we can reuse its counts (see BaseImporter.report)
+        self.stations_report = StationReport(self.council_id)
+        self.districts_report = DistrictReport(self.council_id)
+        self.address_report = ResidentialAddressReport(self.council_id)
+
         self.build_header()
         self.build_district_report()
         self.build_station_report()
@@ -5,12 +5,14 @@ Data type classes used by base importers
 import abc
 import logging
 from collections import namedtuple
+from data_collection.loaders import bulk_load
 from data_collection.slugger import Slugger
 from pollingstations.models import (
     PollingStation,
     PollingDistrict,
     ResidentialAddress
 )
+from pollingstations.sorting import address_sort_key
 
 
 Station = namedtuple('Station', [
@@ -39,6 +41,11 @@ Address = namedtuple('Address', [
     'slug'])
 
 
+def get_council_id(council):
+    # records may hold either a Council or a council_id
+    return getattr(council, 'pk', council)
+
+
 class CustomSet(metaclass=abc.ABCMeta):
 
     def __init__(self):
@@ -72,18 +79,23 @@ class StationSet(CustomSet):
         )
 
     def save(self):
-        stations_db = []
-        for station in self.elements:
-            record = PollingStation(
-                council=station.council,
-                internal_council_id=station.internal_council_id,
-                postcode=station.postcode,
-                address=station.address,
-                location=station.location,
-                polling_district_id=station.polling_district_id,
-            )
-            stations_db.append(record)
-        PollingStation.objects.bulk_create(stations_db)
+        bulk_load(PollingStation, [
+            'council_id',
+            'internal_council_id',
+            'postcode',
+            'address',
+            'location',
+            'polling_district_id',
+        ], (
+            (
+                get_council_id(station.council),
+                station.internal_council_id,
+                station.postcode,
+                station.address,
+                station.location,
+                station.polling_district_id,
+            ) for station in self.elements
+        ))
 
 
 class DistrictSet(CustomSet):
@@ -103,18 +115,23 @@ class DistrictSet(CustomSet):
         )
 
     def save(self):
-        districts_db = []
-        for district in self.elements:
-            record = PollingDistrict(
-                name=district.name,
-                council=district.council,
-                internal_council_id=district.internal_council_id,
-                extra_id=district.extra_id,
-                area=district.area,
-                polling_station_id=district.polling_station_id,
-            )
-            districts_db.append(record)
-        PollingDistrict.objects.bulk_create(districts_db)
+        bulk_load(PollingDistrict, [
+            'name',
+            'council_id',
+            'internal_council_id',
+            'extra_id',
+            'area',
+            'polling_station_id',
+        ], (
+            (
+                district.name,
+                get_council_id(district.council),
+                district.internal_council_id,
+                district.extra_id,
+                district.area,
+                district.polling_station_id,
+            ) for district in self.elements
+        ))
 
 
 class AddressSet(CustomSet):
@@ -210,17 +227,21 @@ class AddressSet(CustomSet):
     def save(self, batch_size):
 
         self.elements = self.remove_ambiguous_addresses()
-        addresses_db = []
-
-        for address in self.elements:
-            record = ResidentialAddress(
-                address=address.address,
-                postcode=address.postcode,
-                polling_station_id=address.polling_station_id,
-                council=address.council,
-                slug=address.slug,
-            )
-            addresses_db.append(record)
-
-        ResidentialAddress.objects.bulk_create(
-            addresses_db, batch_size=batch_size)
+
+        bulk_load(ResidentialAddress, [
+            'address',
+            'postcode',
+            'polling_station_id',
+            'council_id',
+            'slug',
+            'sort_key',
+        ], (
+            (
+                address.address,
+                address.postcode,
+                address.polling_station_id,
+                get_council_id(address.council),
+                address.slug,
+                address_sort_key(address.address),
+            ) for address in self.elements
+        ), batch_size=batch_size)
@@ -1,5 +1,6 @@
 import csv
 import fnmatch
+import hashlib
 import json
 import os
 import shapefile
@@ -18,6 +19,34 @@ def recursive_find(path, pattern):
             matches.append(os.path.join(root, filename))
     return matches
 
+
+def hash_files(paths, block_size=65536):
+    """
+    Return a SHA-256 hex digest of the names and contents of a list of
+    files and/or directories (which are hashed recursively).
+    Names are relative to the path passed in, so the hash doesn't depend
+    on where the files are stored locally
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirnames, filenames in os.walk(path):
+                for filename in filenames:
+                    full_path = os.path.join(root, filename)
+                    files.append(
+                        (os.path.relpath(full_path, path), full_path))
+        else:
+            files.append((os.path.basename(path), path))
+
+    sha = hashlib.sha256()
+    for name, full_path in sorted(files):
+        sha.update(name.encode('utf-8') + b'\0')
+        with open(full_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                sha.update(block)
+        sha.update(b'\0')
+    return sha.hexdigest()
+
 """
 Helper class for reading data from CSV files
 """
@@ -28,11 +57,7 @@ class CsvHelper:
         self.encoding = encoding
         self.delimiter = delimiter
 
-    def get_features(self):
-        file = open(self.filepath, 'rt', encoding=self.encoding)
-        reader = csv.reader(file, delimiter=self.delimiter)
-        header = next(reader)
-
+    def clean_header(self, header):
         # mimic the data structure generated by ffs so existing import
         # scripts don't break
         replace = {
@@ -52,14 +77,22 @@ class CsvHelper:
             while '__' in s:
                 s = s.replace('__', '_')
             clean.append(s)
-        RowKlass = namedtuple('RowKlass', clean)
+        return clean
+
+    def stream_features(self):
+        """
+        Yield one namedtuple per row without reading the whole file into
+        memory. All rows share a single RowKlass built from the header.
+        The file is closed when the generator is exhausted or discarded
+        """
+        with open(self.filepath, 'rt', encoding=self.encoding) as file:
+            reader = csv.reader(file, delimiter=self.delimiter)
+            header = next(reader)
+            RowKlass = namedtuple('RowKlass', self.clean_header(header))
+            yield from map(RowKlass._make, reader)
 
-        data = []
-        for row in map(RowKlass._make, reader):
-            data.append(row)
-
-        file.close()
-        return data
+    def get_features(self):
+        return list(self.stream_features())
 
 
 """
@@ -0,0 +1,207 @@
+"""
+Run a batch of import scripts in parallel
+
+Each task runs in its own (forked) process so that we can enforce a timeout
+and one failing import doesn't take the others down with it.
+Tasks which share a lock_group (e.g: importers with run_in_series = True,
+which share a dataset) never run at the same time.
+"""
+import multiprocessing
+import time
+import traceback
+
+
+class ImportTask:
+
+    def __init__(self, name, lock_group=None):
+        self.name = name
+        self.lock_group = lock_group
+
+    def run(self):
+        """
+        Do the work. Return a dict of metrics (e.g: row counts)
+        which will be added to the run report
+        """
+        raise NotImplementedError
+
+
+class ImporterTask(ImportTask):
+
+    # run a (pre-loaded) import management command
+
+    def __init__(self, name, command, opts):
+        if getattr(command, 'run_in_series', False):
+            lock_group = 'run_in_series'
+        else:
+            lock_group = None
+        super().__init__(name, lock_group)
+        self.command = command
+        self.opts = opts
+
+    def run(self):
+        # import here so this module can be used without Django set up
+        from pollingstations.models import (
+            PollingDistrict, PollingStation, ResidentialAddress)
+
+        self.command.handle(**self.opts)
+        council_id = self.command.council_id
+        return {
+            'council_id': council_id,
+            'skipped': self.command.skipped,
+            'stations': PollingStation.objects.filter(
+                council_id=council_id).count(),
+            'districts': PollingDistrict.objects.filter(
+                council_id=council_id).count(),
+            'addresses': ResidentialAddress.objects.filter(
+                council_id=council_id).count(),
+        }
+
+
+def run_task(task, conn):
+    # entry point for the child process
+    try:
+        conn.send({'status': 'ok', 'metrics': task.run() or {}})
+    except Exception:
+        traceback.print_exc()
+        conn.send({'status': 'failed', 'error': traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+class RunningTask:
+
+    def __init__(self, task, attempt, before_start=None):
+        self.task = task
+        self.attempt = attempt
+        if before_start:
+            before_start()
+        self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=run_task, args=(task, child_conn))
+        self.start = time.time()
+        self.process.start()
+        child_conn.close()
+        self.result = None
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    def poll(self):
+        # collect the result if the child has sent one
+        if self.result is None and self.conn.poll():
+            try:
+                self.result = self.conn.recv()
+            except EOFError:
+                pass
+        return self.result
+
+    def is_finished(self):
+        self.poll()
+        return not self.process.is_alive()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+
+    def finish(self):
+        self.process.join()
+        result = self.poll()
+        if result is None:
+            # the process died without telling us why
+            result = {
+                'status': 'failed',
+                'error': 'Process exited with code %s' % (
+                    self.process.exitcode),
+            }
+        self.conn.close()
+        return result
+
+
+class ImportScheduler:
+
+    def __init__(self, tasks, jobs=1, timeout=None, retries=0,
+                 before_start=None, poll_interval=0.1, log=print):
+        self.pending = list(tasks)
+        self.total = len(self.pending)
+        self.jobs = max(1, jobs)
+        self.timeout = timeout
+        self.retries = retries
+        self.before_start = before_start
+        self.poll_interval = poll_interval
+        self.log = log
+        self.attempts = {}
+        self.running = []
+        self.results = []
+
+    def locked_groups(self):
+        return set(
+            r.task.lock_group for r in self.running if r.task.lock_group)
+
+    def next_task(self):
+        # the first pending task which isn't waiting for a lock
+        locked = self.locked_groups()
+        for i, task in enumerate(self.pending):
+            if task.lock_group is None or task.lock_group not in locked:
+                return self.pending.pop(i)
+        return None
+
+    def start_tasks(self):
+        while len(self.running) < self.jobs:
+            task = self.next_task()
+            if task is None:
+                return
+            attempt = self.attempts.get(task.name, 0) + 1
+            self.attempts[task.name] = attempt
+            self.log("starting %s (attempt %i)" % (task.name, attempt))
+            self.running.append(
+                RunningTask(task, attempt, self.before_start))
+
+    def handle_result(self, running, result):
+        task = running.task
+        result.update({
+            'name': task.name,
+            'attempts': running.attempt,
+            'seconds': round(running.elapsed, 3),
+        })
+
+        if result['status'] != 'ok' and running.attempt <= self.retries:
+            self.log("%s %s: retrying" % (task.name, result['status']))
+            self.pending.append(task)
+            return
+
+        self.log("%s %s in %.1fs (%i/%i done)" % (
+            task.name, result['status'], result['seconds'],
+            len(self.results) + 1, self.total))
+        self.results.append(result)
+
+    def check_running(self):
+        still_running = []
+        for running in self.running:
+            if running.is_finished():
+                self.handle_result(running, running.finish())
+            elif self.timeout and running.elapsed > self.timeout:
+                running.kill()
+                running.conn.close()
+                self.handle_result(running, {
+                    'status': 'timeout',
+                    'error': 'Timed out after %is' % (self.timeout),
+                })
+            else:
+                still_running.append(running)
+        self.running = still_running
+
+    def run(self):
+        start = time.time()
+        while self.pending or self.running:
+            self.start_tasks()
+            time.sleep(self.poll_interval)
+            self.check_running()
+
+        return {
+            'seconds': round(time.time() - start, 3),
+            'jobs': self.jobs,
+            'succeeded': len([r for r in self.results if r['status'] == 'ok']),
+            'failed': len([r for r in self.results if r['status'] != 'ok']),
+            'tasks': sorted(self.results, key=lambda r: r['name']),
+        }
@@ -0,0 +1,158 @@
+"""
+Write imported records to the database
+
+By default we stream rows into PostgreSQL using COPY ... FROM STDIN
+which is much faster than INSERTing them and means we never have to hold
+a model instance for every record in memory.
+Set DATA_IMPORT_LOADER = 'bulk_create' to use Django's bulk_create() instead.
+"""
+import binascii
+import csv
+import io
+
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection, transaction
+
+
+NULL = '\\N'
+
+
+class IteratorFile(io.TextIOBase):
+
+    """
+    File-like object which produces CSV from an iterator of rows
+    on demand, so we can pass it to copy_expert() without building
+    the whole file in memory
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def readable(self):
+        return True
+
+    def fill(self, size):
+        while size < 0 or len(self.pending) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                break
+            self.writer.writerow(row)
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate(0)
+
+    def read(self, size=-1):
+        self.fill(size)
+        if size < 0:
+            size = len(self.pending)
+        data = self.pending[:size]
+        self.pending = self.pending[size:]
+        return data
+
+    def readline(self, size=-1):
+        # COPY only uses read(), but keep io.TextIOBase happy
+        return self.read(size)
+
+
+class CopyLoader:
+
+    def __init__(self, model, fields):
+        # fields is a list of model field names (or attnames: 'council_id')
+        self.model = model
+        self.table = model._meta.db_table
+        self.fields = [model._meta.get_field(f) for f in fields]
+        self.columns = [f.column for f in self.fields]
+        self.tmp_table = 'copy_%s' % (self.table)
+
+    def is_geometry(self, field):
+        return isinstance(field, GeometryField)
+
+    def format_value(self, field, value):
+        if value is None:
+            return NULL
+        if self.is_geometry(field):
+            # hex EWKB keeps the SRID, so the temp table
+            # can hold geometries in any projection
+            if not isinstance(value, GEOSGeometry):
+                value = GEOSGeometry(value)
+            return value.hexewkb.decode('ascii')
+        if isinstance(value, (bytes, memoryview)):
+            # bytea hex format
+            return '\\x' + binascii.hexlify(value).decode('ascii')
+        return value
+
+    def format_rows(self, rows):
+        for row in rows:
+            yield [self.format_value(f, v) for f, v in zip(self.fields, row)]
+
+    def get_select_columns(self):
+        columns = []
+        for field in self.fields:
+            if self.is_geometry(field):
+                columns.append('ST_Transform("%s", %i)' % (
+                    field.column, field.srid))
+            else:
+                columns.append('"%s"' % (field.column))
+        return columns
+
+    def load(self, rows):
+        column_list = ', '.join('"%s"' % (c) for c in self.columns)
+
+        with transaction.atomic():
+            cursor = connection.cursor()
+
+            # copy into a temp table with the same columns as the target
+            # (but without the SRID constraint on geometries)
+            # then transform everything to the right SRID on the way out
+            cursor.execute("""
+                CREATE TEMP TABLE "{tmp}" ON COMMIT DROP AS
+                SELECT {columns} FROM "{table}" WITH NO DATA;
+            """.format(tmp=self.tmp_table, columns=column_list, table=self.table))
+            for field in self.fields:
+                if self.is_geometry(field):
+                    cursor.execute(
+                        'ALTER TABLE "{tmp}" ALTER COLUMN "{col}" TYPE geometry;'.format(
+                            tmp=self.tmp_table, col=field.column))
+
+            cursor.cursor.copy_expert(
+                """COPY "{tmp}" ({columns}) FROM STDIN
+                (FORMAT CSV, NULL '{null}');""".format(
+                    tmp=self.tmp_table, columns=column_list, null=NULL),
+                IteratorFile(self.format_rows(iter(rows)))
+            )
+
+            cursor.execute("""
+                INSERT INTO "{table}" ({columns})
+                SELECT {select} FROM "{tmp}";
+            """.format(
+                table=self.table,
+                columns=column_list,
+                select=', '.join(self.get_select_columns()),
+                tmp=self.tmp_table
+            ))
+            cursor.execute('DROP TABLE "{tmp}";'.format(tmp=self.tmp_table))
+
+
+def bulk_load(model, fields, rows, batch_size=None, loader=None):
+    """
+    Write rows (an iterable of tuples in the same order as fields)
+    to model's table using the loader set in DATA_IMPORT_LOADER
+    """
+    if loader is None:
+        loader = settings.DATA_IMPORT_LOADER
+
+    if loader == 'copy':
+        CopyLoader(model, fields).load(rows)
+    elif loader == 'bulk_create':
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=batch_size
+        )
+    else:
+        raise ValueError('Unexpected loader: %s' % (loader))
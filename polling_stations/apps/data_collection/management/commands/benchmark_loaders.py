@@ -0,0 +1,85 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from councils.models import Council
+from data_collection.loaders import bulk_load
+from pollingstations.models import ResidentialAddress
+
+
+def make_addresses(council_id, size):
+    for i in range(size):
+        postcode = 'ZZ%i%iZZ' % (i // 1000 % 100, i // 100 % 10)
+        yield (
+            '%i Benchmark Street, Test Town' % (i),
+            postcode,
+            'STATION-%i' % (i // 500),
+            council_id,
+            '%s-%i' % (council_id, i),
+        )
+
+
+"""
+Compare the time and memory taken to write ResidentialAddress records
+using COPY and bulk_create()
+
+Test data is inserted inside a transaction which is rolled back
+"""
+class Command(BaseCommand):
+
+    council_id = 'X99999999'
+    fields = ['address', 'postcode', 'polling_station_id', 'council_id', 'slug']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n',
+            '--size',
+            help='<Optional> Number of addresses to write',
+            type=int,
+            required=False,
+            default=200000
+        )
+
+        parser.add_argument(
+            '--batch_size',
+            help='<Optional> Batch size for bulk_create()',
+            type=int,
+            required=False,
+            default=2000
+        )
+
+    def run_loader(self, loader, size, batch_size):
+        with transaction.atomic():
+            Council.objects.create(council_id=self.council_id)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            bulk_load(
+                ResidentialAddress,
+                self.fields,
+                make_addresses(self.council_id, size),
+                batch_size=batch_size,
+                loader=loader
+            )
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            count = ResidentialAddress.objects.filter(
+                council_id=self.council_id).count()
+            transaction.set_rollback(True)
+
+        return elapsed, peak, count
+
+    def handle(self, *args, **kwargs):
+        size = kwargs['size']
+        print("writing %i addresses.." % (size))
+        print("loader         time (s)    rows/s    peak memory (MB)")
+        for loader in ['bulk_create', 'copy']:
+            elapsed, peak, count = self.run_loader(
+                loader, size, kwargs['batch_size'])
+            assert count == size
+            print("%-11s    %8.2f    %6i    %16.1f" % (
+                loader, elapsed, size / elapsed, peak / 1024 / 1024))
@@ -1,10 +1,11 @@
-import glob, os, re, traceback
+import glob, json, os, re
 from importlib.machinery import SourceFileLoader
-from multiprocessing import Pool
+from multiprocessing import cpu_count
 from django import db
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from data_collection.import_scheduler import ImporterTask, ImportScheduler
 from pollingstations.models import PollingStation
 
 
@@ -17,24 +18,22 @@ def match_in(regex, lst):
 
 # load a django management command from file f
 def load_command(f):
-    command = SourceFileLoader("module.name", f).load_module()
+    # give each module its own name so they don't overwrite each other
+    name = os.path.splitext(os.path.basename(f))[0]
+    command = SourceFileLoader(
+        "data_collection.management.commands.%s" % (name), f).load_module()
     return command.Command()
 
-# run a django management command from file f
-def run_cmd(f, opts):
-    cmd = load_command(f)
-    try:
-        cmd.handle(**opts)
-    except Exception as e:
-        traceback.print_exc()
-        raise e
-
 """
 Run all of the import scripts relating to a particular election or elections
 
 Election id may be either a string or regex. For example:
 python manage.py import -e local.buckinghamshire.2017-05-04
 python manage.py import -r -e 'local.[a-z]+.2017-05-04'
+
+Councils whose data and import script haven't changed since they were
+last imported are skipped. Use --force to import them anyway
+(e.g: after re-importing AddressBase)
 """
 class Command(BaseCommand):
 
@@ -74,15 +73,66 @@ class Command(BaseCommand):
             default=False
         )
 
+        parser.add_argument(
+            '-f',
+            '--force',
+            help='<Optional> Re-import councils even if their data and import script have not changed',
+            action='store_true',
+            required=False,
+            default=False
+        )
+
+        parser.add_argument(
+            '-i',
+            '--incremental',
+            help='<Optional> Only apply changes since the last import instead of deleting and re-importing everything',
+            action='store_true',
+            required=False,
+            default=False
+        )
+
         parser.add_argument(
             '-m',
             '--multiprocessing',
-            help='<Optional> Use multiprocessing for import',
+            help='<Optional> Use multiprocessing for import (one job per CPU)',
             action='store_true',
             required=False,
             default=False
         )
 
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            help='<Optional> Number of import scripts to run at the same time',
+            type=int,
+            required=False,
+            default=None
+        )
+
+        parser.add_argument(
+            '-t',
+            '--timeout',
+            help='<Optional> Kill any import script still running after this many seconds',
+            type=int,
+            required=False,
+            default=None
+        )
+
+        parser.add_argument(
+            '--retries',
+            help='<Optional> Number of times to retry an import script which fails',
+            type=int,
+            required=False,
+            default=0
+        )
+
+        parser.add_argument(
+            '--report',
+            help='<Optional> Write a JSON report of the run to this file',
+            required=False,
+            default=None
+        )
+
     def importer_covers_these_elections(self, args_elections, importer_elections, regex):
         for election in args_elections:
             if regex:
@@ -102,15 +152,29 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(line[1])
 
-    def run_commands_in_series(self, commands):
-        for f, opts in commands:
-            run_cmd(f, opts)
-
-    def run_commands_in_parallel(self, commands):
-        pool = Pool()
-        pool.starmap(run_cmd, commands)
-        pool.close()
-        pool.join()
+    def get_jobs(self, kwargs):
+        if kwargs['jobs']:
+            return kwargs['jobs']
+        if kwargs['multiprocessing']:
+            return cpu_count()
+        return 1
+
+    def output_report(self, report):
+        for task in report['tasks']:
+            if task['status'] == 'ok' and task['metrics']['skipped']:
+                self.stdout.write("%s: unchanged, skipped" % (task['name']))
+            elif task['status'] == 'ok':
+                self.stdout.write("%s: %i stations, %i districts, %i addresses in %.1fs" % (
+                    task['name'],
+                    task['metrics']['stations'],
+                    task['metrics']['districts'],
+                    task['metrics']['addresses'],
+                    task['seconds']))
+            else:
+                self.stdout.write(self.style.ERROR("%s: %s after %i attempt(s)" % (
+                    task['name'], task['status'], task['attempts'])))
+        self.stdout.write("%i succeeded, %i failed in %.1fs" % (
+            report['succeeded'], report['failed'], report['seconds']))
 
     def handle(self, *args, **kwargs):
         """
@@ -130,15 +194,17 @@ class Command(BaseCommand):
         if not files:
             raise ValueError("No importers matched")
 
-        commands_series = []
-        commands_parallel = []
+        tasks = []
+        jobs = self.get_jobs(kwargs)
         opts = {'noclean': False, 'verbosity': 1}
-        if kwargs['multiprocessing']:
+        if jobs > 1:
             opts = {'noclean': False, 'verbosity': 0}
+        opts['incremental'] = kwargs['incremental']
+        opts['force'] = kwargs['force']
 
         # loop over all the import scripts
         # and build up a list of management commands to run
-        for f in files:
+        for f in sorted(files):
             head, tail = os.path.split(f)
             try:
                 cmd = load_command(f)
@@ -157,28 +223,31 @@ class Command(BaseCommand):
                     if not existing_data or kwargs.get('overwrite'):
                         self.summary.append(
                             ('INFO', "Ran import script %s" % tail))
-                        if hasattr(cmd, 'run_in_series'):
-                            commands_series.append((f, opts))
-                        else:
-                            commands_parallel.append((f, opts))
+                        tasks.append(ImporterTask(tail, cmd, opts))
             else:
                 self.summary.append(('WARNING', "%s does not contain elections property!" % tail))
 
-        print(
-            "running %i import scripts..." %\
-            (len(commands_series) + len(commands_parallel))
+        print("running %i import scripts (%i at a time)..." % (len(tasks), jobs))
+
+        # commands are loaded once here: each import script runs
+        # in a forked process so they don't need to be loaded again.
+        # Close any open DB connections before forking. Otherwise, Django will throw
+        # django.db.utils.DatabaseError: lost synchronization with server
+        scheduler = ImportScheduler(
+            tasks,
+            jobs=jobs,
+            timeout=kwargs['timeout'],
+            retries=kwargs['retries'],
+            before_start=db.connections.close_all,
         )
-        # run all the import scripts
-        if kwargs['multiprocessing']:
-            # do anything we want to run in series first
-            self.run_commands_in_series(commands_series)
-
-            # before kicking off parallel imports, close any open
-            # DB connections. Otherwise, Django will throw
-            # django.db.utils.DatabaseError: lost synchronization with server
-            db.connections.close_all()
-            self.run_commands_in_parallel(commands_parallel)
-        else:
-            self.run_commands_in_series(commands_parallel + commands_series)
+        report = scheduler.run()
 
         self.output_summary()
+        self.output_report(report)
+
+        if kwargs['report']:
+            with open(kwargs['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if report['failed']:
+            raise CommandError("%i import script(s) failed" % (report['failed']))
@@ -5,7 +5,7 @@ note: this script takes quite a long time to run
 """
 from django.contrib.gis.geos import Point
 from data_collection.management.commands import BaseCsvStationsCsvAddressesImporter
-from data_finder.helpers import geocode_point_only, PostcodeError
+from data_finder.helpers import PostcodeError
 from data_collection.google_geocoding_api_wrapper import (
     GoogleGeocodingApiWrapper,
     PostcodeNotFoundException
@@ -25,6 +25,9 @@ class Command(BaseCsvStationsCsvAddressesImporter):
         'ref.2016-06-23'
     ]
 
+    def get_station_postcode_to_geocode(self, record):
+        return record.postcode
+
     def station_record_to_dict(self, record):
 
         # format address
@@ -58,7 +61,7 @@ class Command(BaseCsvStationsCsvAddressesImporter):
         """
         if postcode:
             try:
-                gridref = geocode_point_only(postcode)
+                gridref = self.geocode_point_only(postcode)
                 location = Point(gridref['wgs84_lon'], gridref['wgs84_lat'], srid=4326)
             except PostcodeError:
                 location = None
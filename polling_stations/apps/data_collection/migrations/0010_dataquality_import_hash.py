@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_collection', '0009_auto_20160616_0921'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataquality',
+            name='import_hash',
+            field=models.CharField(blank=True, max_length=64, help_text='Hash of the data and import script used in the last import'),
+        ),
+    ]
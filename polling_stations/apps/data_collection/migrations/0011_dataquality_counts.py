@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# num_stations etc used to be saved only when an import printed its report
+# so fill them in for every council
+UPDATE_COUNTS_SQL = """
+    UPDATE data_collection_dataquality dq SET
+        num_stations = (
+            SELECT COUNT(*) FROM pollingstations_pollingstation
+            WHERE council_id = dq.council_id),
+        num_districts = (
+            SELECT COUNT(*) FROM pollingstations_pollingdistrict
+            WHERE council_id = dq.council_id),
+        num_addresses = (
+            SELECT COUNT(*) FROM pollingstations_residentialaddress
+            WHERE council_id = dq.council_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_collection', '0010_dataquality_import_hash'),
+        ('pollingstations', '0013_customfinders'),
+    ]
+
+    operations = [
+        migrations.RunSQL(UPDATE_COUNTS_SQL, migrations.RunSQL.noop),
+    ]
@@ -1,8 +1,70 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models
+from django.db.models import Case, Count, IntegerField, Sum, When
 
 from councils.models import Council
 
 
+COVERAGE_CACHE_KEY = 'coverage-stats'
+
+# Count each council's imported stations, districts and addresses.
+# (migration 0011 runs the same query to fill in existing records)
+UPDATE_COUNTS_SQL = """
+    UPDATE data_collection_dataquality dq SET
+        num_stations = (
+            SELECT COUNT(*) FROM pollingstations_pollingstation
+            WHERE council_id = dq.council_id),
+        num_districts = (
+            SELECT COUNT(*) FROM pollingstations_pollingdistrict
+            WHERE council_id = dq.council_id),
+        num_addresses = (
+            SELECT COUNT(*) FROM pollingstations_residentialaddress
+            WHERE council_id = dq.council_id)
+"""
+
+
+class DataQualityManager(models.Manager):
+
+    def update_counts(self, council_id=None):
+        """
+        Update num_stations, num_districts and num_addresses
+        for one council (or every council).
+        Call clear_coverage_cache() once this has been committed
+        """
+        cursor = connection.cursor()
+        if council_id is None:
+            cursor.execute(UPDATE_COUNTS_SQL + ';')
+        else:
+            cursor.execute(
+                UPDATE_COUNTS_SQL + ' WHERE dq.council_id = %s;', [council_id])
+
+    def clear_coverage_cache(self):
+        # if we cleared the cache before the new counts were committed,
+        # the next request could cache the old counts again
+        cache.delete(COVERAGE_CACHE_KEY)
+
+    def get_coverage(self):
+        """
+        Number of councils, and number of councils with
+        stations/districts, computed from the stored counts
+        """
+        coverage = cache.get(COVERAGE_CACHE_KEY)
+        if coverage is None:
+            coverage = Council.objects.aggregate(
+                num_councils=Count('pk'),
+                num_station_councils=Sum(Case(
+                    When(dataquality__num_stations__gt=1, then=1),
+                    default=0, output_field=IntegerField())),
+                num_district_councils=Sum(Case(
+                    When(dataquality__num_districts__gt=1, then=1),
+                    default=0, output_field=IntegerField())),
+            )
+            coverage = {k: v or 0 for k, v in coverage.items()}
+            cache.set(COVERAGE_CACHE_KEY, coverage, settings.COVERAGE_CACHE_TTL)
+        return coverage
+
+
 class DataQuality(models.Model):
     council = models.OneToOneField(Council, primary_key=True)
     url = models.URLField(blank=True, verbose_name="URL to the data",
@@ -23,6 +85,10 @@ class DataQuality(models.Model):
     num_stations = models.IntegerField(default=0)
     num_districts = models.IntegerField(default=0)
     num_addresses = models.IntegerField(default=0)
+    import_hash = models.CharField(blank=True, max_length=64,
+        help_text="Hash of the data and import script used in the last import")
+
+    objects = DataQualityManager()
 
     class Meta:
         verbose_name_plural = "Data Quality"
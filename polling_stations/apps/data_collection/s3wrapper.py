@@ -1,21 +1,45 @@
+"""
+Fetch import data from S3 into a local cache
+
+fetch_data() syncs the cache with the bucket: we keep a manifest of the
+ETag and size of every object we've downloaded, only download objects
+which are new or have changed (several at a time), and delete local files
+which are no longer in the bucket.
+"""
 import glob
+import json
 import os
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from boto.pyami.config import Config
 from boto.s3.connection import S3Connection
 from django.conf import settings
 
 
-class S3Wrapper:
+_connection = threading.local()
 
-    def __init__(self):
+
+def get_bucket():
+    """
+    Share one S3 connection (and its connection pool) between every
+    S3Wrapper in this thread. boto connections aren't thread-safe, so
+    each thread (and each forked process) makes its own
+    """
+    if getattr(_connection, 'pid', None) != os.getpid():
         config = Config()
         access_key = config.get_value(settings.BOTO_SECTION, 'aws_access_key_id')
         secret_key = config.get_value(settings.BOTO_SECTION, 'aws_secret_access_key')
+        conn = S3Connection(access_key, secret_key)
+        _connection.bucket = conn.get_bucket(settings.S3_DATA_BUCKET)
+        _connection.pid = os.getpid()
+    return _connection.bucket
+
 
+class S3Wrapper:
+
+    def __init__(self):
         # connect to S3 + get ref to our data bucket
-        conn = S3Connection(access_key, secret_key)
-        self.bucket = conn.get_bucket(settings.S3_DATA_BUCKET)
+        self.bucket = get_bucket()
 
         # this is where our local data will live
         self.base_path = os.path.abspath('./s3cache/')
@@ -24,42 +48,104 @@ class S3Wrapper:
     def data_path(self):
         return os.path.abspath(self.base_path)
 
+    def get_manifest_path(self, prefix):
+        # one manifest per prefix so imports running
+        # in parallel don't write to the same file
+        return os.path.join(self.base_path, '.manifests', '%s.json' % (prefix))
+
+    def read_manifest(self, prefix):
+        try:
+            with open(self.get_manifest_path(prefix)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def write_manifest(self, prefix, manifest):
+        path = self.get_manifest_path(prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def is_fresh(self, key, manifest):
+        # do we already have an up-to-date copy of key?
+        local_file = os.path.join(self.base_path, key.key)
+        entry = manifest.get(key.key)
+        return (
+            entry is not None and
+            entry['etag'] == key.etag and
+            entry['size'] == key.size and
+            os.path.isfile(local_file) and
+            os.path.getsize(local_file) == key.size
+        )
+
+    def download(self, key):
+        local_file = os.path.join(self.base_path, key.key)
+        os.makedirs(os.path.dirname(local_file), exist_ok=True)
+        # we're in a worker thread: key belongs to the main thread's
+        # connection, so fetch it using this thread's connection instead
+        thread_key = get_bucket().new_key(key.key)
+        # download to a temp file so we never leave a partial file behind
+        thread_key.get_contents_to_filename(local_file + '.part')
+        os.replace(local_file + '.part', local_file)
+        return key
+
+    def delete_stale_files(self, prefix, keys):
+        deleted = 0
+        local_pattern = os.path.join(self.base_path, "%s*" % (prefix))
+        for local_path in glob.glob(local_pattern):
+            if os.path.isdir(local_path):
+                local_files = [
+                    os.path.join(root, filename)
+                    for root, dirnames, filenames in os.walk(local_path)
+                    for filename in filenames
+                ]
+            else:
+                local_files = [local_path]
+
+            for local_file in local_files:
+                if os.path.relpath(local_file, self.base_path) not in keys:
+                    os.remove(local_file)
+                    deleted += 1
+
+            # tidy up any directories we've emptied
+            if os.path.isdir(local_path):
+                for root, dirnames, filenames in os.walk(local_path, topdown=False):
+                    if not os.listdir(root):
+                        os.rmdir(root)
+        return deleted
+
     def fetch_data(self, prefix):
-        local_pattern = os.path.abspath("%s/%s*" % (self.base_path, prefix))
-        local_paths = glob.glob(local_pattern)
-
-        if len(local_paths) == 1:
-            # if local dir already exists, delete it to
-            # remove any existing (potentially stale) data
-            shutil.rmtree(local_paths[0])
-        elif len(local_paths) > 1:
-            raise ValueError(
-                "Pattern '%s' matched more than one directory" % local_pattern)
-        else:
-            # if local dir does not exist, no worries. We will create
-            # any necessary directories when we pull data down from s3
-            pass
-
-        # fetch data for this prefix
-        keys = self.bucket.list(prefix=prefix)
-        count = 0
-        for key in keys:
-
-            # ignore directories
-            if key.key[-8:] == '$folder$' or key.key[-1] == '/':
-                continue
-
-            local_file = os.path.join(self.base_path, key.key)
-            os.makedirs(os.path.dirname(local_file), exist_ok=True)
-            key.get_contents_to_filename(local_file)
-            # We have to manually build a count of the number of items:
-            # A BucketListResultSet does not have a len() because it is
-            # a generator expression, not a list
-            count = count + 1
-
-        if count == 0:
+        """
+        Sync local copies of all the objects whose names start with prefix.
+        Returns counts of files downloaded, unchanged and deleted
+        """
+        manifest = self.read_manifest(prefix)
+
+        # ignore directories
+        keys = [
+            key for key in self.bucket.list(prefix=prefix)
+            if not (key.key[-8:] == '$folder$' or key.key[-1] == '/')
+        ]
+        if not keys:
             raise ValueError("Couldn't find any data to import")
 
+        stale = [key for key in keys if not self.is_fresh(key, manifest)]
+        with ThreadPoolExecutor(max_workers=settings.S3_SYNC_WORKERS) as executor:
+            for key in executor.map(self.download, stale):
+                manifest[key.key] = {'etag': key.etag, 'size': key.size}
+
+        key_names = set(key.key for key in keys)
+        deleted = self.delete_stale_files(prefix, key_names)
+        manifest = {k: v for k, v in manifest.items() if k in key_names}
+        self.write_manifest(prefix, manifest)
+
+        return {
+            'downloaded': len(stale),
+            'unchanged': len(keys) - len(stale),
+            'deleted': deleted,
+        }
+
     def fetch_data_by_council(self, council_id):
         prefix = "%s-" % (council_id)
-        self.fetch_data(prefix)
+        return self.fetch_data(prefix)
@@ -0,0 +1,202 @@
+"""
+Build a council's stations, districts and addresses in staging tables
+before applying them to the live tables
+
+StagingTables creates a TEMP table with the same name and structure as
+each of the pollingstations_* tables. PostgreSQL looks in the session's
+temp schema before public, so while they exist every query on this
+connection (the ORM, bulk_load() and the raw SQL in the importers and
+EdgeCaseFixer) reads and writes the staging tables instead of the live ones.
+Temp tables are private to the session, so imports can run in parallel.
+Queries which need every council's rows (not just the council we're
+importing) should select from all_councils() instead.
+
+Once the import has finished, swap() replaces the council's live rows with
+the contents of the staging tables, or sync() diffs the staging tables
+against the live tables and applies only the rows which changed. Either
+way, the live tables are only touched (and locked) right at the end of the
+import's transaction, and a failed import rolls back without ever
+having changed them.
+"""
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.db import connection
+
+from pollingstations.models import (
+    PollingDistrict,
+    PollingStation,
+    ResidentialAddress
+)
+
+
+def all_councils(model):
+    """
+    SQL for a subquery returning every council's rows from model's table.
+    While a council is staged, the table name refers to its staging table,
+    which only holds that council's rows, so we add the live rows for
+    every other council. Otherwise the second SELECT returns nothing.
+    Takes one parameter: the id of the council being imported
+    """
+    return """(
+        SELECT * FROM "{table}"
+        UNION ALL
+        SELECT * FROM public."{table}"
+        WHERE '"{table}"'::regclass != 'public."{table}"'::regclass
+        AND council_id IS DISTINCT FROM %s
+    )""".format(table=model._meta.db_table)
+
+
+class StagingTable:
+
+    def __init__(self, model, key_fields):
+        self.model = model
+        self.table = model._meta.db_table
+        self.keys = [model._meta.get_field(f).column for f in key_fields]
+        self.fields = [
+            f for f in model._meta.concrete_fields if not f.primary_key]
+
+    def compare_column(self, field, alias):
+        # geometry '=' only compares bounding boxes, so compare the bytes
+        if isinstance(field, GeometryField):
+            return 'ST_AsEWKB({0}."{1}")'.format(alias, field.column)
+        return '{0}."{1}"'.format(alias, field.column)
+
+    def create(self, cursor):
+        cursor.execute("""
+            CREATE TEMP TABLE "{table}"
+            (LIKE public."{table}" INCLUDING ALL) ON COMMIT DROP;
+        """.format(table=self.table))
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS pg_temp."{table}";'.format(
+            table=self.table))
+
+    def format(self, sql):
+        columns = [f.column for f in self.fields]
+        return sql.format(
+            table=self.table,
+            columns=', '.join('"%s"' % (c) for c in columns),
+            select=', '.join('s."%s"' % (c) for c in columns),
+            assign=', '.join('"{0}" = s."{0}"'.format(c) for c in columns),
+            keys_match=' AND '.join(
+                'l."{0}" = s."{0}"'.format(c) for c in self.keys),
+            differs='ROW({0}) IS DISTINCT FROM ROW({1})'.format(
+                ', '.join(self.compare_column(f, 'l') for f in self.fields),
+                ', '.join(self.compare_column(f, 's') for f in self.fields)),
+        )
+
+    def sync(self, cursor, council_id):
+        """
+        Make the live rows for this council match the staging table.
+        Returns the number of rows deleted, updated and inserted
+        """
+        counts = {}
+
+        cursor.execute(self.format("""
+            DELETE FROM public."{table}" l
+            WHERE l.council_id = %s
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_temp."{table}" s WHERE {keys_match}
+            );
+        """), [council_id])
+        counts['deleted'] = cursor.rowcount
+
+        cursor.execute(self.format("""
+            UPDATE public."{table}" l
+            SET {assign}
+            FROM pg_temp."{table}" s
+            WHERE {keys_match}
+            AND l.council_id = %s
+            AND {differs};
+        """), [council_id])
+        counts['updated'] = cursor.rowcount
+
+        cursor.execute(self.format("""
+            INSERT INTO public."{table}" ({columns})
+            SELECT {select} FROM pg_temp."{table}" s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM public."{table}" l WHERE {keys_match}
+            );
+        """))
+        counts['inserted'] = cursor.rowcount
+
+        return counts
+
+    def swap(self, cursor, council_id):
+        """
+        Replace the live rows for this council with the staging table.
+        Returns the number of rows deleted and inserted (none are updated)
+        """
+        counts = {}
+
+        cursor.execute(
+            'DELETE FROM public."{table}" WHERE council_id = %s;'.format(
+                table=self.table), [council_id])
+        counts['deleted'] = cursor.rowcount
+
+        cursor.execute(self.format("""
+            INSERT INTO public."{table}" ({columns})
+            SELECT {columns} FROM pg_temp."{table}";
+        """))
+        counts['inserted'] = cursor.rowcount
+        counts['updated'] = 0
+
+        return counts
+
+
+class StagingTables:
+
+    tables = [
+        StagingTable(PollingStation, ['council', 'internal_council_id']),
+        StagingTable(PollingDistrict, ['council', 'internal_council_id']),
+        # slugs are unique across all councils: include the council so
+        # a slug used by another council is inserted (and fails loudly)
+        # rather than matching the other council's row
+        StagingTable(ResidentialAddress, ['council', 'slug']),
+    ]
+
+    def __init__(self, council_id):
+        self.council_id = council_id
+
+    def create(self):
+        # must be called inside a transaction: if the import fails,
+        # rolling back also gets rid of the staging tables
+        cursor = connection.cursor()
+        for table in self.tables:
+            table.drop(cursor)
+            table.create(cursor)
+
+    def drop(self):
+        cursor = connection.cursor()
+        for table in self.tables:
+            table.drop(cursor)
+
+    def get_cursor(self):
+        # don't queue up behind (or block) other writers for long:
+        # if we can't get our locks quickly, give up and roll back
+        cursor = connection.cursor()
+        cursor.execute(
+            'SET LOCAL lock_timeout = %s;', [settings.STAGING_LOCK_TIMEOUT])
+        return cursor
+
+    def sync(self):
+        """
+        Apply the differences between the staging and live tables.
+        Call this inside a transaction so the changes are applied atomically
+        """
+        cursor = self.get_cursor()
+        return {
+            table.table: table.sync(cursor, self.council_id)
+            for table in self.tables
+        }
+
+    def swap(self):
+        """
+        Replace the live data for this council with the staging tables.
+        Call this inside a transaction so the changes are applied atomically
+        """
+        cursor = self.get_cursor()
+        return {
+            table.table: table.swap(cursor, self.council_id)
+            for table in self.tables
+        }
@@ -1,4 +1,5 @@
 import os
+import types
 from django.test import TestCase
 from data_collection.filehelpers import CsvHelper
 
@@ -22,3 +23,15 @@ class CsvHelperTest(TestCase):
         self.assertEqual('', data[1].baz)
 
         self.assertNotIn(2, data)
+
+    def test_stream_csv(self):
+        helper = CsvHelper(
+            os.path.join(os.path.dirname(__file__), 'fixtures/csv_helper/test.csv')
+        )
+        stream = helper.stream_features()
+        self.assertIsInstance(stream, types.GeneratorType)
+
+        rows = list(stream)
+        self.assertEqual(helper.get_features(), rows)
+        # every row should share the same class
+        self.assertIs(type(rows[0]), type(rows[1]))
@@ -0,0 +1,115 @@
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.test import TestCase
+
+from councils.models import Council
+from data_collection.data_quality_report import (
+    DataQualityReportBuilder,
+    DistrictReport,
+    ResidentialAddressReport,
+    StationReport,
+)
+from pollingstations.models import (
+    PollingDistrict, PollingStation, ResidentialAddress)
+
+
+def square(xmin, ymin, xmax, ymax):
+    return MultiPolygon(
+        Polygon.from_bbox((xmin, ymin, xmax, ymax)), srid=4326)
+
+
+class DataQualityReportTest(TestCase):
+
+    def setUp(self):
+        Council.objects.create(council_id='X01000001')
+        Council.objects.create(council_id='X01000002')
+
+        # AA and AB overlap between x=1 and x=2
+        PollingDistrict.objects.create(
+            council_id='X01000001', internal_council_id='AA',
+            area=square(0, 0, 2, 2), polling_station_id='1')
+        PollingDistrict.objects.create(
+            council_id='X01000001', internal_council_id='AB',
+            area=square(1, 0, 3, 2), polling_station_id='999')
+        PollingDistrict.objects.create(
+            council_id='X01000001', internal_council_id='AC',
+            area=square(10, 10, 11, 11), polling_station_id='')
+        PollingDistrict.objects.create(
+            council_id='X01000001', internal_council_id='AD')
+        # another council's district
+        PollingDistrict.objects.create(
+            council_id='X01000002', internal_council_id='AA',
+            area=square(20, 20, 21, 21))
+
+        PollingStation.objects.create(
+            council_id='X01000001', internal_council_id='1',
+            polling_district_id='AA', address='1 Foo Street',
+            location=Point(0.5, 0.5, srid=4326))
+        PollingStation.objects.create(
+            council_id='X01000001', internal_council_id='2',
+            polling_district_id='ZZ', address='',
+            location=Point(1.5, 0.5, srid=4326))
+        PollingStation.objects.create(
+            council_id='X01000001', internal_council_id='3',
+            polling_district_id='', address='3 Foo Street',
+            location=Point(50, 50, srid=4326))
+        PollingStation.objects.create(
+            council_id='X01000001', internal_council_id='4')
+        # a station in another council inside X01000002's district
+        PollingStation.objects.create(
+            council_id='X01000002', internal_council_id='1',
+            location=Point(20.5, 20.5, srid=4326))
+
+        ResidentialAddress.objects.create(
+            council_id='X01000001', postcode='AA11AA', slug='a1',
+            polling_station_id='1')
+        ResidentialAddress.objects.create(
+            council_id='X01000001', postcode='AA11AA', slug='a2',
+            polling_station_id='999')
+        ResidentialAddress.objects.create(
+            council_id='X01000001', postcode='AA11AA', slug='a3',
+            polling_station_id='')
+
+    def test_stations(self):
+        report = StationReport('X01000001')
+        self.assertEqual(4, report.get_stations_imported())
+        self.assertEqual(2, report.get_stations_with_district_id())
+        self.assertEqual(2, report.get_stations_without_district_id())
+        self.assertEqual(1, report.get_stations_with_valid_district_id_ref())
+        self.assertEqual(1, report.get_stations_with_invalid_district_id_ref())
+        self.assertEqual(3, report.get_stations_with_point())
+        self.assertEqual(1, report.get_stations_without_point())
+        self.assertEqual(2, report.get_stations_with_address())
+        self.assertEqual(2, report.get_stations_without_address())
+        self.assertEqual(1, report.get_stations_in_zero_districts())
+        self.assertEqual(1, report.get_stations_in_one_districts())
+        self.assertEqual(1, report.get_stations_in_more_districts())
+
+    def test_districts(self):
+        report = DistrictReport('X01000001')
+        self.assertEqual(4, report.get_districts_imported())
+        self.assertEqual(2, report.get_districts_with_station_id())
+        self.assertEqual(2, report.get_districts_without_station_id())
+        self.assertEqual(1, report.get_districts_with_valid_station_id_ref())
+        self.assertEqual(1, report.get_districts_with_invalid_station_id_ref())
+        # AA contains stations 1 and 2, AB contains 2, AC contains none
+        self.assertEqual(1, report.get_districts_containing_zero_stations())
+        self.assertEqual(1, report.get_districts_containing_one_stations())
+        self.assertEqual(1, report.get_districts_containing_more_stations())
+
+    def test_addresses(self):
+        report = ResidentialAddressReport('X01000001')
+        self.assertEqual(3, report.get_addresses_imported())
+        self.assertEqual(2, report.get_addresses_with_station_id())
+        self.assertEqual(1, report.get_addresses_without_station_id())
+        self.assertEqual(1, report.get_addresses_with_valid_station_id_ref())
+        self.assertEqual(1, report.get_addresses_with_invalid_station_id_ref())
+
+    def test_report_queries(self):
+        report = DataQualityReportBuilder('X01000001')
+        # one query per report, however many stations/districts we have
+        with self.assertNumQueries(3):
+            report.build_report()
+        self.assertIn(
+            "STATIONS IMPORTED                : 4",
+            report.generate_string_report())
+        self.assertEqual(4, report.stations_report.get_stations_imported())
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from data_collection.import_scheduler import ImportScheduler, ImportTask
+
+
+class SleepTask(ImportTask):
+
+    # record when we started and finished in a file
+    # so the parent process can see what happened
+
+    def __init__(self, name, path, seconds=0.2, lock_group=None):
+        super().__init__(name, lock_group)
+        self.path = path
+        self.seconds = seconds
+
+    def run(self):
+        start = time.time()
+        time.sleep(self.seconds)
+        with open(os.path.join(self.path, self.name), 'w') as f:
+            f.write("%f %f" % (start, time.time()))
+        return {'rows': 1}
+
+
+class FailTask(ImportTask):
+
+    def run(self):
+        raise ValueError('oh no')
+
+
+class FlakyTask(ImportTask):
+
+    # fails the first time it is run
+
+    def __init__(self, name, path):
+        super().__init__(name)
+        self.marker = os.path.join(path, name)
+
+    def run(self):
+        if not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            raise ValueError('oh no')
+        return {'rows': 2}
+
+
+class ImportSchedulerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_times(self, name):
+        with open(os.path.join(self.path, name)) as f:
+            return [float(t) for t in f.read().split(' ')]
+
+    def run_scheduler(self, tasks, **kwargs):
+        return ImportScheduler(
+            tasks, poll_interval=0.01, log=lambda msg: None, **kwargs).run()
+
+    def test_parallel(self):
+        report = self.run_scheduler([
+            SleepTask('a', self.path),
+            SleepTask('b', self.path),
+        ], jobs=2)
+        self.assertEqual(2, report['succeeded'])
+        self.assertEqual({'rows': 1}, report['tasks'][0]['metrics'])
+
+        # these should have overlapped
+        a, b = self.get_times('a'), self.get_times('b')
+        self.assertLess(max(a[0], b[0]), min(a[1], b[1]))
+
+    def test_lock_group(self):
+        report = self.run_scheduler([
+            SleepTask('a', self.path, lock_group='foo'),
+            SleepTask('b', self.path, lock_group='foo'),
+            SleepTask('c', self.path),
+        ], jobs=3)
+        self.assertEqual(3, report['succeeded'])
+
+        # a and b share a lock so they should not have overlapped
+        a, b = self.get_times('a'), self.get_times('b')
+        self.assertTrue(a[1] <= b[0] or b[1] <= a[0])
+
+    def test_continue_on_error(self):
+        report = self.run_scheduler([
+            FailTask('a'),
+            SleepTask('b', self.path),
+        ])
+        self.assertEqual(1, report['succeeded'])
+        self.assertEqual(1, report['failed'])
+        failed = report['tasks'][0]
+        self.assertEqual('failed', failed['status'])
+        self.assertIn('oh no', failed['error'])
+
+    def test_retry(self):
+        report = self.run_scheduler(
+            [FlakyTask('a', self.path)], retries=1)
+        self.assertEqual(1, report['succeeded'])
+        self.assertEqual(2, report['tasks'][0]['attempts'])
+        self.assertEqual({'rows': 2}, report['tasks'][0]['metrics'])
+
+    def test_timeout(self):
+        report = self.run_scheduler(
+            [SleepTask('a', self.path, seconds=30)], timeout=0.5)
+        self.assertEqual(1, report['failed'])
+        self.assertEqual('timeout', report['tasks'][0]['status'])
@@ -1,9 +1,13 @@
+import mock
 import os
 
+from django.core.cache import cache
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.test import TestCase
 
 from councils.models import Council
+from data_collection.models import COVERAGE_CACHE_KEY, DataQuality
 from data_collection.tests.stubs import (
     stub_addressimport,
     stub_duplicatedistrict,
@@ -172,3 +176,204 @@ class ImporterTest(TestCase):
             '80 Pine Vale Cres, Bournemouth',
         ])
         self.assertEqual(set(addresses), expected)
+
+
+class IncrementalImportTest(TestCase):
+
+    opts = {
+        'noclean': False,
+        'verbosity': 0,
+        'incremental': True,
+        'force': True,
+    }
+
+    def setUp(self):
+        Council.objects.update_or_create(
+            pk='X01000000',
+            mapit_id=1,
+            council_type='DIS'
+        )
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**dict(self.opts, incremental=False))
+
+    def get_rows(self):
+        return (
+            sorted(PollingStation.objects.filter(council_id='X01000000')
+                .values_list('pk', 'internal_council_id', 'address')),
+            sorted(PollingDistrict.objects.filter(council_id='X01000000')
+                .values_list('pk', 'internal_council_id', 'name')),
+        )
+
+    def test_nothing_changed(self):
+        before = self.get_rows()
+
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**self.opts)
+
+        # no rows were replaced
+        self.assertEqual(before, self.get_rows())
+        for counts in cmd.sync_counts.values():
+            self.assertEqual(
+                {'inserted': 0, 'updated': 0, 'deleted': 0}, counts)
+
+    def test_changes(self):
+        stations = PollingStation.objects.filter(council_id='X01000000')
+        stations.filter(address='1 Foo Street').update(address='Old address')
+        stations.exclude(address='Old address').first().delete()
+        PollingDistrict.objects.create(
+            council_id='X01000000', internal_council_id='ZZ', name='old')
+        unchanged = PollingDistrict.objects.filter(
+            council_id='X01000000').exclude(internal_council_id='ZZ')
+        unchanged = sorted(unchanged.values_list('pk', flat=True))
+
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**self.opts)
+
+        self.assertEqual({'inserted': 1, 'updated': 1, 'deleted': 0},
+                         cmd.sync_counts['pollingstations_pollingstation'])
+        self.assertEqual({'inserted': 0, 'updated': 0, 'deleted': 1},
+                         cmd.sync_counts['pollingstations_pollingdistrict'])
+        ImporterTest.run_assertions(self)
+        self.assertTrue(stations.filter(address='1 Foo Street').exists())
+        self.assertEqual(unchanged, sorted(PollingDistrict.objects.filter(
+            council_id='X01000000').values_list('pk', flat=True)))
+
+    def test_failed_import_leaves_data_alone(self):
+        before = self.get_rows()
+
+        cmd = stub_duplicatestation.Command()
+        with self.assertRaises(IntegrityError):
+            cmd.handle(**self.opts)
+
+        self.assertEqual(before, self.get_rows())
+
+    def test_address_slug_used_by_another_council(self):
+        # slugs are unique across councils, so this should fail loudly
+        # rather than skipping the addresses
+        Council.objects.create(pk='X01000002')
+        stub_addressimport.Command().handle(**self.opts)
+        ResidentialAddress.objects.filter(
+            council_id='X01000000').update(council_id='X01000002')
+
+        cmd = stub_addressimport.Command()
+        with self.assertRaises(IntegrityError):
+            cmd.handle(**self.opts)
+
+
+class StagedImportTest(TestCase):
+
+    opts = {
+        'noclean': False,
+        'verbosity': 0,
+        'force': True,
+    }
+
+    def setUp(self):
+        Council.objects.update_or_create(
+            pk='X01000000',
+            mapit_id=1,
+            council_type='DIS'
+        )
+        stub_jsonimport.Command().handle(**self.opts)
+
+    def test_reimport_replaces_data(self):
+        PollingStation.objects.create(
+            council_id='X01000000', internal_council_id='old')
+
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**self.opts)
+
+        self.assertEqual({'inserted': 3, 'updated': 0, 'deleted': 4},
+                         cmd.sync_counts['pollingstations_pollingstation'])
+        self.assertFalse(PollingStation.objects.filter(
+            internal_council_id='old').exists())
+        ImporterTest.run_assertions(self)
+
+    def test_failed_import_leaves_data_alone(self):
+        cmd = stub_duplicatestation.Command()
+        with self.assertRaises(IntegrityError):
+            cmd.handle(**self.opts)
+
+        ImporterTest.run_assertions(self)
+
+    def test_coverage_cache_cleared_after_commit(self):
+        # count the savepoints we're inside when the cache is cleared:
+        # it should be after the import's transaction has finished
+        depth = []
+        clear_coverage_cache = DataQuality.objects.clear_coverage_cache
+
+        def clear():
+            depth.append(len(connection.savepoint_ids))
+            clear_coverage_cache()
+
+        cache.set(COVERAGE_CACHE_KEY, {'num_councils': 0})
+        with mock.patch.object(
+                DataQuality.objects, 'clear_coverage_cache', side_effect=clear):
+            stub_jsonimport.Command().handle(**self.opts)
+
+        self.assertEqual([len(connection.savepoint_ids)], depth)
+        self.assertIsNone(cache.get(COVERAGE_CACHE_KEY))
+
+
+class ImportHashTest(TestCase):
+
+    opts = {
+        'noclean': False,
+        'verbosity': 0
+    }
+
+    def setUp(self):
+        Council.objects.update_or_create(
+            pk='X01000000',
+            mapit_id=1,
+            council_type='DIS'
+        )
+        self.first = stub_jsonimport.Command()
+        self.first.handle(**self.opts)
+        self.stations = PollingStation.objects.filter(council_id='X01000000')
+        # mark a station so we can tell whether we imported again
+        self.stations.filter(address='1 Foo Street').update(address='changed')
+
+    def test_hash_saved(self):
+        self.assertFalse(self.first.skipped)
+        self.assertEqual(64, len(self.first.import_hash))
+        self.assertEqual(
+            self.first.import_hash,
+            DataQuality.objects.get(council_id='X01000000').import_hash)
+
+    def test_unchanged_import_skipped(self):
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**self.opts)
+        self.assertTrue(cmd.skipped)
+        self.assertTrue(self.stations.filter(address='changed').exists())
+
+    def test_deleted_data_not_skipped(self):
+        # don't skip just because the hash matches:
+        # the data may have been deleted since the last import
+        self.stations.delete()
+        PollingDistrict.objects.filter(council_id='X01000000').delete()
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**self.opts)
+        self.assertFalse(cmd.skipped)
+        self.assertEqual(3, self.stations.count())
+
+    def test_force(self):
+        cmd = stub_jsonimport.Command()
+        cmd.handle(**dict(self.opts, force=True))
+        self.assertFalse(cmd.skipped)
+        self.assertFalse(self.stations.filter(address='changed').exists())
+        self.assertEqual(3, self.stations.count())
+
+    def test_base_classes_hashed(self):
+        # a change to a base class should trigger a re-import too
+        files = [os.path.basename(f) for f in self.first.get_source_files()]
+        self.assertEqual('stub_jsonimport.py', files[0])
+        self.assertIn('base_importers.py', files)
+        self.assertIn('__init__.py', files)
+
+    def test_changed_import_not_skipped(self):
+        # same data, different import script
+        cmd = stub_jsonimport_different_srids.Command()
+        cmd.handle(**self.opts)
+        self.assertFalse(cmd.skipped)
+        self.assertNotEqual(self.first.import_hash, cmd.import_hash)
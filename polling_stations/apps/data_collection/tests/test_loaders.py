@@ -0,0 +1,107 @@
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.test import TestCase
+
+from councils.models import Council
+from data_collection.loaders import bulk_load, IteratorFile
+from pollingstations.models import (
+    PollingDistrict, PollingStation, ResidentialAddress)
+
+
+class IteratorFileTest(TestCase):
+
+    def test_read(self):
+        rows = [['a', 'b'], ['c', '\\N'], ['', 'd,e']]
+        expected = 'a,b\nc,\\N\n,"d,e"\n'
+
+        f = IteratorFile(iter(rows))
+        self.assertEqual(expected, f.read())
+
+        # read in small chunks
+        f = IteratorFile(iter(rows))
+        chunks = []
+        chunk = f.read(3)
+        while chunk:
+            chunks.append(chunk)
+            chunk = f.read(3)
+        self.assertEqual(expected, ''.join(chunks))
+
+
+class LoaderTestMixin:
+
+    loader = None
+
+    def setUp(self):
+        Council.objects.create(council_id='X01000001')
+
+    def test_stations(self):
+        bulk_load(PollingStation, [
+            'council_id', 'internal_council_id', 'postcode',
+            'address', 'location', 'polling_district_id',
+        ], [
+            ('X01000001', '1', 'AA1 1AA', '1 Foo Street',
+                Point(-2.15, 52.81, srid=4326).ewkb, 'AA'),
+            ('X01000001', '2', '', 'Bar "Hall",\nBar Town',
+                Point(400000, 300000, srid=27700).ewkb, ''),
+            ('X01000001', '3', None, '', None, ''),
+        ], loader=self.loader)
+
+        stations = PollingStation.objects.filter(
+            council_id='X01000001').order_by('internal_council_id')
+        self.assertEqual(3, len(stations))
+
+        self.assertEqual('AA1 1AA', stations[0].postcode)
+        self.assertEqual(4326, stations[0].location.srid)
+        self.assertAlmostEqual(-2.15, stations[0].location.x)
+
+        # geometries in other projections are transformed
+        self.assertEqual('Bar "Hall",\nBar Town', stations[1].address)
+        self.assertEqual(4326, stations[1].location.srid)
+        self.assertAlmostEqual(-2.0, stations[1].location.x, places=1)
+
+        # NULLs and empty strings are kept distinct
+        self.assertEqual('', stations[1].postcode)
+        self.assertIsNone(stations[2].postcode)
+        self.assertIsNone(stations[2].location)
+
+    def test_districts(self):
+        area = MultiPolygon(Polygon.from_bbox((0, 0, 1, 1)), srid=4326)
+        bulk_load(PollingDistrict, [
+            'name', 'council_id', 'internal_council_id',
+            'extra_id', 'area', 'polling_station_id',
+        ], [
+            ('Foo', 'X01000001', 'AA', None, area.ewkb, '1'),
+        ], loader=self.loader)
+
+        district = PollingDistrict.objects.get(council_id='X01000001')
+        self.assertEqual('AA', district.internal_council_id)
+        self.assertTrue(area.equals(district.area))
+
+    def test_addresses(self):
+        bulk_load(ResidentialAddress, [
+            'address', 'postcode', 'polling_station_id', 'council_id', 'slug',
+        ], (
+            ('%i Foo Street' % (i), 'AA11AA', '1', 'X01000001', 'foo-%i' % (i))
+            for i in range(100)
+        ), batch_size=10, loader=self.loader)
+
+        self.assertEqual(100, ResidentialAddress.objects.filter(
+            council_id='X01000001', postcode='AA11AA').count())
+
+
+class CopyLoaderTest(LoaderTestMixin, TestCase):
+    loader = 'copy'
+
+    def test_load_twice(self):
+        # the temp table shouldn't outlive each load
+        self.test_addresses()
+        bulk_load(ResidentialAddress, [
+            'address', 'postcode', 'polling_station_id', 'council_id', 'slug',
+        ], [
+            ('1 Bar Street', 'BB11BB', '1', 'X01000001', 'bar-1'),
+        ], loader=self.loader)
+        self.assertEqual(101, ResidentialAddress.objects.filter(
+            council_id='X01000001').count())
+
+
+class BulkCreateLoaderTest(LoaderTestMixin, TestCase):
+    loader = 'bulk_create'
@@ -0,0 +1,112 @@
+import mock
+import os
+import shutil
+import tempfile
+import threading
+
+import boto
+from moto import mock_s3_deprecated
+from django.test import SimpleTestCase, override_settings
+
+from data_collection import s3wrapper
+from data_collection.s3wrapper import S3Wrapper
+
+
+@override_settings(S3_DATA_BUCKET='test-bucket', S3_SYNC_WORKERS=2)
+class S3WrapperTest(SimpleTestCase):
+
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {
+            'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test'})
+        self.env.start()
+        self.mock = mock_s3_deprecated()
+        self.mock.start()
+        # make sure we don't reuse a connection from outside the mock
+        s3wrapper._connection.pid = None
+
+        conn = boto.connect_s3()
+        self.bucket = conn.create_bucket('test-bucket')
+        self.put('X01000000-foo/stations.csv', 'a,b\n1,2\n')
+        self.put('X01000000-foo/districts/districts.geojson', '{}')
+        self.put('X01000000-foo/', '')  # directory placeholder
+        self.put('X01000001-bar/stations.csv', 'c,d\n')
+
+        self.base_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.mock.stop()
+        self.env.stop()
+        s3wrapper._connection.pid = None
+        shutil.rmtree(self.base_path)
+
+    def put(self, name, contents):
+        key = self.bucket.new_key(name)
+        key.set_contents_from_string(contents)
+
+    def get_wrapper(self):
+        s3 = S3Wrapper()
+        s3.base_path = self.base_path
+        return s3
+
+    def read(self, name):
+        with open(os.path.join(self.base_path, name)) as f:
+            return f.read()
+
+    def test_fetch(self):
+        counts = self.get_wrapper().fetch_data_by_council('X01000000')
+        self.assertEqual(
+            {'downloaded': 2, 'unchanged': 0, 'deleted': 0}, counts)
+        self.assertEqual('a,b\n1,2\n', self.read('X01000000-foo/stations.csv'))
+        self.assertEqual(
+            '{}', self.read('X01000000-foo/districts/districts.geojson'))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.base_path, 'X01000001-bar')))
+
+    def test_only_changed_files_downloaded(self):
+        self.get_wrapper().fetch_data_by_council('X01000000')
+
+        self.put('X01000000-foo/stations.csv', 'a,b\n3,4\n')
+        with mock.patch.object(
+                S3Wrapper, 'download', autospec=True,
+                side_effect=S3Wrapper.download) as download:
+            counts = self.get_wrapper().fetch_data_by_council('X01000000')
+
+        self.assertEqual(
+            {'downloaded': 1, 'unchanged': 1, 'deleted': 0}, counts)
+        self.assertEqual(1, download.call_count)
+        self.assertEqual('a,b\n3,4\n', self.read('X01000000-foo/stations.csv'))
+
+    def test_stale_files_deleted(self):
+        self.get_wrapper().fetch_data_by_council('X01000000')
+
+        self.bucket.delete_key('X01000000-foo/districts/districts.geojson')
+        counts = self.get_wrapper().fetch_data_by_council('X01000000')
+
+        self.assertEqual(
+            {'downloaded': 0, 'unchanged': 1, 'deleted': 1}, counts)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.base_path, 'X01000000-foo/districts')))
+
+    def test_missing_local_file_downloaded(self):
+        self.get_wrapper().fetch_data_by_council('X01000000')
+        os.remove(os.path.join(self.base_path, 'X01000000-foo/stations.csv'))
+
+        counts = self.get_wrapper().fetch_data_by_council('X01000000')
+        self.assertEqual(
+            {'downloaded': 1, 'unchanged': 1, 'deleted': 0}, counts)
+        self.assertEqual('a,b\n1,2\n', self.read('X01000000-foo/stations.csv'))
+
+    def test_no_data(self):
+        with self.assertRaises(ValueError):
+            self.get_wrapper().fetch_data_by_council('X01000002')
+
+    def test_connection_shared(self):
+        self.assertIs(self.get_wrapper().bucket, self.get_wrapper().bucket)
+
+    def test_connection_per_thread(self):
+        buckets = []
+        thread = threading.Thread(
+            target=lambda: buckets.append(s3wrapper.get_bucket()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(s3wrapper.get_bucket(), buckets[0])
@@ -0,0 +1,116 @@
+"""
+Cache for geocoder results
+
+Lookups are served from a bounded in-process LRU first,
+then from Django's cache framework (shared between processes)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LruCache:
+    # Thread-safe, size-bounded cache with a timeout on each entry
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value, expires = self.data[key]
+            except KeyError:
+                return None
+            if expires < time.time():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.data[key] = (value, time.time() + timeout)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class GeocodeCache:
+
+    """
+    Entries are stored as dicts. A successful lookup is stored as
+    {'result': {...}} and a failed lookup is stored as {'error': '...'}
+    so that we can cache the fact that a postcode can't be geocoded.
+
+    How long we keep a result depends on where it came from:
+    see GEOCODE_CACHE_TTL in settings
+    """
+
+    prefix = 'geocode'
+
+    def __init__(self):
+        self.lru = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'GEOCODE_CACHE_ENABLED', False)
+
+    @property
+    def local(self):
+        if self.lru is None:
+            self.lru = LruCache(settings.GEOCODE_CACHE_LRU_SIZE)
+        return self.lru
+
+    @property
+    def shared(self):
+        return caches[settings.GEOCODE_CACHE_BACKEND]
+
+    def make_key(self, kind, postcode):
+        return "%s:%s:%s" % (self.prefix, kind, postcode)
+
+    def get_timeout(self, entry):
+        ttl = settings.GEOCODE_CACHE_TTL
+        if 'error' in entry:
+            return ttl['error']
+        return ttl.get(entry['result'].get('source'), ttl['default'])
+
+    def get(self, kind, postcode):
+        if not self.enabled:
+            return None
+
+        key = self.make_key(kind, postcode)
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+
+        entry = self.shared.get(key)
+        if entry is not None:
+            # we don't know how long this has left in the shared cache
+            # so keep it locally for the shortest time we might want to
+            self.local.set(key, entry, settings.GEOCODE_CACHE_TTL['error'])
+        return entry
+
+    def set(self, kind, postcode, entry):
+        if not self.enabled:
+            return
+
+        key = self.make_key(kind, postcode)
+        timeout = self.get_timeout(entry)
+        self.local.set(key, entry, timeout)
+        self.shared.set(key, entry, timeout)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
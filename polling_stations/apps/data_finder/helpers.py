@@ -1,27 +1,38 @@
 import abc
+import functools
 import logging
 import lxml.etree
 import re
 import requests
-import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from operator import itemgetter
 
 from django.conf import settings
 from django.contrib.gis.geos import Point
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.utils.translation import ugettext as _
 
-from addressbase.helpers import centre_from_points_qs
-from addressbase.models import Address, Blacklist, Onsad
+from addressbase.models import PostcodeLookup
 
+from pollingstations import sorting
 from pollingstations.models import ResidentialAddress
 
+from .cache import GeocodeCache
+from .mapit_client import mapit_client, RateLimitExceeded
+
 
 class PostcodeError(Exception):
     pass
 
+class GeocodingUnavailableError(PostcodeError):
+    # we couldn't get an answer (e.g: MapIt is down or we hit the
+    # rate limit). This doesn't tell us the postcode is invalid,
+    # so unlike PostcodeError it isn't cached
+    pass
+
 class MultipleCouncilsException(Exception):
     pass
 
@@ -60,15 +71,15 @@ class BaseGeocoder(metaclass=abc.ABCMeta):
 class MapitGeocoder(BaseGeocoder):
 
     def call_mapit(self):
-        headers = {}
-        if settings.MAPIT_UA:
-            headers['User-Agent'] = settings.MAPIT_UA
-
-        res = requests.get("%s/postcode/%s" % (settings.MAPIT_URL, self.postcode), headers=headers)
+        try:
+            res = mapit_client.get("postcode/%s" % (self.postcode))
+        except RateLimitExceeded as e:
+            raise RateLimitError("Mapit error: %s" % (e))
 
         if res.status_code != 200:
             if res.status_code == 403:
-                # we hit MapIt's rate limit
+                # we hit MapIt's rate limit and
+                # backing off didn't help
                 raise RateLimitError("Mapit error 403: Rate limit exceeded")
 
             if res.status_code == 404:
@@ -76,16 +87,23 @@ class MapitGeocoder(BaseGeocoder):
                 # this will cause an unhandled exception if we try to parse it
                 raise PostcodeError("Mapit error 404: Not Found")
 
+            if res.status_code == 400:
+                # mapit says the postcode is invalid
+                error_class = PostcodeError
+            else:
+                # e.g: 5xx - mapit couldn't tell us either way
+                error_class = GeocodingUnavailableError
+
             try:
                 # attempt to parse error from json
                 res_json = res.json()
                 if 'error' in res_json:
-                    raise PostcodeError("Mapit error {}: {}".format(res_json['code'], res_json['error']))
+                    raise error_class("Mapit error {}: {}".format(res_json['code'], res_json['error']))
                 else:
-                    raise PostcodeError("Mapit error {}: unknown".format(res.status_code))
+                    raise error_class("Mapit error {}: unknown".format(res.status_code))
             except ValueError:
                 # if we fail to parse json, raise a less specific exception
-                raise PostcodeError("Mapit error {}: unknown".format(res.status_code))
+                raise error_class("Mapit error {}: unknown".format(res.status_code))
 
         return res.json()
 
@@ -125,73 +143,100 @@ class AddressBaseGeocoder(BaseGeocoder):
         formatted_postcode = formatted_postcode[:-3] + ' ' + formatted_postcode[-3:]
         return formatted_postcode
 
-    def get_uprns(self, addresses):
-        return [a.uprn for a in addresses]
-
-    def get_codes(self, uprns):
-        addresses = Onsad.objects.filter(uprn__in=uprns)
-
-        if len(addresses) == 0:
-            # No records in the ONSAD table were found for the given UPRNs
-            # because...reasons
-            raise CodesNotFoundException('Found no records in ONSAD for supplied UPRNs')
-
-        if len(addresses) != len(uprns):
-            # For the moment I'm going to do nothing about this, but lets
-            # leave this condition here to make that decision explicit
-            # TODO: maybe we should actually do....something else??
-            pass
+    def get_lookup(self):
+        try:
+            lookup = PostcodeLookup.objects.get(pk=self.postcode)
+        except PostcodeLookup.DoesNotExist:
+            raise ObjectDoesNotExist('No addresses found for postcode %s' % (self.postcode))
 
-        council_ids = set([a.lad for a in addresses])
+        if lookup.location is None:
+            raise ObjectDoesNotExist('No addresses found for postcode %s' % (self.postcode))
 
-        # assemble list of codes
-        gss_codes = set()
-        for address in addresses:
-            extra_codes = [address.cty, address.lad, address.ctry, address.rgn, address.eer]
-            for code in extra_codes:
-                gss_codes.add(code)
+        return lookup
 
-        if len(council_ids) == 1:
-            # all the uprns supplied are in the same local authority
-            council_gss = list(council_ids)[0]
-        else:
-            # the urpns supplied are in multiple local authorities
+    def get_codes(self, lookup):
+        if lookup.multiple_councils:
+            # the urpns in this postcode are in multiple local authorities
             raise MultipleCouncilsException('Postcode %s covers UPRNs in more than one local authority' % (self.postcode))
 
+        if not lookup.council_gss:
+            # No records in the ONSAD table were found for the UPRNs
+            # in this postcode because...reasons
+            raise CodesNotFoundException('Found no records in ONSAD for supplied UPRNs')
+
         return {
-            'council_gss': council_gss,
-            'gss_codes': list(gss_codes)
+            'council_gss': lookup.council_gss,
+            'gss_codes': lookup.gss_codes
         }
 
     def geocode(self):
-        addresses = Address.objects.filter(postcode=self.postcode)
-        if not addresses:
-            raise ObjectDoesNotExist('No addresses found for postcode %s' % (self.postcode))
-
-        codes = self.get_codes(self.get_uprns(addresses))
-        centre = centre_from_points_qs(addresses)
+        lookup = self.get_lookup()
+        codes = self.get_codes(lookup)
         return {
             'source': 'addressbase',
-            'wgs84_lon': centre.x,
-            'wgs84_lat': centre.y,
+            'wgs84_lon': lookup.location.x,
+            'wgs84_lat': lookup.location.y,
             'council_gss': codes['council_gss'],
             'gss_codes': codes['gss_codes'],
         }
 
     def geocode_point_only(self):
-        addresses = Address.objects.filter(postcode=self.postcode)
-        if not addresses:
-            raise ObjectDoesNotExist('No addresses found for postcode %s' % (self.postcode))
-
-        centre = centre_from_points_qs(addresses)
+        lookup = self.get_lookup()
         return {
             'source': 'addressbase',
-            'wgs84_lon': centre.x,
-            'wgs84_lat': centre.y,
+            'wgs84_lon': lookup.location.x,
+            'wgs84_lat': lookup.location.y,
         }
 
 
+geocode_cache = GeocodeCache()
+
+
+def cache_geocode(kind, fallback_kinds=()):
+    """
+    Serve repeat lookups for the same postcode from geocode_cache.
+    PostcodeError is cached too, so a postcode we can't geocode
+    doesn't send a fresh request to MapIt every time it is searched for.
+    GeocodingUnavailableError isn't: we might be able to geocode
+    the postcode next time.
+
+    fallback_kinds lists other kinds of cached result which
+    can also be used to answer this kind of lookup
+    (only successful results are used from these)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(postcode, *args, **kwargs):
+            key = re.sub('[^A-Z0-9]', '', postcode.upper())
+            entry = geocode_cache.get(kind, key)
+            if entry is not None:
+                if 'error' in entry:
+                    raise PostcodeError(entry['error'])
+                return dict(entry['result'])
+
+            for k in fallback_kinds:
+                entry = geocode_cache.get(k, key)
+                if entry is not None and 'result' in entry:
+                    return dict(entry['result'])
+
+            try:
+                result = func(postcode, *args, **kwargs)
+            except GeocodingUnavailableError:
+                raise
+            except PostcodeError as e:
+                geocode_cache.set(kind, key, {'error': str(e)})
+                raise
+
+            geocode_cache.set(kind, key, {'result': dict(result)})
+            return result
+        return wrapper
+    return decorator
+
+
+@cache_geocode('point_only', fallback_kinds=('full',))
 def geocode_point_only(postcode, sleep=True):
+    # sleep is no longer used: requests to MapIt are rate-limited
+    # by mapit_client. It is kept so existing callers don't break
     geocoders = (AddressBaseGeocoder(postcode), MapitGeocoder(postcode))
     for geocoder in geocoders:
         try:
@@ -199,11 +244,6 @@ def geocode_point_only(postcode, sleep=True):
         except ObjectDoesNotExist:
             # we couldn't find this postcode in AddressBase
             # fall back to the next source
-
-            # optional sleep to avoid hammering external services
-            if sleep:
-                time.sleep(1.3)
-
             continue
         except PostcodeError:
             # we were unable to geocode this postcode using mapit
@@ -213,17 +253,14 @@ def geocode_point_only(postcode, sleep=True):
         except:
             # something else went wrong:
             # lets give the next source a try anyway
-
-            # optional sleep to avoid hammering external services
-            if sleep:
-                time.sleep(1.3)
-
             continue
 
-    # All of our attempts to geocode this failed. Raise a generic exception
-    raise PostcodeError('Could not geocode from any source')
+    # All of our attempts to geocode this failed
+    # (e.g: mapit is unavailable). Raise a generic exception
+    raise GeocodingUnavailableError('Could not geocode from any source')
 
 
+@cache_geocode('full')
 def geocode(postcode):
     geocoders = (AddressBaseGeocoder(postcode), MapitGeocoder(postcode))
     for geocoder in geocoders:
@@ -251,8 +288,76 @@ def geocode(postcode):
             # lets give the next source a try anyway
             continue
 
-    # All of our attempts to geocode this failed. Raise a generic exception
-    raise PostcodeError('Could not geocode from any source')
+    # All of our attempts to geocode this failed
+    # (e.g: mapit is unavailable). Raise a generic exception
+    raise GeocodingUnavailableError('Could not geocode from any source')
+
+
+def geocode_many(postcodes):
+    """
+    Geocode a batch of postcodes (point only)
+
+    All of the postcodes we can find in AddressBase are looked up
+    in a single query. Only the misses are sent to MapIt, a few at a time.
+
+    Returns a dict of {postcode: result} with the same keys
+    as the input. result is None if we couldn't geocode that postcode.
+    """
+    results = {}
+    to_find = {}
+    for postcode in set(postcodes):
+        key = re.sub('[^A-Z0-9]', '', postcode.upper())
+        entry = geocode_cache.get('point_only', key) or\
+            geocode_cache.get('full', key)
+        if entry is None:
+            to_find.setdefault(key, []).append(postcode)
+        else:
+            results[postcode] = dict(entry['result']) if 'result' in entry else None
+
+    def store(key, result):
+        if result is not None:
+            geocode_cache.set('point_only', key, {'result': dict(result)})
+        for postcode in to_find[key]:
+            results[postcode] = result
+
+    if not to_find:
+        return results
+
+    # look up everything we can in AddressBase in one go
+    formatted = {
+        AddressBaseGeocoder(key).postcode: key for key in to_find
+    }
+    lookups = PostcodeLookup.objects.filter(
+        pk__in=formatted.keys(), location__isnull=False)
+    for lookup in lookups:
+        store(formatted[lookup.postcode], {
+            'source': 'addressbase',
+            'wgs84_lon': lookup.location.x,
+            'wgs84_lat': lookup.location.y,
+        })
+
+    # send anything we didn't find to MapIt
+    def call_mapit(key):
+        try:
+            return key, MapitGeocoder(key).run(True)
+        except GeocodingUnavailableError:
+            return key, None
+        except PostcodeError as e:
+            geocode_cache.set('point_only', key, {'error': str(e)})
+            return key, None
+        except Exception:
+            # something else went wrong (e.g: we hit the rate limit)
+            # don't cache this: we might be able to geocode it next time
+            return key, None
+
+    misses = [key for key in to_find if to_find[key][0] not in results]
+    if misses:
+        workers = min(len(misses), settings.GEOCODE_MANY_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for key, result in executor.map(call_mapit, misses):
+                store(key, result)
+
+    return results
 
 
 def get_territory(postcode):
@@ -264,31 +369,22 @@ def get_territory(postcode):
 class AddressSorter:
     # Class for sorting sort a list of address objects
     # in a human-readable order.
+    # ResidentialAddress.sort_key stores the same ordering,
+    # so prefer ORDER BY sort_key for addresses from the DB
 
     def __init__(self, addresses):
         self.addresses = addresses
 
     def convert(self, text):
-        # if text is numeric, covert to an int
-        # this allows us to sort numbers in int order, not string order
-        return int(text) if text.isdigit() else text
+        return sorting.convert(text)
 
     def alphanum_key(self, tup):
         # split the desired component of tup (defined by key function)
         # into a listof numeric and text components
-        return [ self.convert(c) for c in filter(None, re.split('([0-9]+)', tup[1])) ]
+        return sorting.alphanum_key(tup[1])
 
     def swap_fields(self, item):
-        lst = self.alphanum_key(item)
-        # swap things about so we can sort by street name, house number
-        # instead of house number, street name
-        if len(lst) > 1 and isinstance(lst[0], int) and isinstance(lst[1], str) and (lst[1][0].isspace() or lst[1][0] == ','):
-            lst[0], lst[1] = lst[1], lst[0]
-        if len(lst) > 1 and isinstance(lst[0], int) and isinstance(lst[1], int):
-            lst[0], lst[1] = lst[1], lst[0]
-        if isinstance(lst[0], int):
-            lst[0] = str(lst[0])
-        return lst
+        return sorting.swap_fields(item[1])
 
     def natural_sort(self):
         sorted_list = sorted(
@@ -460,44 +556,74 @@ class RoutingHelper():
     def __init__(self, postcode):
         self.postcode = re.sub('[^A-Z0-9]', '', postcode.upper())
         self.Endpoint = namedtuple('Endpoint', ['view', 'kwargs'])
-        self.get_addresses()
-        self.get_councils_from_blacklist()
-
-    def get_addresses(self):
-        self.addresses = ResidentialAddress.objects.filter(
-            postcode=self.postcode
-        )#.distinct()
-        return self.addresses
-
-    def get_councils_from_blacklist(self):
-        # if this postcode appears in the blacklist table
-        # return a list of any council ids attached to it
-        # if it is not in the table, we will return []
-        blacklist = Blacklist.objects.filter(postcode=self.postcode)
-        self.councils = [row.lad for row in blacklist]
-        return self.councils
+        self._route_type = None
+        self.get_routing_data()
+
+    def get_routing_data(self):
+        """
+        Fetch everything we need to route this postcode in one query:
+        - the ResidentialAddress records for this postcode
+        - the number of distinct polling stations they map to
+        - any council ids attached to this postcode in the blacklist
+          (if it is not in the table, councils will be [])
+
+        We always get at least one row back. If there are no addresses
+        the address columns will be NULL.
+        """
+        cursor = connection.cursor()
+        cursor.execute("""
+            WITH addresses AS (
+                SELECT id, address, postcode, council_id,
+                    polling_station_id, slug, sort_key
+                FROM pollingstations_residentialaddress
+                WHERE postcode = %s
+            )
+            SELECT
+                ARRAY(
+                    SELECT lad FROM addressbase_blacklist
+                    WHERE postcode = %s ORDER BY id
+                ),
+                (SELECT COUNT(DISTINCT polling_station_id) FROM addresses),
+                a.id, a.address, a.postcode, a.council_id,
+                a.polling_station_id, a.slug
+            FROM (SELECT 1) AS one
+            LEFT JOIN addresses a ON TRUE
+            ORDER BY a.sort_key, a.id;
+        """, [self.postcode, self.postcode])
+        rows = cursor.fetchall()
+
+        self.councils = rows[0][0]
+        self.num_stations = rows[0][1]
+        self.addresses = [
+            ResidentialAddress(
+                id=row[2],
+                address=row[3],
+                postcode=row[4],
+                council_id=row[5],
+                polling_station_id=row[6],
+                slug=row[7],
+            ) for row in rows if row[2] is not None
+        ]
 
     @property
     def has_addresses(self):
-        if getattr(self, 'addresses', None):
-            self.get_addresses()
         return bool(self.addresses)
 
     @property
     def has_single_address(self):
-        if getattr(self, 'addresses', None):
-            self.get_addresses()
-        return self.addresses.count == 1
+        return len(self.addresses) == 1
 
     @property
     def address_have_single_station(self):
-        if getattr(self, 'addresses', None):
-            self.get_addresses()
-        stations = self.addresses.values('polling_station_id').distinct()
-        return len(stations) == 1
+        return self.num_stations == 1
 
     @property
     def route_type(self):
+        if self._route_type is None:
+            self._route_type = self.get_route_type()
+        return self._route_type
+
+    def get_route_type(self):
         if len(self.councils) > 1:
             return "multiple_councils"
         if self.has_addresses:
@@ -513,7 +639,6 @@ class RoutingHelper():
             # postcode is not in ResidentialAddress table
             return "postcode"
 
-
     def get_endpoint(self):
         if self.route_type == "multiple_councils":
             # this postcode contains UPRNS situated in >1 local auth
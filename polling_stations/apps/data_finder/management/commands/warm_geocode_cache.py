@@ -0,0 +1,77 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from data_finder.helpers import (
+    geocode,
+    geocode_cache,
+    MultipleCouncilsException,
+    PostcodeError
+)
+from data_finder.models import LoggedPostcode
+
+
+"""
+Pre-load the geocode cache with the postcodes people search for most.
+
+Run this before polling day so the busiest postcodes are
+already cached when traffic peaks. Only results stored in the
+shared cache backend (GEOCODE_CACHE_BACKEND) will be visible
+to the web processes.
+"""
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n',
+            '--limit',
+            help='<Optional> Number of postcodes to load',
+            type=int,
+            required=False,
+            default=10000
+        )
+
+        parser.add_argument(
+            '-d',
+            '--days',
+            help='<Optional> Only count searches made in the last N days',
+            type=int,
+            required=False,
+            default=None
+        )
+
+    def get_postcodes(self, limit, days):
+        qs = LoggedPostcode.objects.all()
+        if days is not None:
+            since = timezone.now() - datetime.timedelta(days=days)
+            qs = qs.filter(created__gte=since)
+        qs = qs.values('postcode')\
+            .annotate(searches=Count('id'))\
+            .order_by('-searches', 'postcode')
+        return [row['postcode'] for row in qs[:limit]]
+
+    def handle(self, *args, **kwargs):
+        if not geocode_cache.enabled:
+            print("GEOCODE_CACHE_ENABLED is False: nothing to do")
+            return
+
+        postcodes = self.get_postcodes(kwargs['limit'], kwargs['days'])
+        print("warming cache for %i postcodes.." % (len(postcodes)))
+
+        start = time.perf_counter()
+        found = 0
+        failed = 0
+        for postcode in postcodes:
+            try:
+                geocode(postcode)
+                found += 1
+            except (PostcodeError, MultipleCouncilsException):
+                # PostcodeError is cached too, so this still saves
+                # a lookup if someone searches for it again
+                failed += 1
+
+        print("geocoded %i postcodes, %i failed (%.1fs)" % (
+            found, failed, time.perf_counter() - start))
@@ -0,0 +1,123 @@
+"""
+Shared HTTP client for talking to MapIt
+
+All requests go through a single keep-alive session (per process)
+and a token bucket so we stay under MapIt's rate limit without
+having to sleep between every request. If MapIt tells us we've
+exceeded the limit anyway (403), back off exponentially and retry.
+
+These requests are made while a user waits for a response, so we never
+sleep for more than MAPIT_MAX_BACKOFF at a time or MAPIT_MAX_WAIT in
+total for one request: if we'd have to wait longer than that,
+give up and raise RateLimitExceeded.
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        # rate: tokens added per second
+        # capacity: max tokens we can save up (i.e: size of a burst)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        # block until a token is available, then take it.
+        # Returns False (without waiting) if that would take
+        # longer than timeout seconds
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class MapitClient:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.session = None
+        self.bucket = None
+
+    def setup(self):
+        # (re)create the session and bucket if this is the first
+        # request in this process. We don't want to share sockets
+        # with a parent process after a fork()
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=settings.MAPIT_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if settings.MAPIT_UA:
+                session.headers['User-Agent'] = settings.MAPIT_UA
+            self.session = session
+            self.bucket = TokenBucket(
+                settings.MAPIT_RATE_LIMIT, settings.MAPIT_RATE_LIMIT_BURST)
+            self.pid = os.getpid()
+
+    def get_backoff(self, res, attempt):
+        # respect Retry-After if MapIt sends one
+        try:
+            backoff = float(res.headers['Retry-After'])
+        except (KeyError, ValueError):
+            backoff = settings.MAPIT_BACKOFF * (2 ** attempt)
+        return max(0, min(backoff, settings.MAPIT_MAX_BACKOFF))
+
+    def get(self, path):
+        self.setup()
+        url = "%s/%s" % (settings.MAPIT_URL, path)
+        deadline = time.monotonic() + settings.MAPIT_MAX_WAIT
+
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(timeout=deadline - time.monotonic()):
+                raise RateLimitExceeded(
+                    "Waited too long for our own rate limit")
+            res = self.session.get(url, timeout=settings.MAPIT_TIMEOUT)
+            if res.status_code != 403 or attempt >= settings.MAPIT_MAX_RETRIES:
+                return res
+            backoff = self.get_backoff(res, attempt)
+            if time.monotonic() + backoff > deadline:
+                raise RateLimitExceeded(
+                    "Mapit asked us to back off for too long")
+            time.sleep(backoff)
+            attempt += 1
+
+    def reset(self):
+        with self.lock:
+            if self.session is not None:
+                self.session.close()
+            self.pid = None
+
+
+mapit_client = MapitClient()
@@ -0,0 +1,143 @@
+"""
+Write LoggedPostcode records without holding up lookups
+
+log() puts a record on an in-process queue and returns straight away.
+A background thread writes queued records to the logger DB in batches
+with bulk_create(). If the queue fills up (e.g: because the logger DB is
+slow or down), new records are dropped and counted in `dropped`
+rather than making the user wait.
+
+Each process (e.g: each gunicorn worker) starts its own thread the first
+time it logs something. Records still queued when the process exits
+are flushed by an atexit handler.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from data_finder.models import LoggedPostcode
+
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+
+
+class PostcodeLogWriter:
+
+    def __init__(self, async_writes=None, queue_size=None,
+                 batch_size=None, flush_interval=None):
+        self.async_writes = async_writes
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.pid = None
+        self.thread = None
+        self.queue = None
+        self.lock = threading.Lock()
+        self.registered = False
+
+    def get_setting(self, name, value):
+        if value is None:
+            return getattr(settings, name)
+        return value
+
+    def is_async(self):
+        return self.get_setting('POSTCODE_LOG_ASYNC', self.async_writes)
+
+    def ensure_started(self):
+        # a forked process inherits our queue but not our thread,
+        # so check we started the thread in this process
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.queue = queue.Queue(self.get_setting(
+                'POSTCODE_LOG_QUEUE_SIZE', self.queue_size))
+            self.thread = threading.Thread(
+                target=self.run, name='postcode-log-writer')
+            self.thread.daemon = True
+            self.thread.start()
+            self.pid = os.getpid()
+            if not self.registered:
+                atexit.register(self.stop)
+                self.registered = True
+
+    def log(self, **kwargs):
+        record = LoggedPostcode(**kwargs)
+        if not self.is_async():
+            self.write([record])
+            return
+
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def write(self, records):
+        try:
+            LoggedPostcode.objects.bulk_create(records)
+            self.written += len(records)
+        except Exception:
+            if not self.is_async():
+                raise
+            self.dropped += len(records)
+            logger.exception(
+                "Failed to write %i LoggedPostcode records", len(records))
+
+    def get_batch(self):
+        # wait for a record, then collect more until the
+        # batch is full or the flush interval has passed
+        batch_size = self.get_setting('POSTCODE_LOG_BATCH_SIZE', self.batch_size)
+        flush_interval = self.get_setting(
+            'POSTCODE_LOG_FLUSH_INTERVAL', self.flush_interval)
+
+        batch = [self.queue.get()]
+        deadline = time.time() + flush_interval
+        while batch[-1] is not STOP and len(batch) < batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.get_batch()
+            stop = batch[-1] is STOP
+            records = [r for r in batch if r is not STOP]
+            if records:
+                self.write(records)
+                # this thread has its own DB connection:
+                # don't let it outlive CONN_MAX_AGE or a DB restart
+                close_old_connections()
+            if stop:
+                return
+
+    def stop(self, timeout=5):
+        """
+        Write anything still queued and stop the background thread
+        """
+        if self.pid != os.getpid() or not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+postcode_log_writer = PostcodeLogWriter()
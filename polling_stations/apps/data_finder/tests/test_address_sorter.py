@@ -2,6 +2,7 @@ from collections import namedtuple
 from django.test import TestCase
 from data_finder.helpers import AddressSorter
 from pollingstations.models import ResidentialAddress
+from pollingstations.sorting import address_sort_key
 
 Address = namedtuple('Address', ['id', 'address'])
 
@@ -122,3 +123,56 @@ class AddressSorterTest(TestCase):
         result = sorter.natural_sort()
 
         self.assertEqual(expected, result)
+
+
+class SortKeyTest(TestCase):
+
+    addresses = [
+        "10, THE SQUARE, BOGNOR REGIS",
+        "1, THE SQUARE, BOGNOR REGIS",
+        "2, THE SQUARE, BOGNOR REGIS",
+        "1  Southlands Court Birchfield Road",
+        "1 233 The Beeches Birchfield Road",
+        "207 Birchfield Road",
+        "203 Birchfield Road",
+        "2 233 The Beeches Birchfield Road",
+        "200A Evesham Road",
+        "190A Evesham Road",
+        "The Forge Mill Evesham Road",
+        "190B Evesham Road",
+        "Flat 10  Knapton House North Walsham Road",
+        "Flat 1  Knapton House North Walsham Road",
+        "Flat 2  Knapton House North Walsham Road",
+        "Flat 2",
+        "Flat 2A",
+        "Flat",
+        "007 Bond Street",
+        "7 Bond Street",
+        "Café 1 High Street",
+        "Cafe 1 High Street",
+    ]
+
+    def test_sort_key_matches_natural_sort(self):
+        in_list = [
+            Address(id=i, address=address)
+            for i, address in enumerate(self.addresses)
+        ]
+        expected = AddressSorter(in_list).natural_sort()
+        result = sorted(
+            in_list, key=lambda a: (address_sort_key(a.address), a.id))
+        self.assertEqual(expected, result)
+
+    def test_order_by_sort_key(self):
+        for i, address in enumerate(self.addresses):
+            ResidentialAddress(
+                address=address,
+                postcode='AA11AA',
+                polling_station_id='1',
+                slug='address-%i' % (i),
+            ).save()
+
+        addresses = ResidentialAddress.objects.filter(postcode='AA11AA')
+        expected = [a.slug for a in
+                    AddressSorter(addresses.order_by('id')).natural_sort()]
+        result = [a.slug for a in addresses.order_by('sort_key', 'id')]
+        self.assertEqual(expected, result)
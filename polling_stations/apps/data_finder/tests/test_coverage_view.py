@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from councils.models import Council
+from data_collection.models import DataQuality
+from pollingstations.models import PollingDistrict, PollingStation
+
+
+class CoverageViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.add_councils(0, 4)
+
+    def tearDown(self):
+        cache.clear()
+
+    def add_councils(self, start, end):
+        for i in range(start, end):
+            council_id = 'X0100%04i' % (i)
+            Council.objects.create(council_id=council_id, name=council_id)
+            # every other council has stations, every third has districts
+            if i % 2 == 0:
+                for j in range(3):
+                    PollingStation.objects.create(
+                        council_id=council_id, internal_council_id=str(j))
+            if i % 3 == 0:
+                for j in range(2):
+                    PollingDistrict.objects.create(
+                        council_id=council_id, internal_council_id=str(j))
+        DataQuality.objects.update_counts()
+        DataQuality.objects.clear_coverage_cache()
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/coverage')
+        self.assertEqual(200, response.status_code)
+        return response, len(queries)
+
+    def test_counts(self):
+        response, _ = self.get()
+        self.assertEqual(4, response.context['num_councils'])
+        self.assertEqual(2, response.context['num_station_councils'])
+        self.assertEqual(2, response.context['num_district_councils'])
+        self.assertEqual('50%', response.context['perc_stations'])
+
+    def test_constant_queries(self):
+        _, few_councils = self.get()
+
+        self.add_councils(4, 40)
+        _, many_councils = self.get()
+        self.assertEqual(few_councils, many_councils)
+
+    def test_cached(self):
+        _, uncached = self.get()
+        response, cached = self.get()
+        self.assertEqual(uncached - 1, cached)
+        self.assertEqual(4, response.context['num_councils'])
@@ -0,0 +1,150 @@
+import mock
+import requests
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from data_finder.cache import LruCache
+from data_finder.helpers import (
+    geocode, geocode_cache, geocode_point_only,
+    GeocodingUnavailableError, PostcodeError
+)
+from data_finder.models import LoggedPostcode
+
+
+def mock_geocode(self):
+    return {
+        'source': 'mapit',
+        'wgs84_lon': -0.1,
+        'wgs84_lat': 51.5,
+        'gss_codes': [],
+        'council_gss': 'X01000001',
+    }
+
+def mock_not_found(self):
+    raise PostcodeError("Mapit error 404: Not Found")
+
+def mock_connection_error(self):
+    raise requests.exceptions.ConnectionError()
+
+
+class LruCacheTest(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LruCache(2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.get('a')
+        cache.set('c', 3, 60)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_expiry(self):
+        cache = LruCache(2)
+        cache.set('a', 1, -1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+
+@override_settings(GEOCODE_CACHE_ENABLED=True)
+class GeocodeCacheTest(TestCase):
+
+    fixtures = ['test_addressbase.json']
+
+    def setUp(self):
+        geocode_cache.clear()
+
+    def tearDown(self):
+        geocode_cache.clear()
+
+    def test_addressbase_cached(self):
+        result = geocode('BB1 1BB')
+        self.assertEqual('addressbase', result['source'])
+        with self.assertNumQueries(0):
+            self.assertEqual(result, geocode('bb11bb'))
+
+    def test_shared_cache(self):
+        # another process has already geocoded this postcode
+        result = geocode('BB1 1BB')
+        geocode_cache.local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(result, geocode('BB1 1BB'))
+
+    def test_result_is_a_copy(self):
+        geocode('BB1 1BB')['source'] = 'foo'
+        self.assertEqual('addressbase', geocode('BB1 1BB')['source'])
+
+    def test_mapit_cached(self):
+        with mock.patch(
+                "data_finder.helpers.MapitGeocoder.run",
+                autospec=True,
+                side_effect=mock_geocode) as run:
+            geocode('DD1 1DD')
+            geocode('DD1 1DD')
+            self.assertEqual(1, run.call_count)
+
+    def test_errors_cached(self):
+        with mock.patch(
+                "data_finder.helpers.MapitGeocoder.run",
+                autospec=True,
+                side_effect=mock_not_found) as run:
+            for i in range(2):
+                with self.assertRaises(PostcodeError):
+                    geocode('DD1 1DD')
+            self.assertEqual(1, run.call_count)
+
+    def test_unavailable_not_cached(self):
+        # if we can't reach mapit, try again next time
+        with mock.patch(
+                "data_finder.helpers.MapitGeocoder.run",
+                autospec=True,
+                side_effect=mock_connection_error) as run:
+            for i in range(2):
+                with self.assertRaises(GeocodingUnavailableError):
+                    geocode('DD1 1DD')
+                with self.assertRaises(GeocodingUnavailableError):
+                    geocode_point_only('DD1 1DD')
+            self.assertEqual(4, run.call_count)
+        self.assertIsNone(geocode_cache.get('full', 'DD11DD'))
+
+    def test_point_only_uses_full_result(self):
+        geocode('BB1 1BB')
+        with self.assertNumQueries(0):
+            result = geocode_point_only('BB1 1BB', sleep=False)
+        self.assertEqual('addressbase', result['source'])
+
+    def test_timeouts(self):
+        with override_settings(GEOCODE_CACHE_TTL={
+                'addressbase': 3, 'mapit': 2, 'error': 1, 'default': 4}):
+            self.assertEqual(3, geocode_cache.get_timeout(
+                {'result': {'source': 'addressbase'}}))
+            self.assertEqual(2, geocode_cache.get_timeout(
+                {'result': {'source': 'mapit'}}))
+            self.assertEqual(1, geocode_cache.get_timeout({'error': 'foo'}))
+            self.assertEqual(4, geocode_cache.get_timeout({'result': {}}))
+
+    @override_settings(GEOCODE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        geocode('BB1 1BB')
+        with self.assertNumQueries(1):
+            geocode('BB1 1BB')
+
+
+@override_settings(GEOCODE_CACHE_ENABLED=True)
+class WarmGeocodeCacheTest(TestCase):
+
+    fixtures = ['test_addressbase.json']
+
+    def setUp(self):
+        geocode_cache.clear()
+        for postcode in ['BB11BB', 'BB11BB', 'CC11CC']:
+            LoggedPostcode.objects.create(postcode=postcode)
+
+    def tearDown(self):
+        geocode_cache.clear()
+
+    def test_warm_cache(self):
+        call_command('warm_geocode_cache', limit=1)
+        self.assertIsNotNone(geocode_cache.get('full', 'BB11BB'))
+        self.assertIsNone(geocode_cache.get('full', 'CC11CC'))
@@ -0,0 +1,43 @@
+import mock
+from django.test import TestCase
+
+from data_finder.helpers import geocode_many, PostcodeError
+
+
+def mock_run(self, point_only=False):
+    if self.postcode == 'ZZ11ZZ':
+        raise PostcodeError("Mapit error 404: Not Found")
+    return {
+        'source': 'mapit',
+        'wgs84_lon': -0.1,
+        'wgs84_lat': 51.5,
+    }
+
+
+@mock.patch("data_finder.helpers.MapitGeocoder.run", mock_run)
+class GeocodeManyTest(TestCase):
+
+    fixtures = ['test_addressbase.json']
+
+    def test_addressbase_single_query(self):
+        with self.assertNumQueries(1):
+            result = geocode_many(['AA1 1AA', 'bb11bb', 'CC1 1CC'])
+        self.assertEqual(3, len(result))
+        for postcode in ['AA1 1AA', 'bb11bb', 'CC1 1CC']:
+            self.assertEqual('addressbase', result[postcode]['source'])
+        self.assertAlmostEqual(-3.8333333333333335, result['bb11bb']['wgs84_lon'])
+        self.assertAlmostEqual(51.1333333333333329, result['bb11bb']['wgs84_lat'])
+
+    def test_misses_use_mapit(self):
+        result = geocode_many(['BB1 1BB', 'DD1 1DD', 'ZZ1 1ZZ'])
+        self.assertEqual('addressbase', result['BB1 1BB']['source'])
+        self.assertEqual('mapit', result['DD1 1DD']['source'])
+        self.assertIsNone(result['ZZ1 1ZZ'])
+
+    def test_same_postcode_different_formats(self):
+        result = geocode_many(['DD1 1DD', 'dd11dd'])
+        self.assertEqual(result['DD1 1DD'], result['dd11dd'])
+
+    def test_empty(self):
+        with self.assertNumQueries(0):
+            self.assertEqual({}, geocode_many([]))
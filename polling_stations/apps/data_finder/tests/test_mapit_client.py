@@ -0,0 +1,170 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from os.path import abspath, dirname
+
+from django.test import TestCase, override_settings
+
+from data_finder.helpers import (
+    GeocodingUnavailableError, MapitGeocoder, PostcodeError, RateLimitError
+)
+from data_finder.mapit_client import mapit_client, TokenBucket
+
+
+FIXTURE = abspath(
+    dirname(__file__) + '/../fixtures/mapit_responses/SW1A1AA.json')
+
+
+class StubMapitHandler(BaseHTTPRequestHandler):
+
+    """
+    Stub MapIt server:
+    /postcode/SW1A1AA returns a valid response
+    /postcode/LIMITED returns 403 the first n times it is requested
+    /postcode/BROKEN returns 500
+    /postcode/SLOW returns 403 with a long Retry-After
+    anything else returns 404
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+
+        if self.path.endswith('/postcode/LIMITED') and\
+                self.server.rate_limited > 0:
+            self.server.rate_limited -= 1
+            return self.respond(403, b'Rate limit exceeded')
+
+        if self.path.endswith('/postcode/BROKEN'):
+            return self.respond(500, b'<html>Server Error</html>')
+
+        if self.path.endswith('/postcode/SLOW'):
+            return self.respond(
+                403, b'Rate limit exceeded', {'Retry-After': '3600'})
+
+        if self.path.endswith('/postcode/SW1A1AA') or\
+                self.path.endswith('/postcode/LIMITED'):
+            with open(FIXTURE, 'rb') as f:
+                return self.respond(200, f.read())
+
+        self.respond(404, b'<html>Not Found</html>')
+
+    def respond(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubMapitTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), StubMapitHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.rate_limited = 0
+        self.settings_override = override_settings(
+            MAPIT_URL='http://127.0.0.1:%i' % (self.server.server_port),
+            MAPIT_BACKOFF=0.01,
+            MAPIT_MAX_RETRIES=3,
+            MAPIT_RATE_LIMIT=1000,
+            MAPIT_RATE_LIMIT_BURST=1000,
+        )
+        self.settings_override.enable()
+        mapit_client.reset()
+
+    def tearDown(self):
+        mapit_client.reset()
+        self.settings_override.disable()
+
+
+class MapitClientTest(StubMapitTestCase):
+
+    def test_valid(self):
+        result = MapitGeocoder('SW1A 1AA').geocode()
+        self.assertEqual('mapit', result['source'])
+        self.assertEqual('E09000033', result['council_gss'])
+
+    def test_not_found(self):
+        with self.assertRaises(PostcodeError):
+            MapitGeocoder('ZZ1 1ZZ').geocode()
+
+    def test_server_error(self):
+        # a mapit error doesn't mean the postcode is invalid
+        with self.assertRaises(GeocodingUnavailableError):
+            MapitGeocoder('BROKEN').geocode()
+
+    def test_session_reused(self):
+        MapitGeocoder('SW1A 1AA').geocode()
+        session = mapit_client.session
+        MapitGeocoder('SW1A 1AA').geocode()
+        self.assertIs(session, mapit_client.session)
+
+    def test_backoff_then_success(self):
+        self.server.rate_limited = 2
+        result = MapitGeocoder('LIMITED').geocode()
+        self.assertEqual('mapit', result['source'])
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_backoff_gives_up(self):
+        self.server.rate_limited = 10
+        with self.assertRaises(RateLimitError):
+            MapitGeocoder('LIMITED').geocode()
+        # first attempt + MAPIT_MAX_RETRIES
+        self.assertEqual(4, len(self.server.requests))
+
+    def test_long_retry_after(self):
+        # don't hold up the user for an hour:
+        # give up as soon as we know we'd wait too long
+        with override_settings(MAPIT_MAX_BACKOFF=60, MAPIT_MAX_WAIT=1):
+            start = time.monotonic()
+            with self.assertRaises(RateLimitError):
+                MapitGeocoder('SLOW').geocode()
+            self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_backoff_capped(self):
+        class Response:
+            headers = {'Retry-After': '3600'}
+        with override_settings(MAPIT_MAX_BACKOFF=2):
+            self.assertEqual(2, mapit_client.get_backoff(Response(), 0))
+
+
+class TokenBucketTest(TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        for i in range(3):
+            bucket.acquire()
+        self.assertLess(bucket.tokens, 1)
+
+    def test_refill(self):
+        bucket = TokenBucket(rate=1000, capacity=1)
+        bucket.acquire()
+        # should wait ~1ms for the next token rather than failing
+        self.assertTrue(bucket.acquire())
+        self.assertLess(bucket.tokens, 1)
+
+    def test_timeout(self):
+        bucket = TokenBucket(rate=0.001, capacity=1)
+        self.assertTrue(bucket.acquire())
+        # the next token is ~1000s away: don't wait for it
+        start = time.monotonic()
+        self.assertFalse(bucket.acquire(timeout=0.1))
+        self.assertLess(time.monotonic() - start, 0.1)
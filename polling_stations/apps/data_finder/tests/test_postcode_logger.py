@@ -0,0 +1,70 @@
+import mock
+import threading
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from data_finder.models import LoggedPostcode
+from data_finder.postcode_logger import PostcodeLogWriter
+
+
+class SynchronousPostcodeLogWriterTest(TestCase):
+
+    def test_log(self):
+        writer = PostcodeLogWriter(async_writes=False)
+        writer.log(postcode='AA11AA', brand='democracyclub')
+        self.assertEqual(1, LoggedPostcode.objects.filter(
+            postcode='AA11AA', brand='democracyclub').count())
+        self.assertIsNone(writer.thread)
+
+
+class AsyncPostcodeLogWriterTest(TransactionTestCase):
+
+    def test_log(self):
+        writer = PostcodeLogWriter(
+            async_writes=True, queue_size=100, batch_size=3, flush_interval=0.1)
+        for i in range(7):
+            writer.log(postcode='AA1%iAA' % (i))
+        writer.stop()
+
+        self.assertFalse(writer.thread.is_alive())
+        self.assertEqual(7, writer.written)
+        self.assertEqual(0, writer.dropped)
+        self.assertEqual(7, LoggedPostcode.objects.count())
+
+
+class PostcodeLogWriterDropTest(SimpleTestCase):
+
+    def test_full_queue(self):
+        writer = PostcodeLogWriter(
+            async_writes=True, queue_size=1, batch_size=1, flush_interval=0.1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write(records):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(
+                LoggedPostcode.objects, 'bulk_create', side_effect=slow_write):
+            writer.log(postcode='AA11AA')
+            started.wait(5)
+            writer.log(postcode='AA12AA')  # queued
+            writer.log(postcode='AA13AA')  # queue is full
+            self.assertEqual(1, writer.dropped)
+            release.set()
+            writer.stop()
+
+        self.assertEqual(2, writer.written)
+
+    def test_failed_write(self):
+        writer = PostcodeLogWriter(
+            async_writes=True, queue_size=10, batch_size=10, flush_interval=0.1)
+        with mock.patch.object(
+                LoggedPostcode.objects, 'bulk_create',
+                side_effect=Exception('logger DB is down')):
+            writer.log(postcode='AA11AA')
+            writer.log(postcode='AA12AA')
+            writer.stop()
+
+        self.assertEqual(2, writer.dropped)
+        self.assertEqual(0, writer.written)
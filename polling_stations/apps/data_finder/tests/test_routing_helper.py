@@ -57,3 +57,38 @@ class RoutingHelperTest(TestCase):
         rh = RoutingHelper('dd11dd')
         endpoint = rh.get_endpoint()
         self.assertEqual('multiple_councils_view', endpoint.view)
+
+
+class RoutingHelperQueryCountTest(TestCase):
+
+    fixtures = ['test_routing.json']
+
+    def assertSingleQuery(self, postcode, route_type, view):
+        # constructing the helper should hit the DB once and
+        # routing should not need any further queries
+        with self.assertNumQueries(1):
+            rh = RoutingHelper(postcode)
+            for i in range(3):
+                self.assertEqual(route_type, rh.route_type)
+                self.assertEqual(view, rh.get_endpoint().view)
+        return rh
+
+    def test_address_view(self):
+        rh = self.assertSingleQuery(
+            'AA11AA', 'single_address', 'address_view')
+        self.assertTrue(rh.has_addresses)
+
+    def test_address_select_view(self):
+        rh = self.assertSingleQuery(
+            'BB11BB', 'multiple_addresses', 'address_select_view')
+        self.assertFalse(rh.has_single_address)
+
+    def test_postcode_view(self):
+        rh = self.assertSingleQuery('CC11CC', 'postcode', 'postcode_view')
+        self.assertEqual([], rh.addresses)
+        self.assertEqual([], rh.councils)
+
+    def test_multiple_councils_view(self):
+        rh = self.assertSingleQuery(
+            'DD11DD', 'multiple_councils', 'multiple_councils_view')
+        self.assertEqual(2, len(rh.councils))
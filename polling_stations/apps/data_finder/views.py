@@ -14,12 +14,14 @@ from django.views.generic import FormView, DetailView, TemplateView
 from django.utils import translation
 from django.utils.translation import ugettext as _
 
+from councils.helpers import council_locator
 from councils.models import Council
+from data_collection.models import DataQuality
 from data_finder.models import (
-    LoggedPostcode,
     CampaignSignup,
     ElectionNotificationSignup
 )
+from data_finder.postcode_logger import postcode_log_writer
 from pollingstations.models import (
     PollingStation,
     ResidentialAddress,
@@ -28,7 +30,6 @@ from pollingstations.models import (
 from whitelabel.views import WhiteLabelTemplateOverrideMixin
 from .forms import PostcodeLookupForm, AddressSelectForm
 from .helpers import (
-    AddressSorter,
     DirectionsHelper,
     get_territory,
     geocode,
@@ -65,7 +66,7 @@ class LogLookUpMixin(object):
         if 'api_user' in context:
             kwargs['api_user'] = context['api_user']
         kwargs.update(self.request.session['utm_data'])
-        LoggedPostcode.objects.create(**kwargs)
+        postcode_log_writer.log(**kwargs)
 
 
 class LanguageMixin(object):
@@ -231,8 +232,7 @@ class PostcodeView(BasePollingStationView):
             except Council.DoesNotExist:
                 pass
 
-        return Council.objects.get(
-            area__covers=self.location)
+        return council_locator.get_council(self.location)
 
     def get_station(self):
         return PollingStation.objects.get_polling_station(
@@ -381,13 +381,11 @@ class AddressFormView(FormView):
     def get_form(self, form_class):
         addresses = ResidentialAddress.objects.filter(
             postcode=self.kwargs['postcode']
-        )
+        ).order_by('sort_key', 'id')
 
         if not addresses:
             raise Http404
 
-        sorter = AddressSorter(addresses)
-        addresses = sorter.natural_sort()
         select_addresses = [(element.slug, element.address) for element in addresses]
         select_addresses.append((self.NOTINLIST, 'My address is not in the list'))
         return form_class(select_addresses, self.kwargs['postcode'], **self.get_form_kwargs())
@@ -412,15 +410,13 @@ class CoverageView(TemplateView):
 
     def get_context_data(self, *a, **k):
         context = super(CoverageView, self).get_context_data(*a, **k)
-        num_councils  = Council.objects.count()
-        districts, stations = 0, 0
-        covered = []
-        for council in Council.objects.all():
-            if council.pollingstation_set.count() > 1:
-                stations += 1
-                covered.append(council)
-            if council.pollingdistrict_set.count() > 1:
-                districts += 1
+        # counts are stored on DataQuality when each council is imported
+        coverage = DataQuality.objects.get_coverage()
+        num_councils = coverage['num_councils']
+        districts = coverage['num_district_councils']
+        stations = coverage['num_station_councils']
+        covered = Council.objects.filter(
+            dataquality__num_stations__gt=1).only('council_id', 'name')
 
         context['num_councils']          = num_councils
         context['num_district_councils'] = districts
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db.models import Extent
+
+from pollingstations.models import PollingDistrict
+from pollingstations.spatial import district_index
+
+
+def percentile(timings, p):
+    timings = sorted(timings)
+    k = int(round((len(timings) - 1) * p / 100.0))
+    return timings[k]
+
+
+"""
+Compare the time taken to find the polling district containing a point
+using a PostGIS query and the in-memory district index
+
+Points are picked at random from within the extent of the council's districts
+"""
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'council_id',
+            help='Council to run the benchmark against',
+        )
+
+        parser.add_argument(
+            '-n',
+            '--samples',
+            help='<Optional> Number of points to look up',
+            type=int,
+            required=False,
+            default=1000
+        )
+
+    def get_points(self, council_id, samples):
+        xmin, ymin, xmax, ymax = PollingDistrict.objects.filter(
+            council_id=council_id).aggregate(extent=Extent('area'))['extent']
+        rand = random.Random(0)
+        return [
+            Point(rand.uniform(xmin, xmax), rand.uniform(ymin, ymax), srid=4326)
+            for i in range(samples)
+        ]
+
+    def time_lookups(self, func, points):
+        timings = []
+        results = []
+        for point in points:
+            start = time.perf_counter()
+            results.append(func(point))
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, results
+
+    def db_lookup(self, point):
+        return sorted(PollingDistrict.objects.filter(
+            area__covers=point).values_list('pk', flat=True))
+
+    def index_lookup(self, point):
+        return sorted(d.pk for d in district_index.find(self.council_id, point))
+
+    def handle(self, *args, **kwargs):
+        self.council_id = kwargs['council_id']
+        points = self.get_points(self.council_id, kwargs['samples'])
+
+        start = time.perf_counter()
+        district_index.get_council_index(self.council_id)
+        print("built index in %.1fms" % ((time.perf_counter() - start) * 1000))
+
+        db_timings, db_results = self.time_lookups(self.db_lookup, points)
+        index_timings, index_results = self.time_lookups(
+            self.index_lookup, points)
+
+        print("           p50 (ms)    p99 (ms)")
+        for name, timings in (('postgis', db_timings), ('index', index_timings)):
+            print("%-7s    %8.3f    %8.3f" % (
+                name, percentile(timings, 50), percentile(timings, 99)))
+
+        mismatches = sum(
+            1 for a, b in zip(db_results, index_results) if a != b)
+        print("%i of %i lookups returned different districts" % (
+            mismatches, len(points)))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from pollingstations.sorting import address_sort_key
+
+
+BATCH_SIZE = 5000
+
+
+def set_sort_keys(apps, schema_editor):
+    # fetch addresses in batches (in id order) and
+    # write each batch's keys with a single UPDATE
+    cursor = schema_editor.connection.cursor()
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, address FROM pollingstations_residentialaddress
+            WHERE id > %s ORDER BY id LIMIT %s;
+        """, [last_id, BATCH_SIZE])
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        values = []
+        params = []
+        for pk, address in rows:
+            values.append('(%s, %s::bytea)')
+            params.extend([pk, address_sort_key(address)])
+        cursor.execute("""
+            UPDATE pollingstations_residentialaddress ra
+            SET sort_key = v.sort_key
+            FROM (VALUES {values}) AS v (id, sort_key)
+            WHERE ra.id = v.id;
+        """.format(values=', '.join(values)), params)
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pollingstations', '0013_customfinders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='residentialaddress',
+            name='sort_key',
+            field=models.BinaryField(default=b'', editable=False),
+        ),
+        migrations.RunPython(set_sort_keys, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='residentialaddress',
+            index_together=set([('postcode', 'sort_key')]),
+        ),
+    ]
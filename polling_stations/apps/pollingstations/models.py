@@ -6,11 +6,14 @@ from itertools import groupby
 import re
 import urllib.parse
 
+from django.conf import settings
 from django.contrib.gis.db import models
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import ugettext as _
 
 from councils.models import Council
+from pollingstations.sorting import address_sort_key
+from pollingstations.spatial import district_index
 
 
 class PollingDistrict(models.Model):
@@ -34,14 +37,27 @@ class PollingDistrict(models.Model):
 
 
 class PollingStationManager(models.GeoManager):
+
+    def get_polling_district(self, council_id, location):
+        if getattr(settings, 'DISTRICT_INDEX_ENABLED', False) and council_id:
+            districts = district_index.find(council_id, location)
+            if len(districts) == 1:
+                return districts[0]
+            if len(districts) > 1:
+                raise PollingDistrict.MultipleObjectsReturned
+            # if we didn't find anything in this council's districts
+            # fall back to searching all of the districts in the DB
+
+        return PollingDistrict.objects.get(area__covers=location)
+
     def get_polling_station(self, council_id,
                             location=None, polling_district=None):
         assert any((polling_district, location))
 
         if not polling_district:
             try:
-                polling_district = PollingDistrict.objects.get(
-                    area__covers=location)
+                polling_district = self.get_polling_district(
+                    council_id, location)
             except PollingDistrict.DoesNotExist:
                 return None
             except PollingDistrict.MultipleObjectsReturned:
@@ -122,6 +138,14 @@ class ResidentialAddress(models.Model):
     council            = models.ForeignKey(Council, null=True)
     polling_station_id = models.CharField(blank=True, max_length=100)
     slug               = models.SlugField(blank=False, null=False, db_index=True, unique=True, max_length=255)
+    # see pollingstations.sorting: ORDER BY sort_key
+    # gives us addresses in a human-readable order
+    sort_key           = models.BinaryField(default=b'', editable=False)
+
+    class Meta:
+        index_together = [
+            ["postcode", "sort_key"],
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -129,6 +153,7 @@ class ResidentialAddress(models.Model):
         this will make it easier to query based on user-supplied postcode
         """
         self.postcode = re.sub('[^A-Z0-9]', '', self.postcode.upper())
+        self.sort_key = address_sort_key(self.address)
         super().save(*args, **kwargs)
 
 
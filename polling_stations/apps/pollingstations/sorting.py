@@ -0,0 +1,56 @@
+"""
+Sort addresses in a human-readable order
+(e.g: by street, then house number in numeric order)
+
+swap_fields() builds the key used by data_finder.helpers.AddressSorter.
+address_sort_key() encodes the same key as bytes which sort in the same
+order, so we can store it on ResidentialAddress and ORDER BY it in SQL.
+"""
+import re
+
+
+def convert(text):
+    # if text is numeric, covert to an int
+    # this allows us to sort numbers in int order, not string order
+    return int(text) if text.isdigit() else text
+
+
+def alphanum_key(text):
+    # split text into a list of numeric and text components
+    return [convert(c) for c in filter(None, re.split('([0-9]+)', text))]
+
+
+def swap_fields(text):
+    lst = alphanum_key(text)
+    # swap things about so we can sort by street name, house number
+    # instead of house number, street name
+    if len(lst) > 1 and isinstance(lst[0], int) and isinstance(lst[1], str) and (lst[1][0].isspace() or lst[1][0] == ','):
+        lst[0], lst[1] = lst[1], lst[0]
+    if len(lst) > 1 and isinstance(lst[0], int) and isinstance(lst[1], int):
+        lst[0], lst[1] = lst[1], lst[0]
+    if isinstance(lst[0], int):
+        lst[0] = str(lst[0])
+    return lst
+
+
+def encode_component(component):
+    if isinstance(component, int):
+        # prefix with the number of digits so ints sort in numeric order
+        digits = str(component)
+        return ('%03i%s' % (len(digits), digits)).encode('ascii')
+    # UTF-8 bytes sort in the same order as code points
+    return component.encode('utf-8')
+
+
+def address_sort_key(text):
+    """
+    Bytes which sort (bytewise, as PostgreSQL sorts bytea) in the same
+    order as swap_fields(text). Each component is followed by a NUL byte,
+    which sorts below any character, so shorter lists sort first
+    """
+    if not text:
+        return b''
+    return b''.join(
+        encode_component(component) + b'\x00'
+        for component in swap_fields(text)
+    )
@@ -0,0 +1,89 @@
+"""
+In-memory point-in-polygon lookup for PollingDistricts
+
+Each process builds an index for a council the first time we look up
+a point in that council, then answers lookups from prepared GEOS
+geometries instead of querying PostGIS.
+
+Each council's index has a version stored in the cache.
+Importers bump the version when they finish (see invalidate_district_index),
+which makes every process rebuild that council's index on its next lookup.
+For this to work across processes, the cache backend must be shared.
+"""
+import threading
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version_key(council_id):
+    return 'district-index-version:%s' % (council_id)
+
+
+def invalidate_district_index(council_id):
+    cache.set(get_version_key(council_id), uuid.uuid4().hex, None)
+
+
+class CouncilDistrictIndex:
+
+    def __init__(self, council_id, version):
+        # import here to avoid a circular import with models.py
+        from pollingstations.models import PollingDistrict
+
+        self.council_id = council_id
+        self.version = version
+        self.entries = []
+
+        # we only need to keep the geometries as prepared geometries
+        # so don't hold on to a second copy of each area
+        districts = {
+            d.pk: d for d in PollingDistrict.objects.filter(
+                council_id=council_id).defer('area')
+        }
+        areas = PollingDistrict.objects.filter(
+            council_id=council_id, area__isnull=False).values_list('pk', 'area')
+        for pk, area in areas:
+            self.entries.append((area.extent, area.prepared, districts[pk]))
+
+    def find(self, location):
+        # return all districts covering location
+        x, y = location.x, location.y
+        return [
+            district for (xmin, ymin, xmax, ymax), prepared, district
+            in self.entries
+            if xmin <= x <= xmax and ymin <= y <= ymax
+            and prepared.covers(location)
+        ]
+
+
+class DistrictIndex:
+
+    def __init__(self):
+        self.councils = {}
+        self.lock = threading.Lock()
+
+    def get_council_index(self, council_id):
+        version = cache.get(get_version_key(council_id))
+        index = self.councils.get(council_id)
+        if index is None or index.version != version:
+            with self.lock:
+                index = self.councils.get(council_id)
+                if index is None or index.version != version:
+                    index = CouncilDistrictIndex(council_id, version)
+                    self.councils[council_id] = index
+        return index
+
+    def find(self, council_id, location):
+        """
+        Return the list of this council's districts covering location
+        """
+        if location.srid and location.srid != 4326:
+            location = location.transform(4326, clone=True)
+        return self.get_council_index(council_id).find(location)
+
+    def clear(self):
+        with self.lock:
+            self.councils = {}
+
+
+district_index = DistrictIndex()
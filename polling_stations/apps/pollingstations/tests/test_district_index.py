@@ -0,0 +1,76 @@
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from pollingstations.models import PollingDistrict, PollingStation
+from pollingstations.spatial import district_index, invalidate_district_index
+from pollingstations.tests.test_polling_station_manager import (
+    PollingStationsTestBase
+)
+
+
+class DistrictIndexTestMixin:
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        district_index.clear()
+
+    def tearDown(self):
+        district_index.clear()
+        super().tearDown()
+
+
+# run the same tests as test_polling_station_manager with the index enabled
+@override_settings(DISTRICT_INDEX_ENABLED=True)
+class PollingStationsDistrictIdIndexTest(
+        DistrictIndexTestMixin, TestCase, PollingStationsTestBase):
+    fixtures = ['test_polling_stations_district_id.json']
+
+
+@override_settings(DISTRICT_INDEX_ENABLED=True)
+class PollingStationsPointInPolygonIndexTest(
+        DistrictIndexTestMixin, TestCase, PollingStationsTestBase):
+    fixtures = ['test_polling_stations_polygon.json']
+
+    def test_good(self):
+        point = Point(-2.1588134765625, 52.8193630015979)
+        station = PollingStation.objects.get_polling_station(
+            'X01000001', location=point)
+        self.assertIsNone(station)
+
+
+class DistrictIndexTest(DistrictIndexTestMixin, TestCase):
+
+    fixtures = ['test_polling_stations_district_id.json']
+
+    def test_matches_db(self):
+        points = [
+            Point(-2.1588134765625, 52.8193630015979),
+            Point(0.76904296875, 53.1434755845945),
+            Point(-4.3341064453125, 55.85835810656004),
+            Point(10, 10),
+        ]
+        for point in points:
+            expected = list(PollingDistrict.objects.filter(
+                council_id='X01000001', area__covers=point))
+            self.assertEqual(
+                expected, district_index.find('X01000001', point))
+
+    def test_no_queries_once_built(self):
+        point = Point(-2.1588134765625, 52.8193630015979)
+        district_index.find('X01000001', point)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                'AA', district_index.find('X01000001', point)[0].internal_council_id)
+
+    def test_invalidate(self):
+        point = Point(-2.1588134765625, 52.8193630015979)
+        district_index.find('X01000001', point)
+        PollingDistrict.objects.filter(internal_council_id='AA').delete()
+
+        # until the index is invalidated we still see the old district
+        self.assertEqual(1, len(district_index.find('X01000001', point)))
+
+        invalidate_district_index('X01000001')
+        self.assertEqual([], district_index.find('X01000001', point))
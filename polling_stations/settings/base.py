@@ -292,10 +292,13 @@ if type(MANAGE_ADDRESSBASE_MODEL) == str \
 # import application constants
 from .constants.councils import *  # noqa
 from .constants.directions import *  # noqa
+from .constants.districts import *  # noqa
 from .constants.elections import *  # noqa
 from .constants.example_postcode import *  # noqa
+from .constants.geocoding import *  # noqa
 from .constants.importers import *  # noqa
 from .constants.mapit import *  # noqa
+from .constants.postcode_logging import *  # noqa
 from .constants.tiles import *  # noqa
 
 # Import .local.py last - settings in local.py override everything else
@@ -11,3 +11,7 @@ COUNCIL_TYPES = [
     "UTA",
     "COI",
 ]
+
+# (in degrees) how far simplified council boundaries used by
+# councils.helpers.CouncilLocator are allowed to stray from the real ones
+COUNCIL_LOCATOR_TOLERANCE = 0.0005
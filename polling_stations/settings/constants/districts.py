@@ -0,0 +1,4 @@
+# If True, look up which polling district a point is in using an
+# in-memory index of each council's districts instead of querying PostGIS
+# see pollingstations.spatial
+DISTRICT_INDEX_ENABLED = False
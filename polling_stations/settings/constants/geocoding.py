@@ -0,0 +1,24 @@
+# settings for caching the results of geocode() and geocode_point_only()
+# see data_finder.cache
+
+GEOCODE_CACHE_ENABLED = True
+
+# max number of results to keep in each process
+GEOCODE_CACHE_LRU_SIZE = 10000
+
+# results are also stored in this cache from settings.CACHES
+# so they can be shared between processes. Point this at
+# memcached/redis in production: the default LocMemCache
+# is only visible to a single process
+GEOCODE_CACHE_BACKEND = 'default'
+
+# how long to keep results for (in seconds)
+# depending on where they came from
+GEOCODE_CACHE_TTL = {
+    # AddressBase only changes when we re-import it
+    'addressbase': 60 * 60 * 24,
+    'mapit': 60 * 60 * 6,
+    # postcodes we were unable to geocode
+    'error': 60 * 5,
+    'default': 60 * 60,
+}
@@ -20,3 +20,20 @@ We can change the section name using the BOTO_SECTION setting
 """
 BOTO_SECTION = 'wheredoivote'
 S3_DATA_BUCKET = 'pollingstations-data'
+
+# How import scripts write stations, districts and addresses to the DB
+# 'copy' (COPY ... FROM STDIN) or 'bulk_create'
+# see data_collection.loaders
+DATA_IMPORT_LOADER = 'copy'
+
+# Import scripts build each council's data in staging tables and then
+# swap it into the live tables in one short transaction.
+# Give up (and roll back) if the live tables can't be locked within this time
+STAGING_LOCK_TIMEOUT = '5s'
+
+# Number of files to download from S3 at the same time
+S3_SYNC_WORKERS = 8
+
+# How long to cache the stats on the coverage page (in seconds).
+# The cache is cleared whenever a council is imported
+COVERAGE_CACHE_TTL = 60 * 60
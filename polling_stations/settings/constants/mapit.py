@@ -2,3 +2,28 @@ import os
 
 MAPIT_URL = os.environ.get('MAPIT_URL', "http://mapit.democracyclub.org.uk/")
 MAPIT_UA = os.environ.get('MAPIT_UA', None)
+
+# MapIt requests are made through a shared session
+# see data_finder.mapit_client
+MAPIT_POOL_SIZE = 10
+MAPIT_TIMEOUT = 10
+
+# max requests per second (per process) and
+# how many requests we can make in a burst
+MAPIT_RATE_LIMIT = float(os.environ.get('MAPIT_RATE_LIMIT', 4))
+MAPIT_RATE_LIMIT_BURST = 4
+
+# if we do hit MapIt's rate limit, retry this many times
+# waiting MAPIT_BACKOFF, 2 * MAPIT_BACKOFF, 4 * MAPIT_BACKOFF... seconds
+MAPIT_MAX_RETRIES = 3
+MAPIT_BACKOFF = 1.0
+
+# never sleep for longer than MAPIT_MAX_BACKOFF seconds at a time
+# (even if MapIt's Retry-After asks us to) or wait longer than
+# MAPIT_MAX_WAIT seconds in total for one request. If we would have to,
+# give up and raise RateLimitError rather than tie up a web worker
+MAPIT_MAX_BACKOFF = 4.0
+MAPIT_MAX_WAIT = 8.0
+
+# max number of concurrent MapIt requests made by geocode_many()
+GEOCODE_MANY_WORKERS = 4
@@ -0,0 +1,14 @@
+# settings for data_finder.postcode_logger
+
+# Write LoggedPostcode records from a background thread
+# so lookups don't wait for the logger DB
+POSTCODE_LOG_ASYNC = True
+
+# records waiting to be written.
+# If the queue is full (e.g: the logger DB is down), new records are dropped
+POSTCODE_LOG_QUEUE_SIZE = 10000
+
+# write a batch when we have this many records
+# or the oldest record has waited this many seconds
+POSTCODE_LOG_BATCH_SIZE = 100
+POSTCODE_LOG_FLUSH_INTERVAL = 2.0
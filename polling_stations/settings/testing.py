@@ -8,6 +8,13 @@ NOSE_ARGS = [
     '--nologcapture',
 ]
 
+# don't let results leak between tests
+# tests which use the cache enable it with override_settings
+GEOCODE_CACHE_ENABLED = False
+
+# write LoggedPostcode records straight away so tests can see them
+POSTCODE_LOG_ASYNC = False
+
 MIGRATION_MODULES = {
     app: '{}.nomigrations'.format(app)
     for app in INSTALLED_APPS